@@ -0,0 +1,200 @@
+"""Chippy benchmarks.
+
+Run from the repository root:
+
+    python -m benchmarks.bench -o baseline.json
+    python -m benchmarks.bench --compare baseline.json
+"""
+
+from argparse import ArgumentParser
+import json
+import os
+from pathlib import Path
+import sys
+import time
+import timeit
+
+from chippy import code, headless
+from chippy.chippy import Chippy, ENGINES
+from chippy.config import Config
+
+ROMS = Path(__file__).parent.parent.joinpath("chippy", "roms")
+
+# Arguments for each ExecutionUnit handler.
+# Some handlers are paired so that repeated calls leave the VM usable.
+HANDLERS = {
+    "op_00e0": lambda u: u.op_00e0(),
+    "op_00cn": lambda u: u.op_00cn(4),
+    "op_00fb": lambda u: u.op_00fb(),
+    "op_00fc": lambda u: u.op_00fc(),
+    "op_00ff": lambda u: u.op_00ff(),
+    "op_00fe": lambda u: u.op_00fe(),
+    "op_1nnn": lambda u: u.op_1nnn(0x200),
+    "op_2nnn+op_00ee": lambda u: (u.op_2nnn(0x300), u.op_00ee()),
+    "op_3xkk": lambda u: u.op_3xkk(1, 0x10),
+    "op_4xkk": lambda u: u.op_4xkk(1, 0x10),
+    "op_5xy0": lambda u: u.op_5xy0(1, 2),
+    "op_6xkk": lambda u: u.op_6xkk(1, 0x10),
+    "op_7xkk": lambda u: u.op_7xkk(1, 0x10),
+    "op_8xy0": lambda u: u.op_8xy0(1, 2),
+    "op_8xy1": lambda u: u.op_8xy1(1, 2),
+    "op_8xy2": lambda u: u.op_8xy2(1, 2),
+    "op_8xy3": lambda u: u.op_8xy3(1, 2),
+    "op_8xy4": lambda u: u.op_8xy4(1, 2),
+    "op_8xy5": lambda u: u.op_8xy5(1, 2),
+    "op_8xy6": lambda u: u.op_8xy6(1, 2),
+    "op_8xy7": lambda u: u.op_8xy7(1, 2),
+    "op_8xye": lambda u: u.op_8xye(1, 2),
+    "op_9xy0": lambda u: u.op_9xy0(1, 2),
+    "op_annn": lambda u: u.op_annn(0x300),
+    "op_bnnn": lambda u: u.op_bnnn(0x300),
+    "op_cxkk": lambda u: u.op_cxkk(1, 0xff),
+    "op_dxyn": lambda u: u.op_dxyn(1, 2, 15),
+    "op_ex9e": lambda u: u.op_ex9e(1),
+    "op_exa1": lambda u: u.op_exa1(1),
+    "op_fx07": lambda u: u.op_fx07(1),
+    "op_fx0a": lambda u: (u.op_fx0a(1), u.vm.waiting.pop()),
+    "op_fx15": lambda u: u.op_fx15(1),
+    "op_fx18": lambda u: u.op_fx18(1),
+    "op_fx1e": lambda u: u.op_fx1e(1),
+    "op_fx29": lambda u: u.op_fx29(1),
+    "op_fx30": lambda u: u.op_fx30(1),
+    "op_fx33": lambda u: u.op_fx33(1),
+    "op_fx55": lambda u: u.op_fx55(15),
+    "op_fx65": lambda u: u.op_fx65(15),
+}
+
+def per_call(function, number):
+    """Measure best time per call of function in seconds."""
+    return min(timeit.repeat(function, number=number, repeat=5)) / number
+
+def bench_roms(engine, cycles):
+    """Run each bundled ROM headless and measure throughput."""
+    results = {}
+    for rom in sorted(ROMS.iterdir()):
+        config = Config()
+        config.engine = engine
+        chippy = Chippy(config)
+        chippy.load(rom)
+        start = time.perf_counter()
+        result = headless.run(chippy, cycles=cycles)
+        elapsed = time.perf_counter() - start
+        results[rom.name] = {
+            "instructions_per_second": result.cycles / elapsed,
+            "seconds_per_frame": elapsed / max(result.frames, 1),
+        }
+    return results
+
+def bench_handlers(number):
+    """Measure time per call of each ExecutionUnit handler."""
+    chippy = Chippy()
+    chippy.load(ROMS.joinpath("BRIX"))
+    chippy.registers[:] = bytes(range(16))
+    chippy.I = 0x300
+    unit = chippy.execution_unit
+    return {
+        name: per_call(lambda: handler(unit), number)
+        for name, handler in HANDLERS.items()
+    }
+
+def bench_code(number):
+    """Measure time per call of code.dispatch and code.classify."""
+    chippy = Chippy()
+    unit = chippy.execution_unit
+    return {
+        "dispatch": per_call(lambda: code.dispatch(0x6110, unit), number),
+        "Dispatcher": per_call(lambda: chippy.execute(0x6110), number),
+        "classify": per_call(lambda: code.classify(0xd12f), number),
+    }
+
+def bench_render(number):
+    """Measure time per call of Window.render, if pygame is available."""
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    try:
+        from chippy.window import Window
+    except ImportError:
+        return {}
+    chippy = Chippy()
+    for i in range(chippy.display.height):
+        chippy.display.rows[i] = 0x5555555555555555 << (i % 2)
+    window = Window(chippy)
+    window.init_screen()
+
+    def render_all():
+        window.redraw()
+        window.render()
+    return {
+        "Window.render": per_call(render_all, number),
+        "Window.render/unchanged": per_call(window.render, number),
+    }
+
+def run(cycles, number, engines):
+    """Run all benchmarks."""
+    results = {"roms": {}, "micro": {}}
+    for engine in engines:
+        results["roms"][engine] = bench_roms(engine, cycles)
+    results["micro"].update(bench_handlers(number))
+    results["micro"].update(bench_code(number))
+    results["micro"].update(bench_render(max(number // 100, 1)))
+    return results
+
+def compare(baseline, current, threshold):
+    """Return list of regressions in current results compared to baseline.
+
+    Throughput regresses if it drops by more than threshold, and time per
+    call regresses if it rises by more than threshold.
+    """
+    regressions = []
+    for engine, roms in current["roms"].items():
+        for name, result in roms.items():
+            old = baseline["roms"].get(engine, {}).get(name)
+            if old is None:
+                continue
+            new_ips = result["instructions_per_second"]
+            old_ips = old["instructions_per_second"]
+            if new_ips < old_ips * (1 - threshold):
+                regressions.append(
+                    f"roms/{engine}/{name}: {old_ips:.0f} -> {new_ips:.0f} "
+                    "instructions/s")
+    for name, seconds in current["micro"].items():
+        old = baseline["micro"].get(name)
+        if old is not None and seconds > old * (1 + threshold):
+            regressions.append(
+                f"micro/{name}: {old * 1e9:.0f} -> {seconds * 1e9:.0f} ns/call")
+    return regressions
+
+def main():
+    parser = ArgumentParser(description="Run chippy benchmarks.")
+    parser.add_argument("-n", "--cycles", type=int, default=20000,
+                        help="cycles to run per ROM (default=20000)")
+    parser.add_argument("--number", type=int, default=10000,
+                        help="calls per microbenchmark (default=10000)")
+    parser.add_argument("-e", "--engine", action="append",
+                        choices=sorted(ENGINES),
+                        help="engine to benchmark (default=all)")
+    parser.add_argument("-o", "--output", help="write results to JSON file")
+    parser.add_argument("--compare", metavar="BASELINE",
+                        help="compare results against baseline JSON file")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="relative slowdown to flag (default=0.1)")
+    args = parser.parse_args()
+
+    results = run(args.cycles, args.number, args.engine or list(ENGINES))
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(results, fp, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as fp:
+            baseline = json.load(fp)
+        regressions = compare(baseline, results, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
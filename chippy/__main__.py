@@ -3,7 +3,11 @@
 from argparse import ArgumentParser
 
 from . import app
+from .chippy import ENGINES
 from .config import Config
+from .debug import parse_breakpoint, parse_range
+from .frontend import FRONTENDS
+from .quirks import PROFILES
 
 if __name__ == "__main__":
     config = Config()
@@ -12,16 +16,145 @@ if __name__ == "__main__":
     parser.add_argument("-l", "--list", action="store_true",
                         help="list available ROMs")
     parser.add_argument("-p", "--play", metavar="ROM", help="load chip-8 ROM")
-    parser.add_argument("-c", "--colors", default=config.color_scheme,
+    parser.add_argument("-c", "--colors",
                         help=f"color scheme (default={config.color_scheme!r})")
-    parser.add_argument("-r", "--clock-rate", default=config.clock_rate, type=int,
+    parser.add_argument("-r", "--clock-rate", type=int,
                         help=f"clock rate in Hz (default={config.clock_rate!r})")
+    parser.add_argument("-e", "--engine", choices=sorted(ENGINES),
+                        help=f"execution engine (default={config.engine!r})")
+    parser.add_argument("-q", "--quirks", choices=sorted(PROFILES),
+                        help="quirk profile: chippy, vip (COSMAC VIP), "
+                             "chip48 (CHIP-48) or schip (SUPER-CHIP) "
+                             f"(default={config.quirks!r})")
+    parser.add_argument("--frontend", choices=sorted(FRONTENDS),
+                        help=f"window frontend (default={config.frontend!r})")
+    parser.add_argument("--threaded", action="store_true",
+                        help="emulate on a separate thread from the window")
+    parser.add_argument("--save-settings", action="store_true",
+                        help="save colors, clock rate, engine and quirks as "
+                             "the default settings of ROM")
+    parser.add_argument("--add-roms", metavar="DIR",
+                        help="add directory of ROMs to the catalog")
+    parser.add_argument("--headless", action="store_true",
+                        help="run ROM without a window as fast as possible")
+    parser.add_argument("-n", "--cycles", type=int,
+                        help="number of cycles to run in headless mode")
+    parser.add_argument("-f", "--frames", type=int,
+                        help="number of 60 Hz frames to run in headless mode")
+    parser.add_argument("-t", "--trace", metavar="FILE",
+                        help="save execution trace to file")
+    parser.add_argument("--trace-last", metavar="N", type=int,
+                        help="only save the last N instructions of the trace")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="save JSON profile to file and print the top "
+                             "opcodes and addresses on exit")
+    parser.add_argument("--profile-top", metavar="N", type=int, default=10,
+                        help="number of entries to print from the profile "
+                             "(default=10)")
+    parser.add_argument("-s", "--seed", type=int,
+                        help="seed of the random number generator "
+                             "(default: random)")
+    parser.add_argument("--record", metavar="FILE",
+                        help="save keypad input to file")
+    parser.add_argument("--replay", metavar="FILE",
+                        help="replay keypad input from file in headless mode")
+    parser.add_argument("--capture", metavar="FILE.gif|DIR",
+                        help="capture display into an animated GIF or a "
+                             "directory of PNG files")
+    parser.add_argument("--lockstep", metavar="ENGINE",
+                        choices=sorted(ENGINES) + ["batch"],
+                        help="run ROM with ENGINE, or with the batch engine "
+                             "if ENGINE is batch, in lockstep with the "
+                             "interpreter and report where they diverge")
+    parser.add_argument("--interval", metavar="N", type=int, default=1000,
+                        help="number of instructions between lockstep "
+                             "comparisons (default=1000)")
+    parser.add_argument("--serve", metavar="SOCKET",
+                        help="run ROM headless in real time and stream its "
+                             "display over a Unix socket")
+    parser.add_argument("--break", metavar="ADDR", dest="breakpoints",
+                        type=parse_breakpoint, action="append", default=[],
+                        help="pause the window or debugger at hex address, "
+                             "optionally only if a condition on V0-Vf, I, PC, "
+                             "SP, DT and ST holds, e.g. '2a4 if V3 == 5' "
+                             "(repeatable)")
+    parser.add_argument("--watch", metavar="START[-END]", dest="watchpoints",
+                        type=parse_range, action="append", default=[],
+                        help="pause the window or debugger after stores into "
+                             "hex RAM range (repeatable)")
+    parser.add_argument("--debug", action="store_true",
+                        help="debug ROM in the terminal without a window")
+    parser.add_argument("--show-trace", metavar="FILE",
+                        help="print disassembled trace file")
+    parser.add_argument("-a", "--analyze", metavar="ROM",
+                        help="show static analysis of ROM")
+    parser.add_argument("-b", "--batch", metavar="DIR|GLOB", nargs="?",
+                        const="",
+                        help="run ROMs headless in parallel "
+                             "(default: bundled ROMs)")
+    parser.add_argument("-j", "--jobs", type=int,
+                        help="number of worker processes in batch mode "
+                             "(default: one per core)")
     args = parser.parse_args()
 
-    config.color_scheme = args.colors
-    config.clock_rate = args.clock_rate
+    catalog = None
+    if args.play:
+        catalog = app.open_catalog()
+        app.configure(args.play, config, catalog)
+    if args.colors is not None:
+        config.color_scheme = args.colors
+    if args.clock_rate is not None:
+        config.clock_rate = args.clock_rate
+    if args.engine is not None:
+        config.engine = args.engine
+    if args.quirks is not None:
+        config.quirks = args.quirks
+    if args.frontend is not None:
+        config.frontend = args.frontend
+    config.seed = args.seed
+    config.threaded = config.threaded or args.threaded
 
-    if args.list:
+    if args.save_settings:
+        if not args.play:
+            parser.error("--save-settings requires --play")
+        app.save_settings(args.play, config, catalog)
+
+    if args.add_roms:
+        app.add_roms(args.add_roms)
+    elif args.list:
         app.list_roms()
+    elif args.analyze:
+        app.analyze(args.analyze)
+    elif args.batch is not None:
+        if args.cycles is None and args.frames is None:
+            parser.error("--batch requires --cycles or --frames")
+        app.run_batch(args.batch, config, args.cycles, args.frames, args.jobs)
+    elif args.show_trace:
+        app.print_trace(args.show_trace)
+    elif args.replay and not args.play:
+        parser.error("--replay requires --play")
+    elif args.lockstep:
+        if not args.play:
+            parser.error("--lockstep requires --play")
+        if args.frames is None and not args.replay:
+            parser.error("--lockstep requires --frames or --replay")
+        app.run_lockstep(args.play, args.lockstep, config, args.frames,
+                         args.interval, args.replay, catalog)
+    elif args.serve:
+        if not args.play:
+            parser.error("--serve requires --play")
+        app.serve(args.play, args.serve, config, args.frames, catalog)
+    elif args.play and args.debug:
+        app.run_debugger(args.play, config, args.breakpoints,
+                         args.watchpoints, catalog)
+    elif args.play and (args.headless or args.replay):
+        if args.cycles is None and args.frames is None and not args.replay:
+            parser.error("--headless requires --cycles or --frames")
+        app.run_headless(args.play, config, args.cycles, args.frames,
+                         args.trace, args.trace_last, args.profile,
+                         args.profile_top, args.replay, args.capture,
+                         catalog)
     elif args.play:
-        app.run(args.play, config)
+        app.run(args.play, config, args.trace, args.trace_last, args.profile,
+                args.profile_top, args.record, args.capture, args.breakpoints,
+                args.watchpoints, catalog)
@@ -0,0 +1,245 @@
+"""Static analysis of chip-8 programs.
+
+Follow jumps and calls from 0x200 to separate code from data, split code
+into basic blocks, and find stores through op_fx33 and op_fx55.
+Results are cached on disk by the SHA-1 hash of the ROM.
+"""
+
+from collections import namedtuple
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from .code import decode_table, dispatch
+from .debug import Disassembler
+
+VERSION = 3
+
+Block = namedtuple("Block", "start stop successors")
+# Instructions in [start, stop) and addresses of the next blocks
+
+Store = namedtuple("Store", "address instruction start stop self_modifying")
+# Store instruction at address that writes ram[start:stop].
+# start and stop are None if I isn't known statically.
+
+Analysis = namedtuple("Analysis", [
+    "sha1",
+    "code",         # [start, stop) ranges of code
+    "data",         # [start, stop) ranges of data in the ROM
+    "blocks",       # basic blocks sorted by address
+    "calls",        # call graph: subroutine -> called subroutines
+    "indirect",     # addresses of op_bnnn jumps
+    "stores",       # stores into ram
+])
+
+# Instructions that end basic blocks.
+JUMPS = {"op_1nnn", "op_bnnn", "op_00ee", "op_00fd"}
+SKIPS = {"op_3xkk", "op_4xkk", "op_5xy0", "op_9xy0", "op_ex9e", "op_exa1"}
+
+def successors(address, name, args):
+    """Get addresses of instructions that can run after instruction."""
+    after = address + 2
+    if name == "op_1nnn":
+        return [args[0]]
+    if name == "op_2nnn":
+        return [args[0], after]
+    if name in ("op_00ee", "op_00fd", "op_bnnn", ""):
+        return []
+    if name in SKIPS:
+        return [after, after + 2]
+    return [after]
+
+def decode(ram, address):
+    """Decode instruction at address."""
+    instruction = (ram[address] << 8) | ram[address + 1]
+    name, args = decode_table()[instruction]
+    return instruction, name, args
+
+def to_ranges(addresses):
+    """Convert set of addresses into sorted [start, stop) ranges."""
+    ranges = []
+    for address in sorted(addresses):
+        if ranges and ranges[-1][1] == address:
+            ranges[-1][1] = address + 1
+        else:
+            ranges.append([address, address + 1])
+    return ranges
+
+def analyze(rom):
+    """Analyze ROM (bytes)."""
+    end = 0x200 + len(rom)
+    ram = bytearray(0x200) + bytes(rom) + bytearray(2)
+
+    # Find reachable instructions.
+    instructions = {}
+    leaders = {0x200}
+    entries = {0x200}
+    pending = [0x200]
+    while pending:
+        address = pending.pop()
+        if address in instructions or not 0x200 <= address < end:
+            continue
+        instruction, name, args = decode(ram, address)
+        targets = successors(address, name, args)
+        instructions[address] = (instruction, name, args, targets)
+        if name == "op_2nnn":
+            entries.add(args[0])
+        if name in JUMPS or name in SKIPS or name == "op_2nnn" or not name:
+            leaders.update(targets)
+            leaders.add(address + 2)
+        pending.extend(targets)
+
+    # Split code into basic blocks.
+    blocks = []
+    for start in sorted(leaders & set(instructions)):
+        address = start
+        while True:
+            targets = instructions[address][3]
+            address += 2
+            if targets != [address] or address in leaders \
+                    or address not in instructions:
+                break
+        blocks.append(Block(start, address, targets))
+
+    code = set()
+    for address in instructions:
+        code.update((address, address + 1))
+    data = set(range(0x200, end)) - code
+
+    return Analysis(
+        sha1=hashlib.sha1(rom).hexdigest(),
+        code=to_ranges(code),
+        data=to_ranges(data),
+        blocks=blocks,
+        calls=call_graph(blocks, entries, instructions),
+        indirect=sorted(a for a, i in instructions.items() if i[1] == "op_bnnn"),
+        stores=find_stores(blocks, instructions, code),
+    )
+
+def call_graph(blocks, entries, instructions):
+    """Find subroutines called by each subroutine."""
+    by_start = {block.start: block for block in blocks}
+    calls = {}
+    for entry in sorted(entries):
+        callees = set()
+        seen = set()
+        pending = [entry]
+        while pending:
+            start = pending.pop()
+            block = by_start.get(start)
+            if block is None or start in seen:
+                continue
+            seen.add(start)
+            last = block.stop - 2
+            _, name, args, _ = instructions[last]
+            if name == "op_2nnn":
+                callees.add(args[0])
+                pending.append(block.stop)
+            else:
+                pending.extend(block.successors)
+        calls[entry] = sorted(callees)
+    return calls
+
+def find_stores(blocks, instructions, code):
+    """Find op_fx33 and op_fx55 stores.
+
+    I is tracked within basic blocks, so a store is resolved only if its
+    block sets I with op_annn before it. Instructions that change I
+    otherwise make it unknown, including op_fx55 and op_fx65, which
+    increment I under some quirk profiles.
+    """
+    stores = []
+    for block in blocks:
+        I = None
+        for address in range(block.start, block.stop, 2):
+            instruction, name, args, _ = instructions[address]
+            if name == "op_annn":
+                I = args[0]
+            elif name in ("op_fx1e", "op_fx29", "op_fx30", "op_fx65"):
+                I = None
+            elif name in ("op_fx33", "op_fx55"):
+                size = 3 if name == "op_fx33" else args[0] + 1
+                if I is None:
+                    stores.append(Store(address, instruction, None, None, None))
+                else:
+                    written = set(range(I, I + size))
+                    stores.append(Store(address, instruction, I, I + size,
+                                        bool(written & code)))
+                if name == "op_fx55":
+                    I = None
+    return stores
+
+def cache_dir():
+    """Get directory for cached analyses."""
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home().joinpath(".cache")
+    return Path(base).joinpath("chippy", "analysis")
+
+def to_json(analysis):
+    """Convert analysis into JSON object."""
+    result = analysis._asdict()
+    result["version"] = VERSION
+    result["blocks"] = [block._asdict() for block in analysis.blocks]
+    result["stores"] = [store._asdict() for store in analysis.stores]
+    result["calls"] = {str(k): v for k, v in analysis.calls.items()}
+    return result
+
+def from_json(obj):
+    """Convert JSON object into analysis."""
+    obj = dict(obj)
+    del obj["version"]
+    obj["blocks"] = [Block(**block) for block in obj["blocks"]]
+    obj["stores"] = [Store(**store) for store in obj["stores"]]
+    obj["calls"] = {int(k): v for k, v in obj["calls"].items()}
+    return Analysis(**obj)
+
+def load(rom, directory=None):
+    """Analyze ROM (bytes), or load cached analysis."""
+    directory = Path(directory) if directory else cache_dir()
+    path = directory.joinpath(hashlib.sha1(rom).hexdigest() + ".json")
+    try:
+        obj = json.loads(path.read_text())
+        if obj.get("version") == VERSION:
+            return from_json(obj)
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    analysis = analyze(rom)
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(to_json(analysis)))
+    except OSError:
+        pass
+    return analysis
+
+def report(analysis, rom):
+    """Format analysis of ROM (bytes)."""
+    ram = bytearray(0x200) + bytes(rom) + bytearray(2)
+    disassembler = Disassembler()
+    lines = [f"sha1 {analysis.sha1}", ""]
+    lines.append("code " + ", ".join(f"{a:#05x}-{b - 1:#05x}" for a, b in analysis.code))
+    lines.append("data " + ", ".join(f"{a:#05x}-{b - 1:#05x}" for a, b in analysis.data))
+    lines.append("")
+    for block in analysis.blocks:
+        successors = ", ".join(f"{a:#05x}" for a in block.successors)
+        lines.append(f"block {block.start:#05x} -> [{successors}]")
+        for address in range(block.start, block.stop, 2):
+            instruction = (ram[address] << 8) | ram[address + 1]
+            text = dispatch(instruction, disassembler)
+            if isinstance(text, Exception):
+                text = str(text)
+            lines.append(f"  {address:#05x}  {instruction:04x}  {text}")
+    lines.append("")
+    for caller, callees in analysis.calls.items():
+        callees = ", ".join(f"{a:#05x}" for a in callees)
+        lines.append(f"call {caller:#05x} -> [{callees}]")
+    for address in analysis.indirect:
+        lines.append(f"indirect jump at {address:#05x}")
+    for store in analysis.stores:
+        if store.start is None:
+            target = "unknown"
+        else:
+            target = f"{store.start:#05x}-{store.stop - 1:#05x}"
+        note = " (self-modifying)" if store.self_modifying else ""
+        lines.append(f"store {store.instruction:04x} at {store.address:#05x} "
+                     f"-> {target}{note}")
+    return "\n".join(lines)
@@ -1,32 +1,292 @@
 """chippy subprograms."""
 from pathlib import Path
 import errno
+import hashlib
+import json
 import sys
 
+from . import analysis, capture, debug, headless, lockstep, pool, recording
+from . import server, threaded
+from .catalog import Catalog
 from .chippy import Chippy
 from .config import Config
+from .profiler import Profiler
+from .status import Mode
+from .trace import show_trace, Tracer
+
+def open_catalog():
+    """Open ROM catalog and bring its index up to date."""
+    catalog = Catalog()
+    catalog.update()
+    try:
+        catalog.save()
+    except OSError as error:
+        print(f"Warning: couldn't save ROM catalog: {error}", file=sys.stderr)
+    return catalog
 
 def list_roms():
     """List avaiable ROMs."""
-    roms = Path(__file__).parent.joinpath("roms")
-    for rom in roms.glob('*'):
-        print(rom.name)
+    for entry in open_catalog().entries.values():
+        print(f"{entry.sha1[:10]}  {entry.size:>5}  {entry.name}")
+
+def add_roms(directory):
+    """Add directory of ROMs to the catalog."""
+    if not Path(directory).is_dir():
+        print(f"Directory '{directory}' not found.", file=sys.stderr)
+        sys.exit(errno.ENOENT)
+    catalog = Catalog()
+    catalog.add_directory(directory)
+    catalog.update()
+    catalog.save()
+    print(f"{len(catalog.entries)} ROMs in catalog.")
 
-def find_rom(program):
-    """Find ROM in current directory or in ROMs directory."""
+def find_rom(program, catalog=None):
+    """Find ROM by path, or by name or hash in the ROM catalog.
+
+    The catalog is opened if it's not given.
+    """
     rom = Path(program)
     if rom.is_file():
         return rom
-    rom = Path(__file__).parent.joinpath("roms", program)
-    if rom.is_file():
-        return rom
+    entry = (catalog or open_catalog()).find(program)
+    if entry is not None:
+        return Path(entry.path)
 
-def run(program, config=Config()):
-    """Run chip-8 program."""
-    rom = find_rom(program)
+def configure(program, config, catalog=None):
+    """Apply catalog settings of chip-8 program to config."""
+    catalog = catalog or open_catalog()
+    rom = find_rom(program, catalog)
+    if rom is not None:
+        catalog.configure(catalog.sha1(rom), config)
+
+def save_settings(program, config, catalog=None):
+    """Save clock rate, colors, engine and quirks in config as the program's
+    settings.
+    """
+    catalog = catalog or open_catalog()
+    rom = find_rom(program, catalog)
+    if rom is None:
+        print(f"Program '{program}' not found.", file=sys.stderr)
+        sys.exit(errno.ENOENT)
+    catalog.tune(catalog.sha1(rom), config)
+    catalog.save()
+
+def load(program, config, catalog=None):
+    """Load chip-8 program or exit if it doesn't exist."""
+    rom = find_rom(program, catalog)
     if rom is None:
         print(f"Program '{program}' not found.", file=sys.stderr)
         sys.exit(errno.ENOENT)
     chippy = Chippy(config)
     chippy.load(rom)
-    chippy.run()
+    return chippy
+
+def rom_sha1(program, catalog=None):
+    """Get SHA-1 hash of chip-8 program, from the catalog if it's given."""
+    rom = find_rom(program, catalog)
+    if catalog is not None:
+        return bytes.fromhex(catalog.sha1(rom))
+    return hashlib.sha1(rom.read_bytes()).digest()
+
+def start_trace(chippy, path, last=None):
+    """Trace chippy into file.
+
+    If last is None, stream the whole trace. Otherwise, keep only the last
+    instructions and write them when the program stops.
+    """
+    if last is None:
+        chippy.tracer = Tracer(chippy, stream=open(path, "wb"))
+    else:
+        chippy.tracer = Tracer(chippy, size=last)
+
+def stop_trace(chippy, path):
+    """Write the rest of the trace."""
+    if chippy.tracer.stream is None:
+        with open(path, "wb") as fp:
+            chippy.tracer.save(fp)
+    else:
+        chippy.tracer.close()
+
+def start_capture(chippy, path):
+    """Capture display of chippy into GIF file or directory of PNG files."""
+    colors = (chippy.config.color_off, chippy.config.color_on)
+    chippy.capture = capture.Capture(capture.open_writer(path, colors=colors))
+
+def stop_capture(chippy):
+    """Write the rest of the capture."""
+    chippy.capture.close()
+
+def start_profile(chippy):
+    """Profile chippy."""
+    chippy.profiler = Profiler(chippy)
+    chippy.profiler.start()
+
+def stop_profile(chippy, path, top=10):
+    """Save profile into JSON file and print the top entries."""
+    chippy.profiler.stop()
+    with open(path, "w") as fp:
+        chippy.profiler.save(fp)
+    print(chippy.profiler.show(top))
+
+def start_debugger(chippy, breakpoints=(), watchpoints=()):
+    """Attach debugger with breakpoints and watchpoints to chippy.
+
+    breakpoints are (address, condition) pairs and watchpoints are
+    (start, stop) ranges.
+    """
+    chippy.debugger = debug.Debugger(chippy)
+    for address, condition in breakpoints:
+        chippy.debugger.add_breakpoint(address, condition)
+    for start, stop in watchpoints:
+        chippy.debugger.add_watchpoint(start, stop)
+
+def analyze(program):
+    """Print static analysis of chip-8 program."""
+    rom = find_rom(program)
+    if rom is None:
+        print(f"Program '{program}' not found.", file=sys.stderr)
+        sys.exit(errno.ENOENT)
+    binary = rom.read_bytes()
+    print(analysis.report(analysis.load(binary), binary))
+
+def run(program, config=Config(), trace_path=None, trace_last=None,
+        profile_path=None, profile_top=10, record_path=None,
+        capture_path=None, breakpoints=(), watchpoints=(), catalog=None):
+    """Run chip-8 program.
+
+    If record_path is given, record keypad input into it.
+    """
+    chippy = load(program, config, catalog)
+    start_debugger(chippy, breakpoints, watchpoints)
+    if capture_path:
+        start_capture(chippy, capture_path)
+    if trace_path:
+        start_trace(chippy, trace_path, trace_last)
+    if profile_path:
+        start_profile(chippy)
+    if record_path:
+        sha1 = rom_sha1(program, catalog)
+        chippy.recorder = recording.Recorder(chippy, sha1)
+    try:
+        if config.threaded:
+            threaded.run(chippy)
+        else:
+            chippy.run()
+    finally:
+        if trace_path:
+            stop_trace(chippy, trace_path)
+        if profile_path:
+            stop_profile(chippy, profile_path, profile_top)
+        if record_path:
+            frames = chippy.frame_count + (chippy.frame_cycles > 0)
+            # The last frame counts if the program stopped during it.
+            with open(record_path, "wb") as fp:
+                chippy.recorder.save(fp, frames)
+        if capture_path:
+            stop_capture(chippy)
+
+def load_recording(program, path, config, catalog=None):
+    """Load input recording and apply its seed and clock rate to config."""
+    with open(path, "rb") as fp:
+        session = recording.load(fp)
+    if session.sha1 != rom_sha1(program, catalog):
+        print(f"Warning: '{path}' was recorded on another ROM.",
+              file=sys.stderr)
+    config.seed = session.seed
+    config.clock_rate = session.clock_rate
+    return session
+
+def run_headless(program, config=Config(), cycles=None, frames=None,
+                 trace_path=None, trace_last=None, profile_path=None,
+                 profile_top=10, replay_path=None, capture_path=None,
+                 catalog=None):
+    """Run chip-8 program without a window and show its final state.
+
+    If replay_path is given, replay the input recorded in it with the
+    same seed and clock rate. Unless cycles or frames are given, run for
+    as many frames as the recording.
+    """
+    player = None
+    if replay_path:
+        session = load_recording(program, replay_path, config, catalog)
+        if cycles is None and frames is None:
+            frames = session.frames
+        player = recording.Player(session)
+    chippy = load(program, config, catalog)
+    if capture_path:
+        start_capture(chippy, capture_path)
+    if trace_path:
+        start_trace(chippy, trace_path, trace_last)
+    if profile_path:
+        start_profile(chippy)
+    try:
+        result = headless.run(chippy, cycles=cycles, frames=frames,
+                              player=player)
+    finally:
+        if trace_path:
+            stop_trace(chippy, trace_path)
+        if profile_path:
+            stop_profile(chippy, profile_path, profile_top)
+        if capture_path:
+            stop_capture(chippy)
+    print(headless.show(result))
+
+def run_lockstep(program, engine, config=Config(), frames=None,
+                 interval=1000, replay_path=None, catalog=None):
+    """Run engine in lockstep with the interpreter and show where they diverge.
+
+    Exit with status 1 if they diverge. Unless frames is given, run for as
+    many frames as the recording.
+    """
+    session = None
+    if replay_path:
+        session = load_recording(program, replay_path, config, catalog)
+        if frames is None:
+            frames = session.frames
+    rom = find_rom(program, catalog)
+    if rom is None:
+        print(f"Program '{program}' not found.", file=sys.stderr)
+        sys.exit(errno.ENOENT)
+    runner = lockstep.Lockstep(rom, config, engine, recording=session)
+    divergence = runner.run(frames, interval)
+    if divergence is not None:
+        print(lockstep.show(divergence, ("interpreter", engine),
+                            config.quirks))
+        sys.exit(1)
+    if runner.error is not None:
+        print(f"Both engines stopped with {runner.error}")
+    print(f"Engines agree on {runner.machines[0].frame_count} frames.")
+
+def run_debugger(program, config=Config(), breakpoints=(), watchpoints=(),
+                 catalog=None):
+    """Debug chip-8 program in the terminal without a window."""
+    chippy = load(program, config, catalog)
+    start_debugger(chippy, breakpoints, watchpoints)
+    chippy.status = Mode.PAUSE
+    debug.Shell(chippy.debugger).cmdloop()
+
+def serve(program, path, config=Config(), frames=None, catalog=None):
+    """Run chip-8 program and stream its display over Unix socket at path."""
+    chippy = load(program, config, catalog)
+    host = server.Server(chippy, path)
+    print(f"Serving '{program}' on '{path}'.", file=sys.stderr)
+    try:
+        host.serve(frames)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        host.close()
+
+def run_batch(pattern, config=Config(), cycles=None, frames=None, jobs=None):
+    """Run ROMs headless in parallel and print JSON lines as they finish."""
+    roms = pool.find_roms(pattern)
+    if not roms:
+        print(f"No ROMs found in '{pattern}'.", file=sys.stderr)
+        sys.exit(errno.ENOENT)
+    for summary in pool.run_roms(roms, config, cycles, frames, jobs):
+        print(json.dumps(summary), flush=True)
+
+def print_trace(path):
+    """Print disassembled trace file."""
+    with open(path, "rb") as fp:
+        show_trace(fp)
@@ -0,0 +1,48 @@
+"""Chip-8 buzzer."""
+
+from pathlib import Path
+
+class NullAudio:
+    """Buzzer that doesn't make any sound."""
+    def __init__(self):
+        self.playing = False
+
+    def update(self, sound_timer):
+        """Start or stop buzzer if the sound timer started or stopped.
+
+        Does nothing while the sound timer stays zero or nonzero.
+        """
+        playing = sound_timer > 0
+        if playing != self.playing:
+            self.playing = playing
+            if playing:
+                self.start()
+            else:
+                self.stop()
+
+    def start(self):
+        """Start buzzer."""
+
+    def stop(self):
+        """Stop buzzer."""
+
+class PygameAudio(NullAudio):
+    """Buzzer that loops a preloaded tone on a pygame mixer channel.
+
+    The mixer must be initialized first.
+    """
+    def __init__(self):
+        super().__init__()
+        import pygame
+
+        path = Path(__file__).with_name("data").joinpath("chime.wav")
+        self.sound = pygame.mixer.Sound(str(path))
+        self.channel = None
+
+    def start(self):
+        self.channel = self.sound.play(loops=-1)
+
+    def stop(self):
+        if self.channel is not None:
+            self.channel.stop()
+            self.channel = None
@@ -0,0 +1,455 @@
+"""Vectorized engine that runs many chip-8 machines in lockstep.
+
+Requires NumPy. The state of N machines is stored in arrays, and each
+step decodes and executes one instruction on every machine, grouped by
+instruction handler.
+
+Results are bit-identical to ExecutionUnit with the same quirk profile,
+except for:
+- op_cxkk, which draws random bytes from a NumPy generator
+- stores and loads that run past the end of ram, which halt the machine
+  instead of resizing ram or the registers
+- op_00ff, which halts the machine because only the 64-by-32 display is
+  supported
+
+Machines that raise errors in ExecutionUnit are halted, and the error
+message is kept in errors. Machines that exit with op_00fd are halted
+without an error.
+"""
+
+import array
+
+import numpy as np
+
+from .code import decode_table
+from .quirks import PROFILES
+
+NAMES = sorted({name for name, _ in decode_table()})
+OPS = np.array([NAMES.index(name) for name, _ in decode_table()], dtype=np.int64)
+# Handler index of every instruction
+
+U64 = np.uint64
+
+class BatchEngine:
+    def __init__(self, n, seed=None, quirks="chippy"):
+        """Initialize n machines with blank state and the given quirk profile."""
+        self.n = n
+        self.ram = np.zeros((n, 4096), dtype=np.uint8)
+        self.registers = np.zeros((n, 16), dtype=np.uint8)
+        self.I = np.zeros(n, dtype=np.int64)
+        self.delay_timer = np.zeros(n, dtype=np.int64)
+        self.sound_timer = np.zeros(n, dtype=np.int64)
+        self.program_counter = np.full(n, 0x200, dtype=np.int64)
+        self.stack_pointer = np.zeros(n, dtype=np.int64)
+        self.stack = np.zeros((n, 16), dtype=np.int64)
+        self.keypad = np.zeros(n, dtype=np.int64)
+        self.display = np.zeros((n, 32), dtype=np.uint64)
+        self.waiting = np.full(n, -1, dtype=np.int64)
+        self.halted = np.zeros(n, dtype=bool)
+        self.errors = [None] * n
+        self.random = np.random.default_rng(seed)
+        self.clock_rate = 500
+        self.cycle_count = 0
+        self.frame_count = 0
+
+        self.quirks = PROFILES[quirks]
+        self.specialize()
+        self.handlers = [getattr(self, name or "invalid") for name in NAMES]
+
+    def specialize(self):
+        """Replace handlers of contested instructions with the ones for the
+        quirk profile.
+        """
+        quirks = self.quirks
+        if quirks.vf_reset:
+            self.op_8xy1 = self.op_8xy1_reset
+            self.op_8xy2 = self.op_8xy2_reset
+            self.op_8xy3 = self.op_8xy3_reset
+        if quirks.shift_vy:
+            self.op_8xy6 = self.op_8xy6_vy
+            self.op_8xye = self.op_8xye_vy
+        if quirks.increment is not None:
+            self.increment = quirks.increment
+            self.op_fx55 = self.op_fx55_increment
+            self.op_fx65 = self.op_fx65_increment
+        if quirks.jump_vx:
+            self.op_bnnn = self.op_bxnn
+        if quirks.clip:
+            self.op_dxyn = self.op_dxyn_clip
+        self.big = quirks.big_lores
+        # op_dxyn with n = 0 draws 16-by-16 sprites, or else nothing
+
+    @classmethod
+    def from_chippy(cls, chip8, n, seed=None):
+        """Create n copies of chip8."""
+        if len(chip8.waiting) > 1:
+            raise ValueError("Can't copy more than one pending key wait.")
+        batch = cls(n, seed, chip8.config.quirks)
+        batch.ram[:] = np.frombuffer(bytes(chip8.ram), dtype=np.uint8)
+        batch.registers[:] = np.frombuffer(bytes(chip8.registers), dtype=np.uint8)
+        batch.I[:] = chip8.I
+        batch.delay_timer[:] = chip8.delay_timer
+        batch.sound_timer[:] = chip8.sound_timer
+        batch.program_counter[:] = chip8.program_counter
+        batch.stack_pointer[:] = chip8.stack_pointer
+        batch.stack[:] = list(chip8.stack)
+        batch.keypad[:] = chip8.keypad
+        if chip8.display.hires:
+            raise ValueError("Can't copy hires display.")
+        batch.display[:] = np.array(chip8.display.rows, dtype=np.uint64)
+        batch.waiting[:] = chip8.waiting[0] if chip8.waiting else -1
+        batch.clock_rate = int(chip8.config.clock_rate)
+        batch.cycle_count = chip8.cycle_count
+        batch.frame_count = chip8.frame_count
+        return batch
+
+    def to_chippy(self, i, chip8):
+        """Copy state of machine i into chip8."""
+        chip8.ram[:] = self.ram[i].tobytes()
+        chip8.registers[:] = self.registers[i].tobytes()
+        chip8.I = int(self.I[i])
+        chip8.delay_timer = int(self.delay_timer[i])
+        chip8.sound_timer = int(self.sound_timer[i])
+        chip8.program_counter = int(self.program_counter[i])
+        chip8.stack_pointer = int(self.stack_pointer[i])
+        chip8.stack[:] = array.array(chip8.stack.typecode, self.stack[i].tolist())
+        chip8.keypad = int(self.keypad[i])
+        chip8.display.resize(64, 32)
+        chip8.display.rows = self.display[i].tolist()
+        chip8.waiting[:] = [] if self.waiting[i] < 0 else [int(self.waiting[i])]
+        chip8.execution_unit.invalidate(0, len(chip8.ram))
+
+    def press(self, machines, key):
+        """Press key on the keypads of the selected machines."""
+        m = np.arange(self.n)[machines]
+        self.keypad[m] |= 1 << key
+        m = m[self.waiting[m] >= 0]
+        self.registers[m, self.waiting[m]] = key
+        self.waiting[m] = -1
+
+    def release(self, machines, key):
+        """Release key on the keypads of the selected machines."""
+        self.keypad[machines] &= 0xffff - (1 << key)
+
+    def halt(self, m, message):
+        """Halt machines m with error messages, or None if they exited."""
+        self.halted[m] = True
+        for i, text in zip(m.tolist(), message):
+            self.errors[i] = text
+
+    def cycle(self):
+        """Simulate one cycle on every machine."""
+        m = np.nonzero(~self.halted & (self.waiting < 0))[0]
+        pc = self.program_counter[m]
+        bad = pc + 1 >= 4096
+        if bad.any():
+            self.halt(m[bad], ["bytearray index out of range"] * int(bad.sum()))
+            m, pc = m[~bad], pc[~bad]
+
+        instruction = (self.ram[m, pc].astype(np.int64) << 8) | self.ram[m, pc + 1]
+        self.program_counter[m] = (pc + 2) & 0x0fff
+
+        ops = OPS[instruction]
+        x = (instruction >> 8) & 0xf
+        y = (instruction >> 4) & 0xf
+        kk = instruction & 0xff
+        nnn = instruction & 0xfff
+        for op in np.nonzero(np.bincount(ops, minlength=len(NAMES)))[0]:
+            selected = ops == op
+            self.handlers[op](m[selected], x[selected], y[selected],
+                              kk[selected], nnn[selected])
+
+    def step(self, cycles):
+        """Simulate cycles on every machine."""
+        for _ in range(cycles):
+            self.cycle()
+        self.cycle_count += cycles
+        return cycles
+
+    def frame(self):
+        """Simulate one 60 Hz frame on every machine."""
+        start = self.frame_count * self.clock_rate // 60
+        stop = (self.frame_count + 1) * self.clock_rate // 60
+        self.step(stop - start)
+        self.frame_count += 1
+        self.countdown()
+
+    def countdown(self):
+        """Decrement timers."""
+        np.maximum(self.delay_timer - 1, 0, out=self.delay_timer)
+        np.maximum(self.sound_timer - 1, 0, out=self.sound_timer)
+
+    def jump(self, m, target):
+        """Jump to targets, or halt machines with invalid targets."""
+        bad = (target < 0x200) | (target >= 4096)
+        if bad.any():
+            self.halt(m[bad], [f"Invalid jump target: {t:#05x}"
+                               for t in target[bad].tolist()])
+        self.program_counter[m[~bad]] = target[~bad]
+
+    def skip(self, m, condition):
+        """Skip next instruction on machines where condition holds."""
+        m = m[condition]
+        self.program_counter[m] = (self.program_counter[m] + 2) & 0x0fff
+
+    def invalid(self, m, x, y, kk, nnn):
+        """Ignore invalid instruction."""
+
+    def op_00cn(self, m, x, y, kk, nnn):
+        n = nnn & 0xf
+        for rows in np.unique(n[n > 0]).tolist():
+            mm = m[n == rows]
+            self.display[mm, rows:] = self.display[mm, :-rows]
+            self.display[mm, :rows] = 0
+
+    def op_00e0(self, m, x, y, kk, nnn):
+        self.display[m] = 0
+
+    def op_00ee(self, m, x, y, kk, nnn):
+        self.stack_pointer[m] -= 1
+        sp = self.stack_pointer[m]
+        bad = sp < -16
+        if bad.any():
+            self.halt(m[bad], ["array index out of range"] * int(bad.sum()))
+        m, sp = m[~bad], sp[~bad]
+        self.jump(m, self.stack[m, sp % 16])
+
+    def op_00fb(self, m, x, y, kk, nnn):
+        self.display[m] >>= U64(4)
+
+    def op_00fc(self, m, x, y, kk, nnn):
+        self.display[m] <<= U64(4)
+
+    def op_00fd(self, m, x, y, kk, nnn):
+        self.program_counter[m] = (self.program_counter[m] - 2) & 0x0fff
+        self.halt(m, [None] * len(m))
+
+    def op_00fe(self, m, x, y, kk, nnn):
+        self.display[m] = 0
+
+    def op_00ff(self, m, x, y, kk, nnn):
+        self.halt(m, ["hires display isn't supported"] * len(m))
+
+    def op_1nnn(self, m, x, y, kk, nnn):
+        self.jump(m, nnn)
+
+    def op_2nnn(self, m, x, y, kk, nnn):
+        sp = self.stack_pointer[m]
+        bad = (sp < -16) | (sp >= 16)
+        if bad.any():
+            self.halt(m[bad], ["array assignment index out of range"] * int(bad.sum()))
+        m, sp, nnn = m[~bad], sp[~bad], nnn[~bad]
+        self.stack[m, sp % 16] = self.program_counter[m]
+        self.stack_pointer[m] += 1
+        self.jump(m, nnn)
+
+    def op_3xkk(self, m, x, y, kk, nnn):
+        self.skip(m, self.registers[m, x] == kk)
+
+    def op_4xkk(self, m, x, y, kk, nnn):
+        self.skip(m, self.registers[m, x] != kk)
+
+    def op_5xy0(self, m, x, y, kk, nnn):
+        self.skip(m, self.registers[m, x] == self.registers[m, y])
+
+    def op_6xkk(self, m, x, y, kk, nnn):
+        self.registers[m, x] = kk
+
+    def op_7xkk(self, m, x, y, kk, nnn):
+        self.registers[m, x] = (self.registers[m, x] + kk) & 0xff
+
+    def op_8xy0(self, m, x, y, kk, nnn):
+        self.registers[m, x] = self.registers[m, y]
+
+    def op_8xy1(self, m, x, y, kk, nnn):
+        self.registers[m, x] |= self.registers[m, y]
+
+    def op_8xy2(self, m, x, y, kk, nnn):
+        self.registers[m, x] &= self.registers[m, y]
+
+    def op_8xy3(self, m, x, y, kk, nnn):
+        self.registers[m, x] ^= self.registers[m, y]
+
+    def op_8xy1_reset(self, m, x, y, kk, nnn):
+        self.registers[m, x] |= self.registers[m, y]
+        self.registers[m, 0xf] = 0
+
+    def op_8xy2_reset(self, m, x, y, kk, nnn):
+        self.registers[m, x] &= self.registers[m, y]
+        self.registers[m, 0xf] = 0
+
+    def op_8xy3_reset(self, m, x, y, kk, nnn):
+        self.registers[m, x] ^= self.registers[m, y]
+        self.registers[m, 0xf] = 0
+
+    def op_8xy4(self, m, x, y, kk, nnn):
+        total = self.registers[m, x].astype(np.int64) + self.registers[m, y]
+        self.registers[m, x] = total & 0xff
+        self.registers[m, 0xf] = total > 0xff
+
+    def op_8xy5(self, m, x, y, kk, nnn):
+        difference = self.registers[m, x].astype(np.int64) - self.registers[m, y]
+        self.registers[m, x] = difference & 0xff
+        self.registers[m, 0xf] = difference > 0
+
+    def op_8xy6(self, m, x, y, kk, nnn):
+        value = self.registers[m, x]
+        self.registers[m, x] = value >> 1
+        self.registers[m, 0xf] = value & 0x01
+
+    def op_8xy6_vy(self, m, x, y, kk, nnn):
+        value = self.registers[m, y]
+        self.registers[m, x] = value >> 1
+        self.registers[m, 0xf] = value & 0x01
+
+    def op_8xy7(self, m, x, y, kk, nnn):
+        difference = self.registers[m, y].astype(np.int64) - self.registers[m, x]
+        self.registers[m, x] = difference & 0xff
+        self.registers[m, 0xf] = difference > 0
+
+    def op_8xye(self, m, x, y, kk, nnn):
+        value = self.registers[m, x].astype(np.int64)
+        self.registers[m, x] = (value << 1) & 0xff
+        self.registers[m, 0xf] = (value >> 7) & 0x01
+
+    def op_8xye_vy(self, m, x, y, kk, nnn):
+        value = self.registers[m, y].astype(np.int64)
+        self.registers[m, x] = (value << 1) & 0xff
+        self.registers[m, 0xf] = (value >> 7) & 0x01
+
+    def op_9xy0(self, m, x, y, kk, nnn):
+        self.skip(m, self.registers[m, x] != self.registers[m, y])
+
+    def op_annn(self, m, x, y, kk, nnn):
+        self.I[m] = nnn
+
+    def op_bnnn(self, m, x, y, kk, nnn):
+        self.jump(m, (nnn + self.registers[m, 0]) & 0xfff)
+
+    def op_bxnn(self, m, x, y, kk, nnn):
+        self.jump(m, (nnn + self.registers[m, x]) & 0xfff)
+
+    def op_cxkk(self, m, x, y, kk, nnn):
+        random = self.random.integers(0, 256, size=len(m))
+        self.registers[m, x] = random & kk
+
+    def op_dxyn(self, m, x, y, kk, nnn):
+        self.draw(m, x, y, nnn, clip=False)
+
+    def op_dxyn_clip(self, m, x, y, kk, nnn):
+        self.draw(m, x, y, nnn, clip=True)
+
+    def draw(self, m, x, y, nnn, clip):
+        """Draw sprites, and wrap or clip them at the edges."""
+        n = nnn & 0xf
+        wide = (n == 0) & self.big
+        height = np.where(wide, 16, n)
+        X = (self.registers[m, x] & 0x3f).astype(U64)
+        Y = (self.registers[m, y] & 0x1f).astype(np.int64)
+        I = self.I[m]
+        self.registers[m, 0xf] = 0
+
+        collision = np.zeros(len(m), dtype=bool)
+        for i in range(int(height.max(initial=0))):
+            address = I + np.where(wide, 2 * i, i)
+            valid = (i < height) & (address + wide < 4096)
+            if clip:
+                valid &= Y + i < 32
+            if not valid.any():
+                continue
+            mm, XX, ww, aa = m[valid], X[valid], wide[valid], address[valid]
+            row = self.ram[mm, aa].astype(U64) << U64(56)
+            if ww.any():
+                low = self.ram[mm, np.minimum(aa + 1, 4095)].astype(U64)
+                row = np.where(ww, row | (low << U64(48)), row)
+            if clip:
+                shifted = row >> XX
+            else:
+                shifted = np.where(XX == 0, row,
+                                   (row >> XX) | (row << (U64(64) - XX)))
+            Y32 = (Y[valid] + i) & 0x1f
+            pixels = self.display[mm, Y32]
+            collision[valid] |= (pixels & shifted) != 0
+            self.display[mm, Y32] = pixels ^ shifted
+        self.registers[m, 0xf] = collision
+
+    def op_ex9e(self, m, x, y, kk, nnn):
+        key = self.registers[m, x] & 0xf
+        self.skip(m, ((self.keypad[m] >> key) & 0x1) == 1)
+
+    def op_exa1(self, m, x, y, kk, nnn):
+        key = self.registers[m, x] & 0xf
+        self.skip(m, ((self.keypad[m] >> key) & 0x1) == 0)
+
+    def op_fx07(self, m, x, y, kk, nnn):
+        self.registers[m, x] = self.delay_timer[m]
+
+    def op_fx0a(self, m, x, y, kk, nnn):
+        self.waiting[m] = x
+
+    def op_fx15(self, m, x, y, kk, nnn):
+        self.delay_timer[m] = self.registers[m, x]
+
+    def op_fx18(self, m, x, y, kk, nnn):
+        self.sound_timer[m] = self.registers[m, x]
+
+    def op_fx1e(self, m, x, y, kk, nnn):
+        self.I[m] = (self.I[m] + self.registers[m, x]) & 0xffff
+
+    def op_fx29(self, m, x, y, kk, nnn):
+        self.I[m] = (self.registers[m, x] & 0x0f).astype(np.int64) * 5
+
+    def op_fx30(self, m, x, y, kk, nnn):
+        self.I[m] = 0x50 + (self.registers[m, x] & 0x0f).astype(np.int64) * 10
+
+    def op_fx33(self, m, x, y, kk, nnn):
+        value = self.registers[m, x]
+        I = self.I[m]
+        digits = (value // 100, (value // 10) % 10, value % 10)
+        for i, digit in enumerate(digits):
+            ok = I + i < 4096
+            self.ram[m[ok], I[ok] + i] = digit[ok]
+        bad = I + 2 >= 4096
+        if bad.any():
+            self.halt(m[bad], ["bytearray index out of range"] * int(bad.sum()))
+
+    def transfer(self, m, x):
+        """Check bounds of op_fx55 and op_fx65 transfers.
+
+        Return selected machines, x and I.
+        """
+        I = self.I[m]
+        bad = I + x + 1 > 4096
+        if bad.any():
+            self.halt(m[bad], ["ram overflow"] * int(bad.sum()))
+        return m[~bad], x[~bad], I[~bad]
+
+    def op_fx55(self, m, x, y, kk, nnn):
+        m, x, I = self.transfer(m, x)
+        for i in range(16):
+            selected = i <= x
+            mm = m[selected]
+            self.ram[mm, I[selected] + i] = self.registers[mm, i]
+
+    def op_fx65(self, m, x, y, kk, nnn):
+        m, x, I = self.transfer(m, x)
+        for i in range(16):
+            selected = i <= x
+            mm = m[selected]
+            self.registers[mm, i] = self.ram[mm, I[selected] + i]
+
+    def op_fx55_increment(self, m, x, y, kk, nnn):
+        m, x, I = self.transfer(m, x)
+        for i in range(16):
+            selected = i <= x
+            mm = m[selected]
+            self.ram[mm, I[selected] + i] = self.registers[mm, i]
+        self.I[m] = (I + x + self.increment) & 0xffff
+
+    def op_fx65_increment(self, m, x, y, kk, nnn):
+        m, x, I = self.transfer(m, x)
+        for i in range(16):
+            selected = i <= x
+            mm = m[selected]
+            self.registers[mm, i] = self.ram[mm, I[selected] + i]
+        self.I[m] = (I + x + self.increment) & 0xffff
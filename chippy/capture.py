@@ -0,0 +1,235 @@
+"""Capture the display into an animated GIF or a sequence of PNG files.
+
+The display is captured once per virtual frame. Frames that are the same
+as the previous one only extend its duration, so static screens cost
+nothing. Images are encoded straight from the packed display rows, and
+each distinct frame is written as soon as the next one arrives, so the
+session is never kept in memory.
+
+Output images are 128 * scale by 64 * scale pixels. Low resolution
+pixels are twice as big as high resolution pixels.
+"""
+
+from pathlib import Path
+import struct
+import zlib
+
+RATE = 60
+# Virtual frames per second
+
+def expand_bits(scale):
+    """Make table of bytes with every bit repeated scale times."""
+    table = []
+    for byte in range(256):
+        bits = 0
+        for i in range(7, -1, -1):
+            bit = (byte >> i) & 1
+            bits = (bits << scale) | (bit * ((1 << scale) - 1))
+        table.append(bits.to_bytes(scale, "big"))
+    return table
+
+def expand_pixels(scale):
+    """Make table of pixel index bytes for every bit repeated scale times."""
+    table = []
+    for byte in range(256):
+        pixels = bytearray()
+        for i in range(7, -1, -1):
+            pixels += bytes([(byte >> i) & 1]) * scale
+        table.append(bytes(pixels))
+    return table
+
+def compress(pixels, min_size=2):
+    """Compress pixel indices with GIF-flavored LZW."""
+    clear = 1 << min_size
+    end = clear + 1
+    output = bytearray()
+    buffer = clear
+    count = size = min_size + 1
+    codes = {}
+    next_code = end + 1
+
+    prefix = pixels[0]
+    for pixel in pixels[1:]:
+        key = (prefix << 8) | pixel
+        code = codes.get(key)
+        if code is not None:
+            prefix = code
+            continue
+        buffer |= prefix << count
+        count += size
+        if next_code < 4096:
+            codes[key] = next_code
+            next_code += 1
+            if next_code > 1 << size:
+                size += 1
+        else:
+            buffer |= clear << count
+            count += size
+            codes.clear()
+            next_code = end + 1
+            size = min_size + 1
+        while count >= 8:
+            output.append(buffer & 0xff)
+            buffer >>= 8
+            count -= 8
+        prefix = pixel
+    buffer |= prefix << count
+    count += size
+    buffer |= end << count
+    count += size
+    output += buffer.to_bytes((count + 7) // 8, "little")
+    return bytes(output)
+
+def blocks(data):
+    """Split data into GIF sub-blocks."""
+    parts = []
+    for i in range(0, len(data), 255):
+        chunk = data[i:i + 255]
+        parts.append(bytes([len(chunk)]))
+        parts.append(chunk)
+    parts.append(b"\0")
+    return b"".join(parts)
+
+class GifWriter:
+    """Write frames into an animated GIF.
+
+    Each frame only covers the band of rows that changed since the
+    previous frame.
+    """
+    def __init__(self, fp, scale=2, colors=((0, 0, 0), (255, 255, 255))):
+        """Write into binary file."""
+        self.fp = fp
+        self.scale = scale
+        self.tables = {}
+        self.previous = None
+        self.time = 0
+        # Number of virtual frames written
+
+        fp.write(b"GIF89a")
+        fp.write(struct.pack("<HHBBB", 128 * scale, 64 * scale, 0x80, 0, 0))
+        fp.write(bytes(colors[0]) + bytes(colors[1]))
+        fp.write(b"\x21\xff\x0bNETSCAPE2.0\x03\x01\0\0\0")
+
+    def delay(self, frames):
+        """Get delay in hundredths of a second for frames after the others."""
+        start = self.time * 100 // RATE
+        self.time += frames
+        return self.time * 100 // RATE - start
+
+    def write(self, frame, repeats):
+        """Write frame that's shown for repeats virtual frames."""
+        width, height, rows = frame
+        pixel = self.scale * 128 // width
+        if pixel not in self.tables:
+            self.tables[pixel] = expand_pixels(pixel)
+        table = self.tables[pixel]
+
+        first, last = 0, height - 1
+        previous = self.previous
+        if previous is not None and previous[:2] == frame[:2]:
+            changed = [y for y in range(height) if rows[y] != previous[2][y]]
+            if changed:
+                first, last = changed[0], changed[-1]
+            else:
+                first = last = 0
+        self.previous = frame
+
+        parts = []
+        for row in rows[first:last + 1]:
+            line = b"".join(table[byte] for byte in row.to_bytes(width // 8, "big"))
+            parts.append(line * pixel)
+        pixels = b"".join(parts)
+
+        fp = self.fp
+        fp.write(struct.pack("<4BHBB", 0x21, 0xf9, 4, 0x04,
+                             self.delay(repeats), 0, 0))
+        fp.write(struct.pack("<BHHHHB", 0x2c, 0, first * pixel,
+                             128 * self.scale, (last - first + 1) * pixel, 0))
+        fp.write(b"\x02")
+        fp.write(blocks(compress(pixels)))
+
+    def close(self):
+        """End GIF."""
+        self.fp.write(b"\x3b")
+        self.fp.close()
+
+def chunk(kind, data):
+    """Pack PNG chunk."""
+    body = kind + data
+    return (struct.pack(">I", len(data)) + body
+            + struct.pack(">I", zlib.crc32(body)))
+
+class PngWriter:
+    """Write frames into a directory of 1-bit PNG files.
+
+    Files are named after the virtual frame they start on, and index.txt
+    lists the frame number, duration in frames and file name of each.
+    """
+    def __init__(self, directory, scale=2,
+                 colors=((0, 0, 0), (255, 255, 255))):
+        """Write into directory, which is created if it doesn't exist."""
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.scale = scale
+        self.palette = chunk(b"PLTE", bytes(colors[0]) + bytes(colors[1]))
+        self.tables = {}
+        self.time = 0
+        self.index = open(self.directory.joinpath("index.txt"), "w")
+
+    def write(self, frame, repeats):
+        """Write frame that's shown for repeats virtual frames."""
+        width, height, rows = frame
+        pixel = self.scale * 128 // width
+        if pixel not in self.tables:
+            self.tables[pixel] = expand_bits(pixel)
+        table = self.tables[pixel]
+
+        lines = []
+        for row in rows:
+            line = b"".join(table[byte] for byte in row.to_bytes(width // 8, "big"))
+            lines.append((b"\0" + line) * pixel)
+        header = struct.pack(">IIBBBBB", 128 * self.scale, 64 * self.scale,
+                             1, 3, 0, 0, 0)
+        name = f"{self.time:08d}.png"
+        with open(self.directory.joinpath(name), "wb") as fp:
+            fp.write(b"\x89PNG\r\n\x1a\n")
+            fp.write(chunk(b"IHDR", header))
+            fp.write(self.palette)
+            fp.write(chunk(b"IDAT", zlib.compress(b"".join(lines), 9)))
+            fp.write(chunk(b"IEND", b""))
+        self.index.write(f"{self.time} {repeats} {name}\n")
+        self.time += repeats
+
+    def close(self):
+        """Finish index."""
+        self.index.close()
+
+def open_writer(path, scale=2, colors=((0, 0, 0), (255, 255, 255))):
+    """Make GIF writer if path ends with .gif, or else a PNG writer."""
+    if str(path).lower().endswith(".gif"):
+        return GifWriter(open(path, "wb"), scale, colors)
+    return PngWriter(path, scale, colors)
+
+class Capture:
+    def __init__(self, writer):
+        """Capture display into writer."""
+        self.writer = writer
+        self.frame = None
+        self.repeats = 0
+
+    def add(self, display):
+        """Capture display, or extend the last frame if it didn't change."""
+        frame = (display.width, display.height, tuple(display.rows))
+        if frame == self.frame:
+            self.repeats += 1
+            return
+        if self.frame is not None:
+            self.writer.write(self.frame, self.repeats)
+        self.frame = frame
+        self.repeats = 1
+
+    def close(self):
+        """Write the last frame and close writer."""
+        if self.frame is not None:
+            self.writer.write(self.frame, self.repeats)
+        self.writer.close()
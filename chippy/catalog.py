@@ -0,0 +1,150 @@
+"""Index of ROMs with hashes and per-ROM settings.
+
+The index is a JSON file with the name, size, modification time and
+SHA-1 hash of every ROM in the catalog directories. Updates only hash
+new and modified files. Settings are stored by hash, so they follow ROMs
+that are renamed or moved.
+"""
+
+from collections import namedtuple
+import hashlib
+import json
+import os
+from pathlib import Path
+import string
+
+VERSION = 1
+
+ROMS = Path(__file__).parent.joinpath("roms")
+
+SETTINGS = ("clock_rate", "color_scheme", "engine", "quirks")
+# Config attributes that can be set per ROM
+
+Entry = namedtuple("Entry", "name path size mtime sha1")
+
+def default_index():
+    """Get path of index file in the user cache directory."""
+    cache = os.environ.get("XDG_CACHE_HOME") or Path.home().joinpath(".cache")
+    return Path(cache, "chippy", "catalog.json")
+
+def hash_file(path):
+    """Get SHA-1 hash of file as a hex string."""
+    with open(path, "rb") as fp:
+        return hashlib.sha1(fp.read()).hexdigest()
+
+class Catalog:
+    def __init__(self, index=None):
+        """Open catalog stored in index file (default: in user cache).
+
+        A missing or outdated index file is treated as empty.
+        """
+        self.index = Path(index) if index else default_index()
+        self.directories = [str(ROMS)]
+        self.entries = {}
+        # Entries by path
+        self.settings = {}
+        # Dicts of Config attributes by SHA-1 hash
+        self.modified = True
+        try:
+            with open(self.index) as fp:
+                data = json.load(fp)
+        except (OSError, ValueError):
+            return
+        if data.get("version") != VERSION:
+            return
+        for directory in data["directories"]:
+            if directory not in self.directories:
+                self.directories.append(directory)
+        self.entries = {entry[1]: Entry(*entry) for entry in data["roms"]}
+        self.settings = data["settings"]
+        self.modified = False
+
+    def add_directory(self, directory):
+        """Add directory of ROMs to the catalog."""
+        directory = str(Path(directory).resolve())
+        if directory not in self.directories:
+            self.directories.append(directory)
+            self.modified = True
+
+    def update(self):
+        """Index new and modified ROMs and forget deleted ones."""
+        entries = {}
+        for directory in self.directories:
+            try:
+                files = sorted(os.scandir(directory), key=lambda f: f.name)
+            except OSError:
+                continue
+            for file in files:
+                if not file.is_file():
+                    continue
+                stat = file.stat()
+                entry = self.entries.get(file.path)
+                if (entry is None or entry.size != stat.st_size
+                        or entry.mtime != stat.st_mtime_ns):
+                    entry = Entry(file.name, file.path, stat.st_size,
+                                  stat.st_mtime_ns, hash_file(file.path))
+                entries[file.path] = entry
+        if entries != self.entries:
+            self.entries = entries
+            self.modified = True
+
+    def save(self):
+        """Write index file if the catalog changed."""
+        if not self.modified:
+            return
+        data = {
+            "version": VERSION,
+            "directories": self.directories,
+            "roms": [list(entry) for entry in self.entries.values()],
+            "settings": self.settings,
+        }
+        self.index.parent.mkdir(parents=True, exist_ok=True)
+        temp = self.index.with_suffix(".tmp")
+        with open(temp, "w") as fp:
+            json.dump(data, fp, indent=1)
+        os.replace(temp, self.index)
+        self.modified = False
+
+    def find(self, key):
+        """Find ROM by name or by prefix of its SHA-1 hash.
+
+        Return Entry, or None if there's no match or if the hash prefix is
+        ambiguous. Names are matched case-insensitively if there's no exact
+        match. ROMs in earlier directories win.
+        """
+        entries = list(self.entries.values())
+        for entry in entries:
+            if entry.name == key:
+                return entry
+        for entry in entries:
+            if entry.name.lower() == key.lower():
+                return entry
+        prefix = key.lower()
+        if len(prefix) < 4 or not set(prefix) <= set(string.hexdigits):
+            return None
+        matches = {entry.sha1: entry for entry in entries
+                   if entry.sha1.startswith(prefix)}
+        if len(matches) == 1:
+            return matches.popitem()[1]
+        return None
+
+    def sha1(self, rom):
+        """Get SHA-1 hash of ROM file, from the index if it's up to date."""
+        path = str(Path(rom).resolve())
+        entry = self.entries.get(path)
+        if entry is not None:
+            stat = os.stat(path)
+            if entry.size == stat.st_size and entry.mtime == stat.st_mtime_ns:
+                return entry.sha1
+        return hash_file(path)
+
+    def configure(self, sha1, config):
+        """Apply settings of ROM with the given hash to config."""
+        for name, value in self.settings.get(sha1, {}).items():
+            if name in SETTINGS:
+                setattr(config, name, value)
+
+    def tune(self, sha1, config):
+        """Store settings in config as the settings of ROM."""
+        self.settings[sha1] = {name: getattr(config, name) for name in SETTINGS}
+        self.modified = True
@@ -3,16 +3,26 @@
 import array
 from collections import namedtuple
 import pathlib
+import random
 import time
 
-from .clock import stabilize_frame
-from .code import dispatch
+from . import frontend
+from .audio import NullAudio
+from .clock import FrameScheduler
+from .code import Dispatcher
 from .config import Config
 from .debug import Disassembler
+from .display import Display
 from .errors import ChippyError
 from .processor import ExecutionUnit
+from .savestate import position, restore, Rewind, save
 from .status import Mode
-from .window import buzz, Window
+from .translator import BlockTranslator
+
+ENGINES = {
+    "interpreter": ExecutionUnit,
+    "block": BlockTranslator,
+}
 
 class Chippy:
     def __init__(self, config=Config()):
@@ -28,25 +38,42 @@ class Chippy:
         self.stack = array.array('H', [0x0000] * 16)
 
         self.keypad = 0x0000
-        self.display = None
-        # 64-by-32 display
+        self.display = Display()
 
-        self.initialize_display()
         self.initialize_sprite_data()
 
         self.status = Mode.STOP
         self.waiting = []
+        self.cycle_count = 0
+        self.executed = 0
+        # Cycles simulated by the current run, kept up to date when it fails
+        self.frame_count = 0
+        self.frame_cycles = 0
+        # Cycles simulated in the current frame
+        self.rewind = None
+        self.rewinding = False
 
         self.config = config
-        self.disassembler = Disassembler()
-        self.execution_unit = ExecutionUnit(self)
+        self.audio = NullAudio()
+        self.disassembler = Disassembler(config.quirks)
+        self.execution_unit = ENGINES[config.engine](self)
+        self.execute = Dispatcher(self.execution_unit)
+        self.tracer = None
+        self.profiler = None
+        self.recorder = None
+        self.capture = None
+        self.debugger = None
 
-    def initialize_display(self):
-        """Clear display."""
-        self.display = array.array('Q', [0x0000000000000000] * 32)
+        self.seed = config.seed
+        if self.seed is None:
+            self.seed = random.getrandbits(64)
+        self.seed &= 0xffffffffffffffff
+        # Seeds are 64-bit, so that recordings can store them
+        self.random = random.Random(self.seed)
+        # Used by op_cxkk, so that runs with the same seed are repeatable
 
     def initialize_sprite_data(self):
-        """Initialize sprite data in locates 0x000 to 0x050."""
+        """Initialize sprite data in locates 0x000 to 0x0f0."""
         self.ram[:5]    = (0xf0, 0x90, 0x90, 0x90, 0xf0)
         self.ram[5:10]  = (0x20, 0x60, 0x20, 0x20, 0x70)
         self.ram[10:15] = (0Xf0, 0x10, 0xf0, 0x80, 0xf0)
@@ -64,6 +91,24 @@ class Chippy:
         self.ram[70:75] = (0xf0, 0x80, 0xf0, 0x80, 0xf0)
         self.ram[75:80] = (0xf0, 0x80, 0xf0, 0x80, 0x80)
 
+        # SUPER-CHIP 8-by-10 digits
+        self.ram[80:90]   = (0x3c, 0x7e, 0xe7, 0xc3, 0xc3, 0xc3, 0xc3, 0xe7, 0x7e, 0x3c)
+        self.ram[90:100]  = (0x18, 0x38, 0x58, 0x18, 0x18, 0x18, 0x18, 0x18, 0x18, 0x3c)
+        self.ram[100:110] = (0x3e, 0x7f, 0xc3, 0x06, 0x0c, 0x18, 0x30, 0x60, 0xff, 0xff)
+        self.ram[110:120] = (0x3c, 0x7e, 0xc3, 0x03, 0x0e, 0x0e, 0x03, 0xc3, 0x7e, 0x3c)
+        self.ram[120:130] = (0x06, 0x0e, 0x1e, 0x36, 0x66, 0xc6, 0xff, 0xff, 0x06, 0x06)
+        self.ram[130:140] = (0xff, 0xff, 0xc0, 0xc0, 0xfc, 0xfe, 0x03, 0xc3, 0x7e, 0x3c)
+        self.ram[140:150] = (0x3e, 0x7c, 0xc0, 0xc0, 0xfc, 0xfe, 0xc3, 0xc3, 0x7e, 0x3c)
+        self.ram[150:160] = (0xff, 0xff, 0x03, 0x06, 0x0c, 0x18, 0x30, 0x60, 0x60, 0x60)
+        self.ram[160:170] = (0x3c, 0x7e, 0xc3, 0xc3, 0x7e, 0x7e, 0xc3, 0xc3, 0x7e, 0x3c)
+        self.ram[170:180] = (0x3c, 0x7e, 0xc3, 0xc3, 0x7f, 0x3f, 0x03, 0x03, 0x3e, 0x7c)
+        self.ram[180:190] = (0x7e, 0xff, 0xc3, 0xc3, 0xc3, 0xff, 0xff, 0xc3, 0xc3, 0xc3)
+        self.ram[190:200] = (0xfc, 0xfc, 0xc3, 0xc3, 0xfc, 0xfc, 0xc3, 0xc3, 0xfc, 0xfc)
+        self.ram[200:210] = (0x3c, 0xff, 0xc3, 0xc0, 0xc0, 0xc0, 0xc0, 0xc3, 0xff, 0x3c)
+        self.ram[210:220] = (0xfc, 0xfe, 0xc3, 0xc3, 0xc3, 0xc3, 0xc3, 0xc3, 0xfe, 0xfc)
+        self.ram[220:230] = (0xff, 0xff, 0xc0, 0xc0, 0xff, 0xff, 0xc0, 0xc0, 0xff, 0xff)
+        self.ram[230:240] = (0xff, 0xff, 0xc0, 0xc0, 0xff, 0xff, 0xc0, 0xc0, 0xc0, 0xc0)
+
     def jump(self, target):
         """Jump to target location."""
         if target < 0x200 or target >= len(self.ram):
@@ -77,6 +122,7 @@ class Chippy:
         if size >= len(self.ram) - 0x200:
             raise ChippyError("Ran out of memory.")
         self.ram[0x200:size + 0x200] = binary
+        self.execution_unit.invalidate(0x200, size + 0x200)
 
     def fetch(self):
         """Fetch current instruction."""
@@ -97,33 +143,125 @@ class Chippy:
         if not self.waiting:
             instruction = self.fetch()
             self.increment()
-            print(dispatch(instruction, self.disassembler))
-            dispatch(instruction, self.execution_unit)
+            self.execute(instruction)
+
+    def step(self, cycles):
+        """Simulate cycles. Return number of cycles simulated.
+
+        Runs go through the debugger if there's one, so that it can stop
+        them early. If the run fails, the cycles it simulated, including
+        the one that failed, are still counted.
+        """
+        self.executed = 0
+        try:
+            if self.debugger is None:
+                cycles = self.simulate(cycles)
+            else:
+                cycles = self.debugger.run(cycles)
+        except BaseException:
+            cycles = self.executed
+            raise
+        finally:
+            self.cycle_count += cycles
+            self.frame_cycles += cycles
+        return cycles
+
+    def simulate(self, cycles):
+        """Simulate cycles on the tracer or the execution unit."""
+        if self.tracer is None:
+            return self.execution_unit.run(cycles)
+        return self.tracer.run(cycles)
+
+    def cycles_left(self):
+        """Get number of cycles left in the current frame."""
+        rate = int(self.config.clock_rate)
+        start = self.frame_count * rate // 60
+        stop = (self.frame_count + 1) * rate // 60
+        return stop - start - self.frame_cycles
+
+    def frame(self):
+        """Simulate one 60 Hz frame on virtual time.
+
+        If the run stops early, e.g. at a breakpoint, the frame is left
+        unfinished, and the next call simulates the rest of it.
+        """
+        cycles = self.cycles_left()
+        if cycles > 0 and self.step(cycles) < cycles:
+            return
+        self.end_frame()
+
+    def end_frame(self):
+        """Count down timers and keep the state at the end of the frame."""
+        self.frame_cycles = 0
+        self.frame_count += 1
+        self.countdown()
+        if self.capture is not None:
+            self.capture.add(self.display)
+        if self.rewind is not None:
+            self.rewind.push(save(self))
+
+    def start_rewind(self):
+        """Start rewinding.
+
+        The latest snapshot is dropped if it's the current state, so that
+        the first rewound frame already goes back.
+        """
+        if self.rewind is not None and not self.rewinding:
+            snapshot = self.rewind.pop()
+            current = (self.frame_count, self.frame_cycles)
+            if snapshot is not None and position(snapshot) != current:
+                self.rewind.push(snapshot)
+        self.rewinding = True
+
+    def rewind_frame(self):
+        """Restore state from the previous frame, if there is one."""
+        snapshot = self.rewind.pop()
+        if snapshot is not None:
+            restore(self, snapshot)
+        self.audio.update(0)
 
     def countdown(self):
-        """Decrement timers and perform timer-related actions."""
+        """Decrement timers and start or stop the buzzer."""
         if self.delay_timer > 0:
             self.delay_timer -= 1
         if self.sound_timer > 0:
             self.sound_timer -= 1
-            buzz()
+        self.audio.update(self.sound_timer)
 
     def run(self):
         """Run program stored in memory."""
         self.status = Mode.RUN
-        window = Window(self)
+        window = frontend.load(self.config.frontend)(self)
         window.init_screen()
+        if self.profiler is not None:
+            self.profiler.watch(window)
+        self.audio = window.audio()
+        if self.config.rewind_seconds > 0:
+            self.rewind = Rewind(capacity=self.config.rewind_seconds * 60)
 
-        stages = (self.cycle, window.handle_events, window.render)
-
-        timer_60Hz = 0.01667
+        scheduler = FrameScheduler()
         while self.status != Mode.STOP:
             if self.status == Mode.RUN:
-                elapsed = stabilize_frame(self.config.clock_period, *stages)
-                timer_60Hz -= elapsed
-                if timer_60Hz <= 0:
-                    timer_60Hz = 0.01667
-                    self.countdown()
-            elif self.status == Mode.PAUSE:
+                if self.waiting and not self.rewinding:
+                    if not (self.delay_timer or self.sound_timer):
+                        # Nothing happens until a key is pressed.
+                        scheduler.reset()
+                        window.wait_events()
+                        window.render()
+                        continue
+                    frames = scheduler.tick(window.wait_events)
+                else:
+                    frames = scheduler.tick()
                 window.handle_events()
+                for _ in range(frames):
+                    if self.rewinding and self.rewind is not None:
+                        self.rewind_frame()
+                    else:
+                        self.frame()
+                window.render()
+            elif self.status == Mode.PAUSE:
+                scheduler.reset()
+                self.audio.update(0)
+                window.wait_events()
                 window.render()
+        self.audio.update(0)
@@ -1,17 +1,44 @@
-"""Stabilize clock rate."""
+"""Stabilize frame rate."""
 
 import time
 
-def stabilize_frame(period, *functions):
-    """Sleep if the functions don't use up the entire frame period.
+class FrameScheduler:
+    """Schedule frames at a fixed rate using a monotonic deadline.
 
-    Return elapsed time in functions.
+    If frames fall behind schedule, several frames are due at once so that
+    the caller can catch up without rendering every frame.
+    If more than max_skip frames are due, the rest are dropped.
     """
-    start_time = time.time()
-    for f in functions:
-        f()
-    elapsed = time.time() - start_time
-    remaining = period - elapsed
-    if remaining > 0:
-        time.sleep(remaining)
-    return elapsed
+    def __init__(self, rate=60, max_skip=5):
+        self.period = 1 / rate
+        self.max_skip = max_skip
+        self.deadline = None
+
+    def reset(self):
+        """Restart schedule at the next tick."""
+        self.deadline = None
+
+    def tick(self, sleep=time.sleep):
+        """Sleep until the next frame is due.
+
+        sleep is called with the number of seconds until the next frame.
+        It may return early, e.g. to handle input, and then no frames are
+        due yet.
+        Return number of frames that are due.
+        """
+        now = time.perf_counter()
+        if self.deadline is None:
+            self.deadline = now
+        remaining = self.deadline - now
+        if remaining > 0:
+            sleep(remaining)
+            now = time.perf_counter()
+            if now < self.deadline:
+                return 0
+        due = int((now - self.deadline) / self.period) + 1
+        if due > self.max_skip:
+            due = self.max_skip
+            self.deadline = now + self.period
+        else:
+            self.deadline += due * self.period
+        return due
@@ -1,3 +1,4 @@
+import functools
 import random
 import sys
 
@@ -8,8 +9,10 @@ def classify(instruction):
 
     Return name of instruction handler and arguments.
     """
-    if instruction in (0x00e0, 0x00ee):
+    if instruction in (0x00e0, 0x00ee, 0x00fb, 0x00fc, 0x00fd, 0x00fe, 0x00ff):
         return f"op_{instruction:04x}",
+    if instruction & 0xfff0 == 0x00c0:
+        return "op_00cn", instruction & 0x000f
 
     opcode = instruction >> 12
 
@@ -62,84 +65,136 @@ def classify(instruction):
             return "op_exa1", x >> 8
     if opcode == 0xf:
         function = instruction & 0x00ff
-        if function in (0x07, 0x0a, 0x15, 0x18, 0x1e, 0x29, 0x33, 0x55, 0x65):
+        if function in (0x07, 0x0a, 0x15, 0x18, 0x1e, 0x29, 0x30, 0x33, 0x55,
+                        0x65):
             x = instruction & 0x0f00
             return f"op_fx{function:02x}", x >> 8
     return "",
 
-def dispatch(instruction, impl):
-    """Run instruction on implementation."""
+# Handler names by instruction group, for instructions that aren't decoded
+# from a single field.
+ZEROS = {
+    0xe0: "op_00e0", 0xee: "op_00ee", 0xfb: "op_00fb", 0xfc: "op_00fc",
+    0xfd: "op_00fd", 0xfe: "op_00fe", 0xff: "op_00ff",
+}
+EIGHTS = {n: f"op_8xy{n}" for n in range(8)}
+EIGHTS[0xe] = "op_8xye"
+KEYS = {0x9e: "op_ex9e", 0xa1: "op_exa1"}
+MISC = {kk: f"op_fx{kk:02x}" for kk in (0x07, 0x0a, 0x15, 0x18, 0x1e, 0x29,
+                                        0x30, 0x33, 0x55, 0x65)}
 
-    opcode = instruction >> 12
-    x = (instruction & 0xf00) >> 8
-    y = (instruction & 0xf0) >> 4
-    nnn = instruction & 0xfff
-    kk = instruction & 0xff
-    funct = instruction & 0xf
-
-    if opcode == 0:
-        if kk == 0xe0:
-            return impl.op_00e0()
-        elif kk == 0xee:
-            return impl.op_00ee()
-    elif opcode == 1:
-        return impl.op_1nnn(nnn)
-    elif opcode == 2:
-        return impl.op_2nnn(nnn)
-    elif opcode == 3:
-        return impl.op_3xkk(x, kk)
-    elif opcode == 4:
-        return impl.op_4xkk(x, kk)
-    elif opcode == 5:
-        if funct == 0:
-            return impl.op_5xy0(x, y)
-    elif opcode == 6:
-        return impl.op_6xkk(x, kk)
-    elif opcode == 7:
-        return impl.op_7xkk(x, kk)
-    elif opcode == 8:
-        if 0 <= funct <= 7:
-            return {
-                0: lambda: impl.op_8xy0(x, y),
-                1: lambda: impl.op_8xy1(x, y),
-                2: lambda: impl.op_8xy2(x, y),
-                3: lambda: impl.op_8xy3(x, y),
-                4: lambda: impl.op_8xy4(x, y),
-                5: lambda: impl.op_8xy5(x, y),
-                6: lambda: impl.op_8xy6(x, y),
-                7: lambda: impl.op_8xy7(x, y),
-            }[funct]()
-        elif funct == 0xe:
-            return impl.op_8xye(x, y)
-    elif opcode == 9:
-        if funct == 0:
-            return impl.op_9xy0(x, y)
-    elif opcode == 0xa:
-        return impl.op_annn(nnn)
-    elif opcode == 0xb:
-        return impl.op_bnnn(nnn)
-    elif opcode == 0xc:
-        return impl.op_cxkk(x, kk)
-    elif opcode == 0xd:
-        n = funct
-        return impl.op_dxyn(x, y, n)
-    elif opcode == 0xe:
-        if kk == 0x9e:
-            return impl.op_ex9e(x)
-        elif kk == 0xa1:
-            return impl.op_exa1(x)
-    elif opcode == 0xf:
-        case = {
-            0x07: lambda: impl.op_fx07(x),
-            0x0a: lambda: impl.op_fx0a(x),
-            0x15: lambda: impl.op_fx15(x),
-            0x18: lambda: impl.op_fx18(x),
-            0x1e: lambda: impl.op_fx1e(x),
-            0x29: lambda: impl.op_fx29(x),
-            0x33: lambda: impl.op_fx33(x),
-            0x55: lambda: impl.op_fx55(x),
-            0x65: lambda: impl.op_fx65(x),
-        }.get(kk)
-        if case:
-            return case()
+@functools.lru_cache(maxsize=None)
+def decode_table():
+    """Decode every 16-bit instruction.
+
+    Return tuple indexed by instruction. Each entry is the name of the
+    instruction handler and its arguments, as returned by classify.
+    The name is empty for instructions that dispatch doesn't handle, and
+    the only argument is the instruction.
+    Entries are built a group of 4096 instructions at a time, and argument
+    tuples are shared between groups.
+    """
+    lows = range(0x1000)
+    nnn = [(low,) for low in lows]
+    x = [(low >> 8,) for low in lows]
+    xkk = [(low >> 8, low & 0xff) for low in lows]
+    xy = [(low >> 8, (low >> 4) & 0xf) for low in lows]
+    xyn = [(low >> 8, (low >> 4) & 0xf, low & 0xf) for low in lows]
+
+    def fields(name, args):
+        name = sys.intern(name)
+        return [(name, args[low]) for low in lows]
+
+    def select(names, key, args, base):
+        group = []
+        for low in lows:
+            name = names.get(key(low), "")
+            if name:
+                group.append((name, args[low]))
+            else:
+                group.append(("", (base | low,)))
+        return group
+
+    # Only the lowest byte of 0nnn instructions is checked, and op_0nnn
+    # isn't supported.
+    zeros = {kk: sys.intern(name) for kk, name in ZEROS.items()}
+    zeros.update((0xc0 | n, sys.intern("op_00cn")) for n in range(16))
+    table = select(zeros, lambda low: low & 0xff,
+                   [(low & 0xf,) if low & 0xf0 == 0xc0 else ()
+                    for low in lows], 0x0000)
+    table += fields("op_1nnn", nnn)
+    table += fields("op_2nnn", nnn)
+    table += fields("op_3xkk", xkk)
+    table += fields("op_4xkk", xkk)
+    table += select({0: sys.intern("op_5xy0")}, lambda low: low & 0xf, xy,
+                    0x5000)
+    table += fields("op_6xkk", xkk)
+    table += fields("op_7xkk", xkk)
+    table += select({n: sys.intern(name) for n, name in EIGHTS.items()},
+                    lambda low: low & 0xf, xy, 0x8000)
+    table += select({0: sys.intern("op_9xy0")}, lambda low: low & 0xf, xy,
+                    0x9000)
+    table += fields("op_annn", nnn)
+    table += fields("op_bnnn", nnn)
+    table += fields("op_cxkk", xkk)
+    table += fields("op_dxyn", xyn)
+    table += select({kk: sys.intern(name) for kk, name in KEYS.items()},
+                    lambda low: low & 0xff, x, 0xe000)
+    table += select({kk: sys.intern(name) for kk, name in MISC.items()},
+                    lambda low: low & 0xff, x, 0xf000)
+    return tuple(table)
+
+@functools.lru_cache(maxsize=None)
+def handler_names():
+    """Get names of instruction handlers, with the empty name first."""
+    return ("",) + tuple(sorted({name for name, _ in decode_table() if name}))
+
+@functools.lru_cache(maxsize=None)
+def index_table():
+    """Decode every 16-bit instruction into the index of its handler name
+    in handler_names() and its arguments.
+    """
+    index = {name: i for i, name in enumerate(handler_names())}.__getitem__
+    return tuple([(index(name), args) for name, args in decode_table()])
+
+def invalid(instruction):
+    """Handle invalid instruction."""
     return ChippyError(f"Invalid instruction: {instruction:#06x}")
+
+class Dispatcher:
+    """Run instructions on implementation using a precomputed decode table.
+
+    The decode table is shared, and handlers are bound to the
+    implementation once per handler name, so dispatching an instruction
+    takes two table lookups.
+    """
+    def __init__(self, impl):
+        self.impl = impl
+        self.table = index_table()
+        self.handlers = self.bind(impl)
+
+    @staticmethod
+    def bind(impl):
+        """Bind handlers to impl in the order of handler_names()."""
+        return [invalid] + [getattr(impl, name) for name in handler_names()[1:]]
+
+    def lookup(self, instruction):
+        """Get bound handler and arguments of instruction."""
+        index, args = self.table[instruction]
+        return self.handlers[index], args
+
+    def __call__(self, instruction):
+        """Run instruction on implementation."""
+        index, args = self.table[instruction]
+        return self.handlers[index](*args)
+
+def dispatch(instruction, impl):
+    """Run instruction on implementation.
+
+    Prefer Dispatcher when running many instructions on the same
+    implementation.
+    """
+    name, args = decode_table()[instruction]
+    if name:
+        return getattr(impl, name)(*args)
+    return invalid(*args)
@@ -5,6 +5,12 @@ class Config:
     color_off = (0, 0, 0)
     color_on = (255, 255, 255)
     clock_rate = 500
+    engine = "interpreter"
+    quirks = "chippy"
+    frontend = "pygame"
+    threaded = False
+    rewind_seconds = 180
+    seed = None
 
     @property
     def color_scheme(self):
@@ -1,10 +1,37 @@
-"""Chip-8 debugger."""
+"""Chip-8 debugger.
+
+Every run goes through the debugger, but instructions only run one at a
+time while it has breakpoints or watchpoints, so a session without them
+runs at full speed. Breakpoints are looked up in a bitmap of addresses
+after every instruction, including instructions run by the tracer and
+the profiler. Watchpoints are only checked when an instruction stores
+into memory (fx33 and fx55).
+"""
+
+import cmd
+
+from .code import dispatch
+from .errors import ChippyError
+from .keypad import press, release
+from .quirks import PROFILES
+from .status import Mode
 
 class Disassembler:
+    def __init__(self, quirks="chippy"):
+        """Disassemble instructions the way they run under the quirk
+        profile.
+        """
+        if PROFILES[quirks].jump_vx:
+            self.op_bnnn = self.op_bxnn
+
     def op_0nnn(self, nnn):
         """Jump to routine at nnn."""
         return "nop"
 
+    def op_00cn(self, n):
+        """Scroll display down n rows."""
+        return f"scroll down {n}"
+
     def op_00e0(self):
         """Clear chip8 display."""
         return "clear"
@@ -13,6 +40,26 @@ class Disassembler:
         """Return from subroutine."""
         return "return"
 
+    def op_00fb(self):
+        """Scroll display right 4 pixels."""
+        return "scroll right"
+
+    def op_00fc(self):
+        """Scroll display left 4 pixels."""
+        return "scroll left"
+
+    def op_00fd(self):
+        """Exit interpreter."""
+        return "exit"
+
+    def op_00fe(self):
+        """Switch to 64-by-32 display and clear it."""
+        return "lores"
+
+    def op_00ff(self):
+        """Switch to 128-by-64 display and clear it."""
+        return "hires"
+
     def op_1nnn(self, nnn):
         """Jump to location nnn."""
         return f"jump {nnn:#05x}"
@@ -99,6 +146,10 @@ class Disassembler:
         """Jump to nnn + V0."""
         return f"jump V0 + {nnn:#05x}"
 
+    def op_bxnn(self, nnn):
+        """Jump to xnn + Vx."""
+        return f"jump V{nnn >> 8:x} + {nnn:#05x}"
+
     def op_cxkk(self, x, kk):
         """Set Vx = random byte & kk."""
         return f"V{x:x} = random & {kk:#04x}"
@@ -106,10 +157,13 @@ class Disassembler:
     def op_dxyn(self, x, y, nibble):
         """Display n-byte sprite starting at memory location I at (Vx, Vy).
 
-        The sprite is 8 pixels wide and n pixels tall.
+        The sprite is 8 pixels wide and n pixels tall, or 16-by-16 if n is
+        0.
         Set Vf = 1 iff any set pixels are unset.
         The sprite is drawn by XORing it with the display.
         """
+        if not nibble:
+            return f"display 16-by-16 sprite at (V{x:x}, V{y:x})"
         return f"display 8-by-{nibble} sprite at (V{x:x}, V{y:x})"
 
     def op_ex9e(self, x):
@@ -144,6 +198,10 @@ class Disassembler:
         """Set I to location of sprite for digit in Vx."""
         return f"I = sprite address of digit in V{x:x}"
 
+    def op_fx30(self, x):
+        """Set I to location of 8-by-10 sprite for digit in Vx."""
+        return f"I = large sprite address of digit in V{x:x}"
+
     def op_fx33(self, x):
         """Store the BCD representation of Vx in memory locations I, I+1 and I+2."""
         return f"I[:2] = bcd of value in V{x:x}"
@@ -161,3 +219,371 @@ class Disassembler:
         The value of I gets incremented by x + 1 afterwards.
         """
         return f"V[:{x:x} + 1] = I[:{x:x} + 1]\n\tI += {x} + 1"
+
+def parse_address(text):
+    """Parse hex address."""
+    address = int(text, 16)
+    if not 0 <= address < 4096:
+        raise ValueError(f"address out of range: {text}")
+    return address
+
+def parse_range(text):
+    """Parse hex address or range START-END (inclusive) as (start, stop)."""
+    start, _, end = text.partition("-")
+    start = parse_address(start)
+    end = parse_address(end) if end else start
+    if end < start:
+        raise ValueError(f"empty range: {text}")
+    return start, end + 1
+
+def parse_breakpoint(text):
+    """Parse hex address with optional condition, e.g. '2a4 if V3 == 5'."""
+    address, _, condition = text.partition(" if ")
+    condition = condition.strip() or None
+    if condition is not None:
+        try:
+            compile(condition, "<condition>", "eval")
+        except SyntaxError as error:
+            raise ValueError(f"invalid condition: {condition}") from error
+    return parse_address(address.strip()), condition
+
+class Debugger:
+    def __init__(self, chip8):
+        """Debug chip8."""
+        self.vm = chip8
+        self.breakpoints = bytearray(len(chip8.ram))
+        self.conditions = {}
+        # Source and code of breakpoint conditions by address
+        self.watchpoints = []
+        # (start, stop) ranges of RAM
+        self.until = None
+        # Program counter and stack pointer where step over stops
+        self.skip = None
+        # Address where the program was stopped, so that it can leave
+        self.reason = None
+        # Why the debugger stopped
+        self.patched = []
+
+    def patch(self, obj, name, function):
+        """Replace method of obj until the debugger detaches."""
+        self.patched.append((obj, name, obj.__dict__.get(name), function))
+        setattr(obj, name, function)
+
+    def attach(self):
+        """Check instructions and stores if there's anything to check."""
+        self.detach()
+        if not (self.breakpoints.count(1) or self.watchpoints
+                or self.until is not None):
+            return
+        vm = self.vm
+        self.original_cycle = vm.cycle
+        self.original_store = vm.execution_unit.store
+        self.patch(vm, "cycle", self.cycle)
+        self.patch(vm.execution_unit, "store", self.store)
+
+    def detach(self):
+        """Restore the methods replaced by the debugger."""
+        for obj, name, original, function in reversed(self.patched):
+            if obj.__dict__.get(name) != function:
+                continue
+            if original is None:
+                delattr(obj, name)
+            else:
+                setattr(obj, name, original)
+        self.patched.clear()
+
+    def add_breakpoint(self, address, condition=None):
+        """Stop before running instruction at address.
+
+        condition is a Python expression of registers V0 to Vf, I, PC,
+        SP, DT and ST. If it's given, only stop when it's true.
+        """
+        self.breakpoints[address] = 1
+        self.conditions.pop(address, None)
+        if condition is not None:
+            self.conditions[address] = (condition,
+                                        compile(condition, "<condition>", "eval"))
+        self.attach()
+
+    def remove_breakpoint(self, address):
+        """Remove breakpoint at address."""
+        self.breakpoints[address] = 0
+        self.conditions.pop(address, None)
+        self.attach()
+
+    def add_watchpoint(self, start, stop):
+        """Stop after an instruction stores into ram[start:stop]."""
+        self.watchpoints.append((start, stop))
+        self.attach()
+
+    def remove_watchpoint(self, start, stop):
+        """Remove watchpoint on ram[start:stop]."""
+        if (start, stop) in self.watchpoints:
+            self.watchpoints.remove((start, stop))
+        self.attach()
+
+    def namespace(self):
+        """Get variables of breakpoint conditions."""
+        vm = self.vm
+        names = {f"V{i:x}": v for i, v in enumerate(vm.registers)}
+        names.update({f"V{i:X}": v for i, v in enumerate(vm.registers)})
+        names.update(I=vm.I, PC=vm.program_counter, SP=vm.stack_pointer,
+                     DT=vm.delay_timer, ST=vm.sound_timer)
+        return names
+
+    def check(self, address):
+        """Check if breakpoint at address should stop."""
+        condition = self.conditions.get(address)
+        if condition is None:
+            return True
+        try:
+            return bool(eval(condition[1], {"__builtins__": {}},
+                             self.namespace()))
+        except Exception as error:
+            print(f"Condition at {address:#05x} failed: {error}", flush=True)
+            return True
+
+    def stop(self, reason):
+        """Pause and show where."""
+        self.reason = reason
+        self.vm.status = Mode.PAUSE
+        print(f"{reason}\n{self.view()}", flush=True)
+
+    def run(self, cycles):
+        """Simulate up to cycles, and stop at breakpoints and watchpoints.
+
+        Instructions run one at a time, on the tracer if there's one,
+        while there's anything to check. A breakpoint on the current
+        instruction stops right away, unless the program was stopped there.
+        Return number of cycles simulated.
+        """
+        vm = self.vm
+        if vm.status is Mode.PAUSE:
+            return 0
+        if not self.patched:
+            return vm.simulate(cycles)
+        self.reason = None
+        if not vm.waiting:
+            pc = vm.program_counter
+            if pc != self.skip and self.breakpoints[pc] and self.check(pc):
+                self.stop(f"Breakpoint at {pc:#05x}")
+                return 0
+            self.skip = None
+        if vm.tracer is not None:
+            return vm.tracer.run(cycles)
+        status = vm.status
+        cycle = vm.cycle
+        done = 0
+        try:
+            for done in range(1, cycles + 1):
+                cycle()
+                if vm.status is not status:
+                    return done
+            return cycles
+        finally:
+            vm.executed = done
+
+    def cycle(self):
+        """Simulate one cycle, and stop before the next instruction if it
+        has a breakpoint or if it ends a step over.
+        """
+        vm = self.vm
+        if vm.waiting:
+            return
+        self.original_cycle()
+        if self.reason is not None:
+            return
+        pc = vm.program_counter
+        if self.until == (pc, vm.stack_pointer):
+            self.until = None
+            self.attach()
+            self.stop(f"Stepped over call at {(pc - 2) & 0xfff:#05x}")
+        elif self.breakpoints[pc] and self.check(pc):
+            self.stop(f"Breakpoint at {pc:#05x}")
+
+    def store(self, start, stop):
+        """Notify execution unit of store and check watchpoints."""
+        self.original_store(start, stop)
+        for low, high in self.watchpoints:
+            if start < high and low < stop:
+                self.stop(f"Watchpoint {low:#05x}-{high - 1:#05x} "
+                          f"written by {self.vm.program_counter - 2:#05x}")
+                return
+
+    def resume(self):
+        """Continue running from the current instruction."""
+        self.skip = self.vm.program_counter
+        self.reason = None
+        self.vm.status = Mode.RUN
+
+    def step(self):
+        """Run one instruction, even if there's a breakpoint on it.
+
+        Finish the frame if it's the last instruction in the frame.
+        """
+        vm = self.vm
+        self.skip = vm.program_counter
+        self.reason = None
+        status = vm.status
+        vm.status = Mode.RUN
+        if vm.step(1) and vm.cycles_left() <= 0:
+            vm.end_frame()
+        if vm.status == Mode.RUN:
+            vm.status = status
+
+    def step_over(self):
+        """Run one instruction, or a whole subroutine if it's a call.
+
+        Return True if the program has to run until the call returns.
+        """
+        vm = self.vm
+        if vm.fetch() >> 12 != 2:
+            self.step()
+            return False
+        self.until = ((vm.program_counter + 2) & 0xfff, vm.stack_pointer)
+        self.attach()
+        self.resume()
+        return True
+
+    def view(self, before=4, after=6):
+        """Disassemble instructions around the program counter and show
+        registers.
+        """
+        vm = self.vm
+        pc = vm.program_counter
+        lines = []
+        start = max(pc - 2 * before, 0)
+        stop = min(pc + 2 * after, len(vm.ram) - 2)
+        for address in range(start, stop + 1, 2):
+            instruction = (vm.ram[address] << 8) | vm.ram[address + 1]
+            text = dispatch(instruction, vm.disassembler)
+            if isinstance(text, Exception):
+                text = str(text)
+            marker = ">" if address == pc else " "
+            mark = "*" if self.breakpoints[address] else " "
+            text = text.replace("\n\t", "; ")
+            lines.append(f"{marker}{mark} {address:#05x}  {instruction:04x}  {text}")
+        lines.append(" ".join(f"V{i:x}={v:02x}" for i, v in enumerate(vm.registers)))
+        lines.append(f"I={vm.I:#05x} PC={pc:#05x} SP={vm.stack_pointer} "
+                     f"DT={vm.delay_timer} ST={vm.sound_timer} "
+                     f"frame={vm.frame_count}")
+        return "\n".join(lines)
+
+class Shell(cmd.Cmd):
+    """Command line debugger that runs without a window."""
+    prompt = "(chippy) "
+
+    def __init__(self, debugger):
+        """Debug in the terminal."""
+        super().__init__()
+        self.debugger = debugger
+        self.vm = debugger.vm
+
+    def preloop(self):
+        """Show where the program is."""
+        print("Type help or ? to list commands.")
+        print(self.debugger.view())
+
+    def onecmd(self, line):
+        """Run command and report errors without quitting."""
+        try:
+            return super().onecmd(line)
+        except (ValueError, SyntaxError, NameError, ChippyError) as error:
+            print(f"Error: {error}")
+        except KeyboardInterrupt:
+            self.vm.status = Mode.PAUSE
+            print(f"Interrupted\n{self.debugger.view()}")
+        return False
+
+    def emptyline(self):
+        """Do nothing."""
+        return False
+
+    def frames(self, count=None):
+        """Run frames until the debugger stops or after count frames."""
+        vm = self.vm
+        done = 0
+        while vm.status == Mode.RUN and (count is None or done < count):
+            vm.frame()
+            done += 1
+        if vm.status == Mode.RUN:
+            vm.status = Mode.PAUSE
+            print(self.debugger.view())
+        elif vm.status == Mode.STOP:
+            print("Program exited.")
+        return vm.status == Mode.STOP
+
+    def do_break(self, arg):
+        """break ADDR [if COND]: stop at hex address (when COND is true)."""
+        address, condition = parse_breakpoint(arg)
+        self.debugger.add_breakpoint(address, condition)
+
+    def do_delete(self, arg):
+        """delete ADDR: remove breakpoint at hex address."""
+        self.debugger.remove_breakpoint(parse_address(arg))
+
+    def do_watch(self, arg):
+        """watch START[-END]: stop after stores into RAM range."""
+        self.debugger.add_watchpoint(*parse_range(arg))
+
+    def do_unwatch(self, arg):
+        """unwatch START[-END]: remove watchpoint."""
+        self.debugger.remove_watchpoint(*parse_range(arg))
+
+    def do_info(self, arg):
+        """info: list breakpoints and watchpoints."""
+        debugger = self.debugger
+        for address, value in enumerate(debugger.breakpoints):
+            if value:
+                condition = debugger.conditions.get(address)
+                suffix = f" if {condition[0]}" if condition else ""
+                print(f"break {address:#05x}{suffix}")
+        for start, stop in debugger.watchpoints:
+            print(f"watch {start:#05x}-{stop - 1:#05x}")
+
+    def do_step(self, arg):
+        """step [N]: run N instructions (default=1)."""
+        for _ in range(int(arg or 1)):
+            self.debugger.step()
+            if self.vm.status == Mode.STOP:
+                print("Program exited.")
+                return True
+            if self.debugger.reason is not None:
+                return False
+        print(self.debugger.view())
+
+    def do_next(self, arg):
+        """next: run one instruction, or a whole subroutine if it's a call."""
+        if self.debugger.step_over():
+            return self.frames()
+        print(self.debugger.view())
+
+    def do_continue(self, arg):
+        """continue [FRAMES]: run until a breakpoint or for FRAMES frames."""
+        self.debugger.resume()
+        return self.frames(int(arg) if arg else None)
+
+    def do_list(self, arg):
+        """list: show disassembly around the program counter and registers."""
+        print(self.debugger.view())
+
+    def do_press(self, arg):
+        """press KEY: press hex key on the keypad."""
+        press(self.vm, int(arg, 16) & 0xf)
+
+    def do_release(self, arg):
+        """release KEY: release hex key on the keypad."""
+        release(self.vm, int(arg, 16) & 0xf)
+
+    def do_quit(self, arg):
+        """quit: stop debugging."""
+        self.vm.status = Mode.STOP
+        return True
+
+    do_EOF = do_quit
+    do_b = do_break
+    do_s = do_step
+    do_n = do_next
+    do_c = do_continue
+    do_l = do_list
+    do_q = do_quit
@@ -0,0 +1,114 @@
+"""Chip-8 and SUPER-CHIP display."""
+
+class Display:
+    """Monochrome display with packed rows.
+
+    Each row is an int with one bit per pixel, and the leftmost pixel in
+    the most significant bit. Sprites and scrolls are whole-row bit
+    operations, so they cost the same in low and high resolution.
+    """
+    def __init__(self, width=64, height=32):
+        """Initialize blank width-by-height display."""
+        self.resize(width, height)
+
+    @property
+    def hires(self):
+        """Check if display is in 128-by-64 SUPER-CHIP mode."""
+        return self.width > 64
+
+    def resize(self, width, height):
+        """Change resolution and clear display."""
+        self.width = width
+        self.height = height
+        self.mask = (1 << width) - 1
+        self.clear()
+
+    def clear(self):
+        """Clear display."""
+        self.rows = [0] * self.height
+        self.dirty = (1 << self.height) - 1
+        # Bit mask of rows that changed since the last render
+
+    def draw(self, x, y, sprite, columns=8):
+        """XOR sprite onto display with its top-left corner at (x, y).
+
+        sprite is a sequence of rows that are columns pixels wide.
+        Out of screen parts of sprites wrap around to the other side.
+        Return True iff any set pixels are unset.
+        """
+        width = self.width
+        rows = self.rows
+        x &= width - 1
+        shift = width - columns - x
+        collision = 0
+        dirty = 0
+        for i, bits in enumerate(sprite):
+            if shift < 0:
+                line = (bits >> -shift) | ((bits << (width + shift)) & self.mask)
+            else:
+                line = bits << shift
+            index = (y + i) & (self.height - 1)
+            row = rows[index]
+            collision |= row & line
+            rows[index] = row ^ line
+            dirty |= 1 << index
+        self.dirty |= dirty
+        return collision != 0
+
+    def clip(self, x, y, sprite, columns=8):
+        """XOR sprite onto display like draw, but clip it at the edges.
+
+        Only the top-left corner wraps around. Parts of the sprite past the
+        right or bottom edge aren't drawn.
+        """
+        width = self.width
+        rows = self.rows
+        x &= width - 1
+        y &= self.height - 1
+        shift = width - columns - x
+        collision = 0
+        dirty = 0
+        for i, bits in enumerate(sprite[:self.height - y]):
+            if shift < 0:
+                line = bits >> -shift
+            else:
+                line = bits << shift
+            index = y + i
+            row = rows[index]
+            collision |= row & line
+            rows[index] = row ^ line
+            dirty |= 1 << index
+        self.dirty |= dirty
+        return collision != 0
+
+    def scroll_down(self, n):
+        """Scroll display down n rows."""
+        if n:
+            self.rows[n:] = self.rows[:-n]
+            self.rows[:n] = [0] * n
+            self.dirty = (1 << self.height) - 1
+
+    def scroll_right(self, n):
+        """Scroll display right n pixels."""
+        self.rows = [row >> n for row in self.rows]
+        self.dirty = (1 << self.height) - 1
+
+    def scroll_left(self, n):
+        """Scroll display left n pixels."""
+        mask = self.mask
+        self.rows = [(row << n) & mask for row in self.rows]
+        self.dirty = (1 << self.height) - 1
+
+    def tobytes(self):
+        """Pack rows into bytes, with the leftmost pixels first."""
+        size = self.width // 8
+        return b"".join(row.to_bytes(size, "big") for row in self.rows)
+
+    def frombytes(self, data):
+        """Unpack rows from bytes returned by tobytes."""
+        size = self.width // 8
+        self.rows = [
+            int.from_bytes(data[i:i + size], "big")
+            for i in range(0, size * self.height, size)
+        ]
+        self.dirty = (1 << self.height) - 1
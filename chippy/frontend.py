@@ -0,0 +1,25 @@
+"""Pluggable frontends.
+
+A frontend is a window class that shows the display of a chip-8, feeds
+it input and provides its buzzer. Frontends are only imported when a
+program runs in a window, so the emulator core doesn't depend on them.
+
+Frontend interface: Window(chip8) with a display attribute to render,
+init_screen(), audio(), render(), handle_event(event), handle_events()
+and wait_events(timeout=None).
+"""
+
+import importlib
+
+FRONTENDS = {
+    "pygame": "chippy.window:Window",
+}
+
+def register(name, spec):
+    """Register frontend window class given as 'module:class'."""
+    FRONTENDS[name] = spec
+
+def load(name):
+    """Import frontend and return its window class."""
+    module, _, attribute = FRONTENDS[name].partition(":")
+    return getattr(importlib.import_module(module), attribute)
@@ -0,0 +1,75 @@
+"""Run chip-8 programs without a window."""
+
+import array
+from collections import namedtuple
+
+from .status import Mode
+
+Result = namedtuple("Result", [
+    "display",      # rows of the display
+    "width",        # width of the display
+    "registers",
+    "I",
+    "program_counter",
+    "stack",
+    "stack_pointer",
+    "delay_timer",
+    "sound_timer",
+    "cycles",
+    "frames",
+])
+
+def run(chip8, cycles=None, frames=None, player=None):
+    """Run program stored in memory as fast as possible.
+
+    Stop after the given number of cycles or 60 Hz frames, whichever comes
+    first. Timers count down on virtual time, once per frame.
+    If player is a recording.Player, replay its input before every frame.
+    Return final state of the interpreter.
+    """
+    if cycles is None and frames is None:
+        raise ValueError("cycles or frames must be given")
+    chip8.status = Mode.RUN
+    while chip8.status != Mode.STOP:
+        if frames is not None and chip8.frame_count >= frames:
+            break
+        if player is not None:
+            player.apply(chip8)
+        if cycles is not None:
+            remaining = cycles - chip8.cycle_count
+            if remaining <= 0:
+                break
+            if chip8.cycles_left() > remaining:
+                chip8.step(remaining)
+                break
+        chip8.frame()
+    chip8.status = Mode.STOP
+    return result(chip8)
+
+def result(chip8):
+    """Copy state of interpreter."""
+    return Result(
+        display=tuple(chip8.display.rows),
+        width=chip8.display.width,
+        registers=bytes(chip8.registers),
+        I=chip8.I,
+        program_counter=chip8.program_counter,
+        stack=array.array('H', chip8.stack),
+        stack_pointer=chip8.stack_pointer,
+        delay_timer=chip8.delay_timer,
+        sound_timer=chip8.sound_timer,
+        cycles=chip8.cycle_count,
+        frames=chip8.frame_count,
+    )
+
+def show(result):
+    """Format framebuffer and registers of result."""
+    lines = []
+    for row in result.display:
+        lines.append(f"{row:0{result.width}b}".replace("0", ".").replace("1", "#"))
+    lines.append("")
+    lines.append(" ".join(f"V{i:x}={v:02x}" for i, v in enumerate(result.registers)))
+    lines.append(f"I={result.I:#05x} PC={result.program_counter:#05x} "
+                 f"DT={result.delay_timer} ST={result.sound_timer}")
+    lines.append(f"cycles={result.cycles} frames={result.frames}")
+    return "\n".join(lines)
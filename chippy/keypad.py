@@ -0,0 +1,21 @@
+"""Chip-8 keypad input."""
+
+def press(chip8, key):
+    """Press key on chip-8 keypad."""
+    if chip8.recorder is not None:
+        chip8.recorder.record(chip8.frame_count, key, True)
+    mask = 1 << key
+    chip8.keypad |= mask
+
+    # Handle op_fx0a
+    if chip8.waiting:
+        index = chip8.waiting.pop()
+        chip8.registers[index] = key
+
+def release(chip8, key):
+    """Release key on chip-8 keypad."""
+    if chip8.recorder is not None:
+        chip8.recorder.record(chip8.frame_count, key, False)
+    mask = 0xffff
+    mask -= (1 << key)
+    chip8.keypad &= mask
@@ -0,0 +1,243 @@
+"""Run two execution engines in lockstep and find where they diverge.
+
+Both machines run the same ROM with the same seed and input, and their
+states are compared every few instructions. When they differ, both are
+restored to the last matching state and the difference is bisected down
+to the first instruction that diverges.
+
+The candidate can be another execution engine, or "batch" for the
+vectorized batch engine running a single machine.
+"""
+
+from collections import namedtuple
+import copy
+
+from .chippy import Chippy
+from .code import dispatch
+from .debug import Disassembler
+from .errors import ChippyError
+from .recording import Player
+from .savestate import restore, save
+from .status import Mode
+
+Divergence = namedtuple("Divergence", [
+    "frame",
+    "cycle",
+    "address",
+    "instruction",
+    "differences",
+])
+# differences is a list of (field, reference value, candidate value)
+
+class BatchChippy(Chippy):
+    """Chippy that runs instructions on the batch engine.
+
+    The state is kept in Chippy between steps, and copied into a batch of
+    one machine for every step, so that input, snapshots and comparisons
+    work the same as for the other engines. NumPy can't draw the same
+    random bytes as the reference, so the random bytes of op_cxkk are
+    drawn again from self.random, which follows the reference's sequence.
+    Halted machines raise the batch engine's error message.
+    """
+    def step(self, cycles):
+        """Simulate cycles on the batch engine. Return number of cycles
+        simulated.
+        """
+        from .batch import BatchEngine
+
+        batch = BatchEngine.from_chippy(self, 1)
+        registers = batch.registers[0]
+        done = 0
+        while done < cycles and not batch.halted[0]:
+            done += 1
+            pc = int(batch.program_counter[0])
+            random = (batch.waiting[0] < 0 and pc + 1 < len(self.ram)
+                      and batch.ram[0, pc] >> 4 == 0xc)
+            batch.cycle()
+            if random and not batch.halted[0]:
+                x = batch.ram[0, pc] & 0xf
+                kk = int(batch.ram[0, pc + 1])
+                registers[x] = self.random.randint(0x00, 0xff) & kk
+        batch.to_chippy(0, self)
+        self.cycle_count += done
+        self.frame_cycles += done
+        if batch.halted[0]:
+            if batch.errors[0] is not None:
+                raise ChippyError(batch.errors[0])
+            self.status = Mode.STOP
+        return done
+
+def state(chip8, error=None):
+    """Get comparable state of chip8."""
+    display = chip8.display
+    return {
+        "error": error,
+        "status": chip8.status,
+        "registers": bytes(chip8.registers),
+        "I": chip8.I,
+        "program_counter": chip8.program_counter,
+        "stack_pointer": chip8.stack_pointer,
+        "stack": tuple(chip8.stack),
+        "delay_timer": chip8.delay_timer,
+        "sound_timer": chip8.sound_timer,
+        "waiting": tuple(chip8.waiting),
+        "ram": bytes(chip8.ram),
+        "display": (display.width, display.height, tuple(display.rows)),
+    }
+
+def advance(chip8, cycles):
+    """Simulate cycles and return state of chip8 afterwards.
+
+    Errors are compared by message, because the batch engine only keeps
+    the message.
+    """
+    try:
+        chip8.step(cycles)
+    except Exception as error:
+        return state(chip8, str(error) or type(error).__name__)
+    return state(chip8)
+
+def fetch(chip8):
+    """Fetch current instruction, or its first byte at the end of ram."""
+    pc = chip8.program_counter
+    if pc + 1 < len(chip8.ram):
+        return chip8.fetch()
+    return chip8.ram[pc] << 8
+
+def differences(a, b):
+    """List fields that differ between states."""
+    return [(name, a[name], b[name]) for name in a if a[name] != b[name]]
+
+class Lockstep:
+    def __init__(self, rom, config, candidate, reference="interpreter",
+                 recording=None):
+        """Load ROM into a reference and a candidate machine.
+
+        Both machines get the seed of the reference, and replay recording
+        if it's not None. The candidate can be "batch" for the batch
+        engine, which requires NumPy.
+        """
+        self.machines = []
+        for engine in (reference, candidate):
+            settings = copy.copy(config)
+            settings.engine = engine
+            if self.machines:
+                settings.seed = self.machines[0].seed
+            if engine == "batch":
+                settings.engine = "interpreter"
+                chip8 = BatchChippy(settings)
+            else:
+                chip8 = Chippy(settings)
+            chip8.load(rom)
+            self.machines.append(chip8)
+        self.players = [None, None]
+        if recording is not None:
+            self.players = [Player(recording), Player(recording)]
+        self.error = None
+        # Error that stopped both machines
+
+    def run(self, frames, interval=1000):
+        """Compare machines every interval instructions for frames.
+
+        Return Divergence, or None if they agree.
+        """
+        reference, candidate = self.machines
+        while reference.frame_count < frames:
+            for chip8, player in zip(self.machines, self.players):
+                if player is not None:
+                    player.apply(chip8)
+
+            size = reference.cycles_left()
+            done = 0
+            while done < size:
+                cycles = min(interval, size - done)
+                snapshot = save(reference)
+                seed = reference.random.getstate()
+                before = state(reference)
+                states = [advance(chip8, cycles) for chip8 in self.machines]
+                if states[0] != states[1]:
+                    return self.bisect(snapshot, seed, before, cycles)
+                if states[0]["error"]:
+                    self.error = states[0]["error"]
+                    return None
+                done += cycles
+
+            for chip8 in self.machines:
+                chip8.end_frame()
+        return None
+
+    def rewind(self, snapshot, seed, cycles):
+        """Restore both machines and simulate cycles. Return their states."""
+        states = []
+        for chip8 in self.machines:
+            restore(chip8, snapshot)
+            chip8.random.setstate(seed)
+            states.append(advance(chip8, cycles))
+        return states
+
+    def bisect(self, snapshot, seed, before, cycles):
+        """Find first instruction after snapshot where machines diverge.
+
+        If the machines don't diverge again when restored, only report the
+        state before and after the instructions that were compared.
+        """
+        low, high = 0, cycles
+        states = self.rewind(snapshot, seed, high)
+        if states[0] != states[1]:
+            while high - low > 1:
+                middle = (low + high) // 2
+                states = self.rewind(snapshot, seed, middle)
+                if states[0] == states[1]:
+                    low = middle
+                else:
+                    high = middle
+            self.rewind(snapshot, seed, low)
+            reference = self.machines[0]
+            address = reference.program_counter
+            instruction = fetch(reference)
+            states = [advance(chip8, 1) for chip8 in self.machines]
+        else:
+            self.rewind(snapshot, seed, 0)
+            reference = self.machines[0]
+            address = before["program_counter"]
+            instruction = fetch(reference)
+            states = [advance(chip8, cycles) for chip8 in self.machines]
+        return Divergence(
+            frame=reference.frame_count,
+            cycle=reference.cycle_count - 1,
+            address=address,
+            instruction=instruction,
+            differences=differences(*states),
+        )
+
+def describe(name, a, b):
+    """Describe difference in field."""
+    if name == "registers":
+        return ", ".join(f"V{i:x}={x:02x} != {y:02x}"
+                         for i, (x, y) in enumerate(zip(a, b)) if x != y)
+    if name == "ram":
+        index = next(i for i, (x, y) in enumerate(zip(a, b)) if x != y)
+        count = sum(x != y for x, y in zip(a, b))
+        return f"{count} bytes, first at {index:#05x}: {a[index]:#04x} != {b[index]:#04x}"
+    if name == "display":
+        if a[:2] != b[:2]:
+            return f"{a[0]}x{a[1]} != {b[0]}x{b[1]}"
+        rows = [y for y, (x, z) in enumerate(zip(a[2], b[2])) if x != z]
+        return f"rows {', '.join(map(str, rows))}"
+    if name in ("I", "program_counter"):
+        return f"{a:#05x} != {b:#05x}"
+    return f"{a!r} != {b!r}"
+
+def show(divergence, names=("reference", "candidate"), quirks="chippy"):
+    """Format divergence of machines with the quirk profile."""
+    text = dispatch(divergence.instruction, Disassembler(quirks))
+    if isinstance(text, Exception):
+        text = str(text)
+    lines = [
+        f"Engines diverge at frame {divergence.frame}, "
+        f"cycle {divergence.cycle} ({names[0]} != {names[1]}):",
+        f"{divergence.address:#05x}  {divergence.instruction:04x}  {text}",
+    ]
+    for name, a, b in divergence.differences:
+        lines.append(f"  {name}: {describe(name, a, b)}")
+    return "\n".join(lines)
@@ -0,0 +1,57 @@
+"""Run many ROMs headless on a process pool."""
+
+import glob
+import hashlib
+from pathlib import Path
+import time
+
+from . import headless
+from .catalog import ROMS
+from .chippy import Chippy
+from .config import Config
+
+def find_roms(pattern=None):
+    """Find ROMs in directory or glob pattern (default: bundled ROMs)."""
+    if not pattern:
+        return sorted(ROMS.glob("*"))
+    path = Path(pattern)
+    if path.is_dir():
+        return sorted(p for p in path.iterdir() if p.is_file())
+    return sorted(Path(p) for p in glob.glob(pattern) if Path(p).is_file())
+
+def run_rom(rom, config=Config(), cycles=None, frames=None):
+    """Run ROM headless and summarize the result.
+
+    Errors raised by the program are reported instead of raised. The
+    cycle count then includes the cycle that failed. The summary includes
+    the seed, so that runs with random seeds can be repeated.
+    """
+    start = time.perf_counter()
+    summary = {"rom": str(rom), "error": None}
+    chippy = Chippy(config)
+    try:
+        chippy.load(Path(rom))
+        headless.run(chippy, cycles=cycles, frames=frames)
+    except Exception as error:
+        summary["error"] = f"{type(error).__name__}: {error}"
+    summary.update(
+        seed=chippy.seed,
+        display_sha1=hashlib.sha1(chippy.display.tobytes()).hexdigest(),
+        cycles=chippy.cycle_count,
+        frames=chippy.frame_count,
+        seconds=time.perf_counter() - start,
+    )
+    return summary
+
+def run_roms(roms, config=Config(), cycles=None, frames=None, jobs=None):
+    """Run ROMs headless on a process pool with jobs workers.
+
+    The default is one worker per core. Yield summaries as ROMs finish.
+    """
+    from concurrent.futures import as_completed, ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(run_rom, rom, config, cycles, frames)
+                   for rom in roms]
+        for future in as_completed(futures):
+            yield future.result()
@@ -1,24 +1,187 @@
-import random
+from .code import decode_table
+from .display import Display
+from .quirks import PROFILES
+from .status import Mode
+
+# Instructions that only change registers, I and the program counter.
+# Loops made of these instructions can't change anything else, and only
+# depend on the timers and the keypad, which stay fixed within a step.
+PURE = {
+    "op_1nnn", "op_3xkk", "op_4xkk", "op_5xy0", "op_6xkk", "op_7xkk",
+    "op_8xy0", "op_8xy1", "op_8xy2", "op_8xy3", "op_8xy4", "op_8xy5",
+    "op_8xy6", "op_8xy7", "op_8xye", "op_9xy0", "op_annn", "op_bnnn",
+    "op_ex9e", "op_exa1", "op_fx07", "op_fx1e", "op_fx29", "op_fx30",
+    "op_fx65",
+}
+
+EXIT = (None, None)
+# Value of ExecutionUnit.loop after op_00fd, so that run stops right away
 
 class ExecutionUnit:
+    max_idle_period = 64
+
     def __init__(self, chip8):
         self.vm = chip8
+        self.loop = None
+        # Target and address of the last backward jump, or EXIT
+        self.last = None
+        # Loop target and state at the last backward jump
+        self.idle = None
+        # State and period of the last idle loop, until ram changes
+        self.busy = set()
+        # Targets of backward jumps that aren't idle loops
+        self.quirks = PROFILES[chip8.config.quirks]
+        self.specialize()
+
+    def specialize(self):
+        """Replace handlers of contested instructions with the ones for the
+        quirk profile.
+        """
+        quirks = self.quirks
+        if quirks.vf_reset:
+            self.op_8xy1 = self.op_8xy1_reset
+            self.op_8xy2 = self.op_8xy2_reset
+            self.op_8xy3 = self.op_8xy3_reset
+        if quirks.shift_vy:
+            self.op_8xy6 = self.op_8xy6_vy
+            self.op_8xye = self.op_8xye_vy
+        if quirks.increment is not None:
+            self.increment = quirks.increment
+            self.op_fx55 = self.op_fx55_increment
+            self.op_fx65 = self.op_fx65_increment
+        if quirks.jump_vx:
+            self.op_bnnn = self.op_bxnn
+        if quirks.big_lores:
+            self.op_dxyn = self.op_dxyn_big
+        self.draw = Display.clip if quirks.clip else Display.draw
+
+    def run(self, cycles):
+        """Simulate cycles. Return number of cycles simulated.
+
+        Stop right after the program exits.
+        """
+        cycle = self.vm.cycle
+        self.loop = None
+        remaining = cycles
+        try:
+            while remaining > 0:
+                for remaining in range(remaining - 1, -1, -1):
+                    cycle()
+                    if self.loop is not None:
+                        if self.loop is EXIT:
+                            self.loop = None
+                            return cycles - remaining
+                        remaining -= self.fast_forward(remaining)
+                        break
+            return cycles
+        finally:
+            self.vm.executed = cycles - remaining
+
+    def fast_forward(self, cycles):
+        """Skip idle loop that starts at the program counter.
+
+        If the loop in self.loop comes back to the same state twice in a
+        row, run one more iteration while checking that it only runs pure
+        instructions. If it comes back to the same state again, the loop
+        can't exit until the timers or the keypad change, so whole
+        iterations are skipped until there's not enough cycles left.
+        The loop is remembered until ram changes, so it can be skipped
+        right away the next time it's in the same state.
+        Return number of cycles simulated, at most cycles.
+        """
+        vm = self.vm
+        head, tail = self.loop
+        self.loop = None
+        if head in self.busy or vm.program_counter != head:
+            return 0
+        state = (head, bytes(vm.registers), vm.I, vm.delay_timer, vm.keypad)
+        if self.idle is not None and self.idle[0] == state:
+            period = self.idle[1]
+            return cycles // period * period
+        if state != self.last:
+            self.last = state
+            return 0
+
+        table = decode_table()
+        period = 0
+        limit = min(cycles, self.max_idle_period)
+        while period < limit:
+            instruction = vm.fetch()
+            if table[instruction][0] not in PURE:
+                if head <= vm.program_counter <= tail:
+                    self.busy.add(head)
+                break
+            vm.increment()
+            vm.execute(instruction)
+            period += 1
+            if vm.program_counter == head:
+                if state == (head, bytes(vm.registers), vm.I, vm.delay_timer,
+                             vm.keypad):
+                    self.idle = (state, period)
+                    period += (cycles - period) // period * period
+                break
+        else:
+            if period == self.max_idle_period:
+                self.busy.add(head)
+        self.loop = None
+        return period
+
+    def invalidate(self, start, stop):
+        """Notify execution unit that ram[start:stop] was overwritten."""
+        self.busy.clear()
+        self.idle = None
+
+    def store(self, start, stop):
+        """Notify execution unit that a store overwrote ram[start:stop]."""
+        self.idle = None
 
     def op_0nnn(self, nnn):
         """Jump to routine at nnn."""
         raise NotImplementedError
 
+    def op_00cn(self, n):
+        """Scroll display down n rows."""
+        self.vm.display.scroll_down(n)
+
     def op_00e0(self):
         """Clear chip8 display."""
-        self.vm.initialize_display()
+        self.vm.display.clear()
 
     def op_00ee(self):
         """Return from subroutine."""
         self.vm.stack_pointer -= 1
         self.vm.jump(self.vm.stack[self.vm.stack_pointer])
 
+    def op_00fb(self):
+        """Scroll display right 4 pixels."""
+        self.vm.display.scroll_right(4)
+
+    def op_00fc(self):
+        """Scroll display left 4 pixels."""
+        self.vm.display.scroll_left(4)
+
+    def op_00fd(self):
+        """Exit interpreter.
+
+        The program counter stays at this instruction, so the program can't
+        run past it.
+        """
+        self.vm.status = Mode.STOP
+        self.loop = EXIT
+        self.vm.program_counter = (self.vm.program_counter - 2) & 0x0fff
+
+    def op_00fe(self):
+        """Switch to 64-by-32 display and clear it."""
+        self.vm.display.resize(64, 32)
+
+    def op_00ff(self):
+        """Switch to 128-by-64 display and clear it."""
+        self.vm.display.resize(128, 64)
+
     def op_1nnn(self, nnn):
         """Jump to location nnn."""
+        if nnn < self.vm.program_counter:
+            self.loop = (nnn, self.vm.program_counter - 2)
         self.vm.jump(nnn)
 
     def op_2nnn(self, nnn):
@@ -66,16 +229,33 @@ class ExecutionUnit:
         """Set Vx = Vx XOR Vy."""
         self.vm.registers[x] ^= self.vm.registers[y]
 
+    def op_8xy1_reset(self, x, y):
+        """Set Vx = Vx OR Vy and reset Vf."""
+        self.vm.registers[x] |= self.vm.registers[y]
+        self.vm.registers[0xf] = 0
+
+    def op_8xy2_reset(self, x, y):
+        """Set Vx = Vx AND Vy and reset Vf."""
+        self.vm.registers[x] &= self.vm.registers[y]
+        self.vm.registers[0xf] = 0
+
+    def op_8xy3_reset(self, x, y):
+        """Set Vx = Vx XOR Vy and reset Vf."""
+        self.vm.registers[x] ^= self.vm.registers[y]
+        self.vm.registers[0xf] = 0
+
     def op_8xy4(self, x, y):
-        """Add Vy to Vx and set Vf to the carry bit."""
-        assert x != 0xf
+        """Add Vy to Vx and set Vf to the carry bit.
+
+        Vf is set last in this and the other arithmetic instructions, so it
+        holds the flag if x is f.
+        """
         total = self.vm.registers[x] + self.vm.registers[y]
         self.vm.registers[x] = total & 0xff
         self.vm.registers[0xf] = int(total > 0xff)
 
     def op_8xy5(self, x, y):
         """Subtract Vy from Vx and set Vf to 1 if there's no borrow."""
-        assert x != 0xf
         difference = self.vm.registers[x] - self.vm.registers[y]
         self.vm.registers[x] = difference & 0xff
         self.vm.registers[0xf] = int(difference > 0)   # or >= 0? (see Cowgod reference)
@@ -90,14 +270,18 @@ class ExecutionUnit:
         Vx should be shifted, not Vy.
         Vy should be ignored.
         """
-        assert x != 0xf
-        y = x
-        self.vm.registers[0xf] = self.vm.registers[y] & 0x01
-        self.vm.registers[x] = self.vm.registers[y] >> 1
+        value = self.vm.registers[x]
+        self.vm.registers[x] = value >> 1
+        self.vm.registers[0xf] = value & 0x01
+
+    def op_8xy6_vy(self, x, y):
+        """Set Vx = Vy >> 1, and set Vf to the LSB prior to the shift."""
+        value = self.vm.registers[y]
+        self.vm.registers[x] = value >> 1
+        self.vm.registers[0xf] = value & 0x01
 
     def op_8xy7(self, x, y):
         """Set Vx = Vy - Vx and set Vf to 1 if there's no borrow."""
-        assert x != 0xf
         difference = self.vm.registers[y] - self.vm.registers[x]
         self.vm.registers[x] = difference & 0xff
         self.vm.registers[0xf] = int(difference > 0)   # or >= 0?
@@ -110,10 +294,15 @@ class ExecutionUnit:
         - http://devernay.free.fr/hacks/chip8/C8TECH10.HTM
         """
         # NOTE should Vx or Vy be shifted? (see op_8xy6)
-        assert x != 0xf
-        y = x
-        self.vm.registers[0xf] = (self.vm.registers[y] >> 7) & 0x01
-        self.vm.registers[x] = (self.vm.registers[y] << 1) & 0xff
+        value = self.vm.registers[x]
+        self.vm.registers[x] = (value << 1) & 0xff
+        self.vm.registers[0xf] = (value >> 7) & 0x01
+
+    def op_8xye_vy(self, x, y):
+        """Set Vx = Vy << 1, and set Vf to the MSB prior to the shift."""
+        value = self.vm.registers[y]
+        self.vm.registers[x] = (value << 1) & 0xff
+        self.vm.registers[0xf] = (value >> 7) & 0x01
 
     def op_9xy0(self, x, y):
         """Skip next instruction if Vx != Vy."""
@@ -128,48 +317,54 @@ class ExecutionUnit:
         """Jump to nnn + V0."""
         self.vm.jump((nnn + self.vm.registers[0]) & 0xfff)
 
+    def op_bxnn(self, nnn):
+        """Jump to xnn + Vx."""
+        self.vm.jump((nnn + self.vm.registers[nnn >> 8]) & 0xfff)
+
     def op_cxkk(self, x, kk):
         """Set Vx = random byte & kk."""
-        self.vm.registers[x] = random.randint(0x00, 0xff) & kk
+        self.vm.registers[x] = self.vm.random.randint(0x00, 0xff) & kk
 
     def op_dxyn(self, x, y, nibble):
         """Display n-byte sprite starting at memory location I at (Vx, Vy).
 
-        The sprite is 8 pixels wide and n pixels tall.
+        The sprite is 8 pixels wide and n pixels tall. If n is 0, the
+        sprite is 16-by-16 with two bytes per row in 128-by-64 mode, and
+        nothing is drawn in 64-by-32 mode.
         Set Vf = 1 iff any set pixels are unset.
         The sprite is drawn by XORing it with the display.
 
-        Out of screen parts of sprites wrap around to the other side.
+        Out of screen parts of sprites wrap around to the other side, or
+        get clipped if the quirk profile says so.
         """
-        sprite = self.vm.ram[self.vm.I:self.vm.I + nibble]
-        X = self.vm.registers[x] & 0x3f
-        Y = self.vm.registers[y]
-        self.vm.registers[0xf] = 0
-
-        shift_amount = 56 - X
-        for i, row in enumerate(sprite):
-            if shift_amount < 0:
-                shifted_row = row >> -shift_amount
-                offscreen = row << (64 + shift_amount)
-                offscreen &= 0xffffffffffffffff
-                shifted_row |= offscreen
-            else:
-                shifted_row = row << shift_amount
-
-            Y32 = (Y + i) & 0x1f
-            xor = self.vm.display[Y32] ^ shifted_row
-            unset = self.vm.display[Y32] & shifted_row
-            self.vm.display[Y32] = xor
-
-            if shift_amount < 0:
-                offscreen = unset >> (64 + shift_amount)
-                unset <<= -shift_amount
-                unset |= offscreen
-            else:
-                unset >>= shift_amount
-            unset &= 0xff
-            self.vm.registers[0xf] |= unset
-        self.vm.registers[0xf] = 1 if self.vm.registers[0xf] else 0
+        vm = self.vm
+        if nibble or not vm.display.hires:
+            sprite = vm.ram[vm.I:vm.I + nibble]
+            columns = 8
+        else:
+            sprite = self.big_sprite()
+            columns = 16
+        collision = self.draw(vm.display, vm.registers[x], vm.registers[y],
+                              sprite, columns)
+        vm.registers[0xf] = 1 if collision else 0
+
+    def op_dxyn_big(self, x, y, nibble):
+        """Display sprite like op_dxyn, but 16-by-16 in both modes if n is 0."""
+        vm = self.vm
+        if nibble:
+            sprite = vm.ram[vm.I:vm.I + nibble]
+            columns = 8
+        else:
+            sprite = self.big_sprite()
+            columns = 16
+        collision = self.draw(vm.display, vm.registers[x], vm.registers[y],
+                              sprite, columns)
+        vm.registers[0xf] = 1 if collision else 0
+
+    def big_sprite(self):
+        """Get rows of 16-by-16 sprite at I."""
+        data = self.vm.ram[self.vm.I:self.vm.I + 32]
+        return [(data[i] << 8) | data[i + 1] for i in range(0, len(data) - 1, 2)]
 
     def op_ex9e(self, x):
         """Skip next instruction if key with the value of Vx is pressed."""
@@ -207,6 +402,10 @@ class ExecutionUnit:
         """Set I to location of sprite for digit in Vx."""
         self.vm.I = (self.vm.registers[x] & 0x0f) * 5
 
+    def op_fx30(self, x):
+        """Set I to location of 8-by-10 sprite for digit in Vx."""
+        self.vm.I = 0x50 + (self.vm.registers[x] & 0x0f) * 10
+
     def op_fx33(self, x):
         """Store the BCD representation of Vx in memory locations I, I+1 and I+2."""
         b = self.vm.registers[x] // 100
@@ -215,6 +414,7 @@ class ExecutionUnit:
         self.vm.ram[self.vm.I] = b
         self.vm.ram[self.vm.I+1] = c
         self.vm.ram[self.vm.I+2] = d
+        self.store(self.vm.I, self.vm.I + 3)
 
     def op_fx55(self, x):
         """Store registers V0 to Vx (inclusive) in memory starting at location I.
@@ -223,6 +423,18 @@ class ExecutionUnit:
         - http://mattmik.com/files/chip8/mastering/chip8.html
         """
         self.vm.ram[self.vm.I:self.vm.I + x+1] = self.vm.registers[:x+1]
+        self.store(self.vm.I, self.vm.I + x + 1)
+
+    def op_fx55_increment(self, x):
+        """Store registers V0 to Vx (inclusive) in memory starting at location I.
+
+        Then add x + self.increment to I.
+        """
+        vm = self.vm
+        start = vm.I
+        vm.ram[start:start + x + 1] = vm.registers[:x + 1]
+        vm.I = (start + x + self.increment) & 0xffff
+        self.store(start, start + x + 1)
 
     def op_fx65(self, x):
         """Read registers V0 through Vx (inclusive) from memory starting at I.
@@ -231,3 +443,12 @@ class ExecutionUnit:
         - http://mattmik.com/files/chip8/mastering/chip8.html
         """
         self.vm.registers[:x+1] = self.vm.ram[self.vm.I:self.vm.I + x + 1]
+
+    def op_fx65_increment(self, x):
+        """Read registers V0 through Vx (inclusive) from memory starting at I.
+
+        Then add x + self.increment to I.
+        """
+        vm = self.vm
+        vm.registers[:x + 1] = vm.ram[vm.I:vm.I + x + 1]
+        vm.I = (vm.I + x + self.increment) & 0xffff
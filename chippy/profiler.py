@@ -0,0 +1,166 @@
+"""Chip-8 profiler.
+
+Count and time instruction handlers, count instructions run at each
+address, and time the stages of the main loop. The profiler replaces
+methods of the interpreter, window and execution unit while it runs, so
+nothing is measured or slowed down when it's not in use.
+Instructions run one at a time while profiling, even with the block
+engine, so that every instruction goes through its handler.
+"""
+
+import array
+import json
+import time
+import types
+
+from .code import decode_table, dispatch, Dispatcher
+
+STAGES = ("cycle", "countdown", "handle_events", "render")
+
+class Profiler:
+    def __init__(self, chip8):
+        """Profile chip8."""
+        self.vm = chip8
+        names = sorted({name for name, _ in decode_table() if name})
+        self.counts = dict.fromkeys(names, 0)
+        self.times = dict.fromkeys(names, 0.0)
+        self.hot = array.array('L', [0] * len(chip8.ram))
+        self.stages = dict.fromkeys(STAGES, 0.0)
+        self.patched = []
+
+    def patch(self, obj, name, function):
+        """Replace method of obj until the profiler stops."""
+        self.patched.append((obj, name, obj.__dict__.get(name)))
+        setattr(obj, name, function)
+
+    def start(self):
+        """Start profiling."""
+        vm = self.vm
+        unit = vm.execution_unit
+        handlers = types.SimpleNamespace(**{
+            name: self.wrap_handler(name, getattr(unit, name))
+            for name in self.counts
+        })
+        self.patch(vm, "execute", Dispatcher(handlers))
+        self.patch(unit, "run", self.run)
+        self.patch(vm, "step", self.wrap_stage("cycle", vm.step))
+        self.patch(vm, "countdown", self.wrap_stage("countdown", vm.countdown))
+
+    def watch(self, window):
+        """Profile window stages."""
+        self.patch(window, "handle_events",
+                   self.wrap_stage("handle_events", window.handle_events))
+        self.patch(window, "render", self.wrap_stage("render", window.render))
+
+    def stop(self):
+        """Stop profiling and restore the original methods."""
+        for obj, name, original in reversed(self.patched):
+            if original is None:
+                delattr(obj, name)
+            else:
+                setattr(obj, name, original)
+        self.patched.clear()
+
+    def run(self, cycles):
+        """Simulate cycles one at a time. Return number of cycles simulated.
+
+        Stop early if an instruction changes the status of the interpreter.
+        """
+        vm = self.vm
+        cycle = vm.cycle
+        status = vm.status
+        done = 0
+        try:
+            for done in range(1, cycles + 1):
+                cycle()
+                if vm.status is not status:
+                    return done
+            return cycles
+        finally:
+            vm.executed = done
+
+    def wrap_handler(self, name, handler):
+        """Count and time calls to instruction handler."""
+        vm = self.vm
+        counts = self.counts
+        times = self.times
+        hot = self.hot
+        clock = time.perf_counter
+
+        def profiled(*args):
+            hot[(vm.program_counter - 2) & 0xfff] += 1
+            counts[name] += 1
+            start = clock()
+            try:
+                return handler(*args)
+            finally:
+                times[name] += clock() - start
+        return profiled
+
+    def wrap_stage(self, stage, function):
+        """Time calls to function."""
+        stages = self.stages
+        clock = time.perf_counter
+
+        def profiled(*args):
+            start = clock()
+            try:
+                return function(*args)
+            finally:
+                stages[stage] += clock() - start
+        return profiled
+
+    def report(self):
+        """Get profile as JSON object."""
+        return {
+            "cycles": self.vm.cycle_count,
+            "frames": self.vm.frame_count,
+            "opcodes": {
+                name: {"count": count, "seconds": self.times[name]}
+                for name, count in self.counts.items() if count
+            },
+            "addresses": {
+                f"{address:#05x}": count
+                for address, count in enumerate(self.hot) if count
+            },
+            "stages": dict(self.stages),
+        }
+
+    def save(self, fp):
+        """Write JSON report to text file."""
+        json.dump(self.report(), fp, indent=2)
+        fp.write("\n")
+
+    def show(self, top=10):
+        """Format tables of the top opcodes, addresses and stages."""
+        vm = self.vm
+        disassembler = vm.disassembler
+        total = sum(self.times.values()) or 1
+        lines = [f"{'opcode':<10}{'count':>12}{'seconds':>12}{'%':>8}"]
+        opcodes = sorted(self.counts, key=self.times.get, reverse=True)
+        for name in opcodes[:top]:
+            if not self.counts[name]:
+                break
+            seconds = self.times[name]
+            lines.append(f"{name:<10}{self.counts[name]:>12}{seconds:>12.6f}"
+                         f"{100 * seconds / total:>8.1f}")
+
+        lines.append("")
+        lines.append(f"{'address':<10}{'count':>12}  instruction")
+        addresses = sorted(range(len(self.hot)), key=self.hot.__getitem__,
+                           reverse=True)
+        for address in addresses[:top]:
+            if not self.hot[address]:
+                break
+            instruction = (vm.ram[address] << 8) | vm.ram[(address + 1) & 0xfff]
+            text = dispatch(instruction, disassembler)
+            if isinstance(text, Exception):
+                text = str(text)
+            lines.append(f"{address:<#10x}{self.hot[address]:>12}  "
+                         f"{instruction:04x}  {text}")
+
+        lines.append("")
+        lines.append(f"{'stage':<14}{'seconds':>12}")
+        for stage, seconds in self.stages.items():
+            lines.append(f"{stage:<14}{seconds:>12.6f}")
+        return "\n".join(lines)
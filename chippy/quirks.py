@@ -0,0 +1,34 @@
+"""Quirk profiles.
+
+Interpreters disagree on what a few instructions do. A profile picks one
+behavior for each of them. Engines pick specialized handlers for their
+profile once when they're created, so handlers never check quirks.
+"""
+
+from collections import namedtuple
+
+Quirks = namedtuple("Quirks", [
+    "vf_reset",     # op_8xy1, op_8xy2 and op_8xy3 reset Vf
+    "shift_vy",     # op_8xy6 and op_8xye shift Vy into Vx, not Vx in place
+    "increment",    # op_fx55 and op_fx65 add x + increment to I, or leave
+                    # I alone if None
+    "jump_vx",      # op_bnnn jumps to xnn + Vx, not nnn + V0
+    "clip",         # sprites are clipped at the edges instead of wrapping
+    "big_lores",    # op_dxyn with n = 0 draws a 16-by-16 sprite in 64-by-32
+                    # mode too, instead of nothing
+])
+
+PROFILES = {
+    "chippy": Quirks(vf_reset=False, shift_vy=False, increment=None,
+                     jump_vx=False, clip=False, big_lores=False),
+    "vip": Quirks(vf_reset=True, shift_vy=True, increment=1,
+                  jump_vx=False, clip=True, big_lores=False),
+    "chip48": Quirks(vf_reset=False, shift_vy=False, increment=0,
+                     jump_vx=True, clip=True, big_lores=False),
+    "schip": Quirks(vf_reset=False, shift_vy=False, increment=None,
+                    jump_vx=True, clip=True, big_lores=True),
+}
+# chippy: what chippy has always done
+# vip: COSMAC VIP
+# chip48: CHIP-48 on the HP-48
+# schip: SUPER-CHIP 1.1
@@ -0,0 +1,90 @@
+"""Record keypad input and replay it.
+
+A recording stores the keys pressed and released on every 60 Hz frame,
+along with the RNG seed and clock rate of the session. Replaying it on
+the same ROM repeats the session exactly.
+
+Recording file format: header, then one record per key event and an end
+record with the number of frames in the session.
+"""
+
+from collections import namedtuple
+import struct
+
+from .keypad import press, release
+
+MAGIC = b"CH8I"
+VERSION = 1
+
+HEADER = struct.Struct("<4sBQI20s")
+# magic, version, seed, clock rate, SHA-1 hash of ROM
+
+EVENT = struct.Struct("<IB")
+# frame, key (bits 0-3) and pressed (bit 4), or END
+
+END = 0xff
+
+Recording = namedtuple("Recording", "seed clock_rate sha1 events frames")
+# events is a list of (frame, key, pressed) tuples
+
+class Recorder:
+    def __init__(self, chip8, sha1):
+        """Record input to chip8 running ROM with the given SHA-1 hash."""
+        self.seed = chip8.seed
+        self.clock_rate = int(chip8.config.clock_rate)
+        self.sha1 = sha1
+        self.events = []
+
+    def record(self, frame, key, pressed):
+        """Record key event before frame."""
+        self.events.append((frame, key, pressed))
+
+    def truncate(self, frame):
+        """Forget events after frame, e.g. after rewinding to it."""
+        while self.events and self.events[-1][0] > frame:
+            self.events.pop()
+
+    def save(self, fp, frames):
+        """Write recording of session that lasted frames to binary file."""
+        fp.write(HEADER.pack(MAGIC, VERSION, self.seed, self.clock_rate,
+                             self.sha1))
+        for frame, key, pressed in self.events:
+            fp.write(EVENT.pack(frame, key | (pressed << 4)))
+        fp.write(EVENT.pack(frames, END))
+
+def load(fp):
+    """Read recording from binary file."""
+    data = fp.read()
+    magic, version, seed, clock_rate, sha1 = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a chippy recording.")
+    body = data[HEADER.size:]
+    body = body[:len(body) - len(body) % EVENT.size]
+    events = []
+    frames = None
+    for frame, value in EVENT.iter_unpack(body):
+        if value == END:
+            frames = frame
+            break
+        events.append((frame, value & 0xf, bool(value >> 4)))
+    if frames is None:
+        frames = events[-1][0] if events else 0
+    return Recording(seed, clock_rate, sha1, events, frames)
+
+class Player:
+    def __init__(self, recording):
+        """Replay recorded events."""
+        self.events = recording.events
+        self.index = 0
+
+    def apply(self, chip8):
+        """Press and release the keys recorded before the current frame."""
+        events = self.events
+        while (self.index < len(events)
+               and events[self.index][0] <= chip8.frame_count):
+            _, key, pressed = events[self.index]
+            if pressed:
+                press(chip8, key)
+            else:
+                release(chip8, key)
+            self.index += 1
@@ -0,0 +1,146 @@
+"""Save states and rewind buffer.
+
+A snapshot is a header followed by bulk copies of the ram, registers,
+stack and display buffers, and the state of the random number generator.
+The stack and the generator state use native byte order, and display
+rows are packed with the leftmost pixels first.
+"""
+
+import array
+from collections import deque
+import struct
+import zlib
+
+from .errors import ChippyError
+
+MAGIC = b"CH8S"
+VERSION = 4
+
+HEADER = struct.Struct("<4sBHBBHBHBBBQQI")
+# magic, version, I, delay timer, sound timer, program counter,
+# stack pointer, keypad, display width, display height,
+# number of waiting registers, cycle count, frame count,
+# cycles simulated in the current frame
+
+WAITING_SIZE = 16
+
+RANDOM_SIZE = 625
+# Mersenne Twister state words and position
+
+def save(chip8):
+    """Take snapshot of chip8 state."""
+    waiting = bytes(chip8.waiting)
+    if len(waiting) > WAITING_SIZE:
+        raise ChippyError("Too many pending key waits.")
+    header = HEADER.pack(
+        MAGIC, VERSION, chip8.I, chip8.delay_timer, chip8.sound_timer,
+        chip8.program_counter, chip8.stack_pointer, chip8.keypad,
+        chip8.display.width, chip8.display.height, len(waiting),
+        chip8.cycle_count, chip8.frame_count, chip8.frame_cycles,
+    )
+    return b"".join([
+        header,
+        waiting.ljust(WAITING_SIZE, b"\0"),
+        chip8.ram,
+        chip8.registers,
+        chip8.stack.tobytes(),
+        chip8.display.tobytes(),
+        array.array("I", chip8.random.getstate()[1]).tobytes(),
+    ])
+
+def restore(chip8, snapshot):
+    """Restore chip8 state from snapshot."""
+    (magic, version, chip8.I, chip8.delay_timer, chip8.sound_timer,
+     chip8.program_counter, chip8.stack_pointer, chip8.keypad, width, height,
+     waiting, chip8.cycle_count, chip8.frame_count,
+     chip8.frame_cycles) = HEADER.unpack_from(snapshot)
+    if magic != MAGIC or version != VERSION:
+        raise ChippyError("Invalid snapshot.")
+
+    view = memoryview(snapshot)
+    offset = HEADER.size
+    chip8.waiting[:] = view[offset:offset + waiting]
+    offset += WAITING_SIZE
+
+    for buffer in (chip8.ram, chip8.registers):
+        buffer[:] = view[offset:offset + len(buffer)]
+        offset += len(buffer)
+
+    stack = array.array(chip8.stack.typecode)
+    stack.frombytes(view[offset:offset + len(chip8.stack) * stack.itemsize])
+    chip8.stack[:] = stack
+    offset += len(stack) * stack.itemsize
+
+    chip8.display.resize(width, height)
+    chip8.display.frombytes(view[offset:offset + width * height // 8])
+    offset += width * height // 8
+
+    state = array.array("I")
+    state.frombytes(view[offset:offset + RANDOM_SIZE * state.itemsize])
+    chip8.random.setstate((3, tuple(state), None))
+    if chip8.recorder is not None:
+        chip8.recorder.truncate(chip8.frame_count)
+    chip8.execution_unit.invalidate(0, len(chip8.ram))
+
+def position(snapshot):
+    """Get frame count and cycles simulated in the frame of snapshot."""
+    return HEADER.unpack_from(snapshot)[-2:]
+
+def xor(a, b):
+    """XOR byte strings of equal length."""
+    size = len(a)
+    x = int.from_bytes(a, "little") ^ int.from_bytes(b, "little")
+    return x.to_bytes(size, "little")
+
+class Rewind:
+    """Ring buffer of snapshots.
+
+    Snapshots are grouped behind keyframes. The keyframe of each group is
+    stored as is, and the other snapshots are stored as compressed XOR
+    deltas against the keyframe. The oldest group is dropped when the
+    buffer is full.
+    """
+    def __init__(self, capacity=60 * 60 * 3, interval=60 * 5):
+        """Store up to capacity snapshots with a keyframe every interval."""
+        self.capacity = capacity
+        self.interval = interval
+        self.groups = deque()
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def push(self, snapshot):
+        """Store snapshot."""
+        if self.groups:
+            keyframe, deltas = self.groups[-1]
+            if len(deltas) + 1 < self.interval and len(keyframe) == len(snapshot):
+                deltas.append(zlib.compress(xor(keyframe, snapshot), 1))
+                self.size += 1
+                self.trim()
+                return
+        self.groups.append((snapshot, []))
+        self.size += 1
+        self.trim()
+
+    def trim(self):
+        """Drop oldest groups until the buffer fits."""
+        while self.size > self.capacity and len(self.groups) > 1:
+            _, deltas = self.groups.popleft()
+            self.size -= len(deltas) + 1
+
+    def pop(self):
+        """Remove and return the latest snapshot, or None if empty."""
+        if not self.groups:
+            return None
+        keyframe, deltas = self.groups[-1]
+        self.size -= 1
+        if not deltas:
+            self.groups.pop()
+            return keyframe
+        return xor(keyframe, zlib.decompress(deltas.pop()))
+
+    def clear(self):
+        """Remove all snapshots."""
+        self.groups.clear()
+        self.size = 0
@@ -0,0 +1,229 @@
+"""Stream the display of a running chip-8 over a Unix domain socket.
+
+The server runs frames at 60 Hz and sends every client the display rows
+that changed in each frame. Nothing is sent while the screen doesn't
+change. Clients get the whole display when they connect and whenever the
+resolution changes.
+
+Server messages: a FRAME header, then one record per changed row with
+the row index and the row packed with the leftmost pixels first.
+Client messages: one byte per key event, with the key in bits 0-3 and
+whether it's pressed in bit 4.
+"""
+
+import os
+import selectors
+import socket
+import stat
+import struct
+
+from .clock import FrameScheduler
+from .display import Display
+from .keypad import press, release
+from .status import Mode
+
+FRAME = struct.Struct("<IBBB")
+# frame number, display width, display height, number of rows that follow
+
+class Server:
+    def __init__(self, chip8, path, max_pending=1 << 20):
+        """Serve chip8 on Unix socket at path.
+
+        Clients that fall more than max_pending bytes behind are dropped.
+        """
+        self.chip8 = chip8
+        self.path = path
+        self.max_pending = max_pending
+        self.selector = selectors.DefaultSelector()
+        self.clients = {}
+        # Pending output by client socket
+        self.rows = None
+        self.size = None
+        # Last sent display
+
+        try:
+            if stat.S_ISSOCK(os.stat(path).st_mode):
+                os.unlink(path)
+        except FileNotFoundError:
+            pass
+        # Remove stale socket left by a server that didn't close
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.listener.bind(path)
+        self.listener.listen()
+        self.listener.setblocking(False)
+        self.selector.register(self.listener, selectors.EVENT_READ)
+
+    def close(self):
+        """Disconnect clients and remove socket."""
+        for client in list(self.clients):
+            self.drop(client)
+        self.selector.unregister(self.listener)
+        self.listener.close()
+        self.selector.close()
+        os.unlink(self.path)
+
+    def drop(self, client):
+        """Disconnect client."""
+        del self.clients[client]
+        self.selector.unregister(client)
+        client.close()
+
+    def message(self, rows):
+        """Pack message with the given display rows."""
+        display = self.chip8.display
+        size = display.width // 8
+        parts = [FRAME.pack(self.chip8.frame_count, display.width,
+                            display.height, len(rows))]
+        for y in rows:
+            parts.append(bytes([y]))
+            parts.append(display.rows[y].to_bytes(size, "big"))
+        return b"".join(parts)
+
+    def send(self, client, data):
+        """Queue data for client and send as much as possible right away."""
+        pending = self.clients[client]
+        pending += data
+        try:
+            sent = client.send(pending)
+        except BlockingIOError:
+            sent = 0
+        except OSError:
+            self.drop(client)
+            return
+        del pending[:sent]
+        if len(pending) > self.max_pending:
+            self.drop(client)
+            return
+        events = selectors.EVENT_READ
+        if pending:
+            events |= selectors.EVENT_WRITE
+        self.selector.modify(client, events)
+
+    def accept(self):
+        """Accept client and send it the whole display."""
+        client, _ = self.listener.accept()
+        client.setblocking(False)
+        self.clients[client] = bytearray()
+        self.selector.register(client, selectors.EVENT_READ)
+        self.send(client, self.message(range(self.chip8.display.height)))
+
+    def receive(self, client):
+        """Apply key events from client."""
+        try:
+            data = client.recv(4096)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self.drop(client)
+            return
+        for value in data:
+            if value >> 5:
+                continue
+            if value >> 4:
+                press(self.chip8, value & 0xf)
+            else:
+                release(self.chip8, value & 0xf)
+
+    def poll(self, timeout=0):
+        """Handle socket events for up to timeout seconds."""
+        for key, events in self.selector.select(timeout):
+            sock = key.fileobj
+            if sock is self.listener:
+                self.accept()
+            elif sock in self.clients:
+                if events & selectors.EVENT_READ:
+                    self.receive(sock)
+                if sock in self.clients and events & selectors.EVENT_WRITE:
+                    self.send(sock, b"")
+
+    def publish(self):
+        """Send rows that changed since the last frame to every client."""
+        display = self.chip8.display
+        size = (display.width, display.height)
+        if size != self.size:
+            changed = range(display.height)
+        else:
+            changed = [y for y, (old, new) in
+                       enumerate(zip(self.rows, display.rows)) if old != new]
+        self.size = size
+        self.rows = list(display.rows)
+        if not changed:
+            return
+        data = self.message(changed)
+        for client in list(self.clients):
+            self.send(client, data)
+
+    def serve(self, frames=None):
+        """Run frames in real time until the program stops.
+
+        Stop after the given number of frames, if it's not None.
+        """
+        chip8 = self.chip8
+        chip8.status = Mode.RUN
+        scheduler = FrameScheduler()
+        self.publish()
+        while chip8.status != Mode.STOP:
+            if frames is not None and chip8.frame_count >= frames:
+                break
+            for _ in range(scheduler.tick(self.poll)):
+                chip8.frame()
+                self.publish()
+            self.poll()
+        chip8.status = Mode.STOP
+
+class Client:
+    def __init__(self, path):
+        """Connect to server at Unix socket path."""
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.connect(path)
+        self.display = Display()
+        self.frame = None
+        self.buffer = bytearray()
+
+    def close(self):
+        """Disconnect from server."""
+        self.socket.close()
+
+    def press(self, key):
+        """Press key on the server's keypad."""
+        self.socket.sendall(bytes([0x10 | key]))
+
+    def release(self, key):
+        """Release key on the server's keypad."""
+        self.socket.sendall(bytes([key]))
+
+    def read(self, size):
+        """Receive exactly size bytes, or None if the server hung up."""
+        while len(self.buffer) < size:
+            data = self.socket.recv(4096)
+            if not data:
+                return None
+            self.buffer += data
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+    def update(self):
+        """Apply the next message to display.
+
+        Return frame number of the message, or None if the server hung up.
+        """
+        header = self.read(FRAME.size)
+        if header is None:
+            return None
+        frame, width, height, count = FRAME.unpack(header)
+        display = self.display
+        if (width, height) != (display.width, display.height):
+            display.resize(width, height)
+        size = width // 8 + 1
+        body = self.read(count * size)
+        if body is None:
+            return None
+        for i in range(0, len(body), size):
+            y = body[i]
+            display.rows[y] = int.from_bytes(body[i + 1:i + size], "big")
+            display.dirty |= 1 << y
+        self.frame = frame
+        return frame
@@ -0,0 +1,145 @@
+"""Run emulation and presentation on separate threads.
+
+The emulation thread runs frames on schedule and publishes the display
+after each batch of frames into a double-buffered framebuffer. The main
+thread only presents published frames and handles window events, so a
+slow render doesn't slow down emulation.
+
+Window events are handled while holding a lock that the emulation thread
+only releases between frames, because they do more than flip keypad
+bits: key presses can end an fx0a wait or get recorded, and other keys
+pause, rewind or restore the whole machine.
+"""
+
+import threading
+
+from . import frontend
+from .clock import FrameScheduler
+from .display import Display
+from .savestate import Rewind
+from .status import Mode
+
+class FrameBuffer:
+    """Double buffer of display snapshots.
+
+    The writer fills the back buffer and then flips it to the front, so a
+    reader always gets a complete frame.
+    """
+    def __init__(self):
+        self.buffers = [None, None]
+        self.front = 0
+        self.sequence = 0
+        # Number of published frames
+
+    def publish(self, display):
+        """Copy display into the back buffer and flip buffers."""
+        back = 1 - self.front
+        self.buffers[back] = (display.width, display.height, tuple(display.rows))
+        self.front = back
+        self.sequence += 1
+
+    def read(self):
+        """Get width, height and rows of the latest frame."""
+        return self.buffers[self.front]
+
+def present(window, framebuffer):
+    """Copy latest frame into the window's display and render changed rows."""
+    display = window.display
+    width, height, rows = framebuffer.read()
+    if (width, height) != (display.width, display.height):
+        display.resize(width, height)
+    dirty = 0
+    for y, (old, new) in enumerate(zip(display.rows, rows)):
+        if old != new:
+            dirty |= 1 << y
+    display.rows = list(rows)
+    display.dirty |= dirty
+    window.render()
+
+def locked(lock, function):
+    """Call function while holding lock."""
+    def wrapper(*args):
+        with lock:
+            return function(*args)
+    return wrapper
+
+def idle(chip8):
+    """Check if nothing can happen until a key is pressed."""
+    return (chip8.waiting and not chip8.rewinding
+            and not (chip8.delay_timer or chip8.sound_timer))
+
+class Emulator(threading.Thread):
+    def __init__(self, chip8, lock, framebuffer):
+        """Emulation thread for chip8."""
+        super().__init__(name="chippy-emulator", daemon=True)
+        self.chip8 = chip8
+        self.lock = lock
+        self.framebuffer = framebuffer
+        self.error = None
+
+    def run(self):
+        """Run frames on schedule until the program stops."""
+        chip8 = self.chip8
+        scheduler = FrameScheduler()
+        try:
+            while True:
+                frames = scheduler.tick()
+                with self.lock:
+                    if chip8.status == Mode.STOP:
+                        break
+                    if chip8.status == Mode.PAUSE:
+                        chip8.audio.update(0)
+                        continue
+                    if idle(chip8):
+                        continue
+                    for _ in range(frames):
+                        if chip8.rewinding and chip8.rewind is not None:
+                            chip8.rewind_frame()
+                        else:
+                            chip8.frame()
+                    self.framebuffer.publish(chip8.display)
+        except BaseException as error:
+            self.error = error
+            chip8.status = Mode.STOP
+
+def run(chip8):
+    """Run program stored in memory with emulation on a worker thread."""
+    chip8.status = Mode.RUN
+    window = frontend.load(chip8.config.frontend)(chip8)
+    window.display = Display(chip8.display.width, chip8.display.height)
+    window.init_screen()
+    if chip8.profiler is not None:
+        chip8.profiler.watch(window)
+    chip8.audio = window.audio()
+    if chip8.config.rewind_seconds > 0:
+        chip8.rewind = Rewind(capacity=chip8.config.rewind_seconds * 60)
+
+    lock = threading.Lock()
+    window.handle_event = locked(lock, window.handle_event)
+    framebuffer = FrameBuffer()
+    framebuffer.publish(chip8.display)
+    emulator = Emulator(chip8, lock, framebuffer)
+    emulator.start()
+
+    sequence = None
+    period = 1 / 240
+    try:
+        while chip8.status != Mode.STOP:
+            with lock:
+                blocked = chip8.status == Mode.PAUSE or idle(chip8)
+            if framebuffer.sequence != sequence:
+                sequence = framebuffer.sequence
+                present(window, framebuffer)
+            else:
+                window.render()
+            if blocked:
+                # Nothing gets published until there's input.
+                window.wait_events()
+            else:
+                window.wait_events(period)
+    finally:
+        chip8.status = Mode.STOP
+        emulator.join()
+        chip8.audio.update(0)
+    if emulator.error is not None:
+        raise emulator.error
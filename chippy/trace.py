@@ -0,0 +1,136 @@
+"""Chip-8 execution tracer.
+
+Each record stores the program counter, the instruction, I and selected
+registers before the instruction runs. Records are kept in a fixed-size
+ring buffer, and can be streamed to a trace file whenever the buffer fills
+up. Instructions are only disassembled when the trace is shown.
+
+Trace file format: magic, number of selected registers, register indices,
+then records.
+"""
+
+import operator
+import struct
+
+from .code import dispatch
+from .debug import Disassembler
+
+MAGIC = b"CH8T"
+
+def record_format(registers):
+    """Get struct for records with the selected registers."""
+    return struct.Struct(f"<HHH{len(registers)}B")
+
+class Tracer:
+    def __init__(self, chip8, size=4096, registers=range(16), stream=None):
+        """Trace chip8 into a ring buffer with room for size records.
+
+        If stream is a binary file, every record is written to it.
+        Otherwise, only the last size records are kept.
+        """
+        self.vm = chip8
+        self.registers = bytes(registers)
+        self.format = record_format(self.registers)
+        self.size = size
+        self.buffer = bytearray(size * self.format.size)
+        self.count = 0
+        self.stream = stream
+
+        if len(self.registers) == 1:
+            index = self.registers[0]
+            self.select = lambda registers: (registers[index],)
+        else:
+            self.select = operator.itemgetter(*self.registers)
+        if stream is not None:
+            self.write_header(stream)
+
+    def write_header(self, fp):
+        """Write trace file header."""
+        fp.write(MAGIC)
+        fp.write(bytes([len(self.registers)]))
+        fp.write(self.registers)
+
+    def run(self, cycles):
+        """Simulate and trace cycles. Return number of cycles simulated.
+
+        Stop early if an instruction changes the status of the interpreter,
+        e.g. when the debugger pauses it.
+        """
+        vm = self.vm
+        pack_into = self.format.pack_into
+        record_size = self.format.size
+        buffer = self.buffer
+        select = self.select
+        status = vm.status
+        done = 0
+        try:
+            for done in range(1, cycles + 1):
+                if not vm.waiting:
+                    index = self.count % self.size
+                    pc = vm.program_counter
+                    instruction = (vm.ram[pc] << 8) | vm.ram[pc + 1]
+                    pack_into(buffer, index * record_size, pc, instruction,
+                              vm.I, *select(vm.registers))
+                    self.count += 1
+                    if self.stream is not None and index == self.size - 1:
+                        self.stream.write(buffer)
+                vm.cycle()
+                if vm.status is not status:
+                    return done
+            return cycles
+        finally:
+            vm.executed = done
+
+    def records(self):
+        """Get buffered records in the order they were recorded."""
+        start = self.count - min(self.count, self.size)
+        if self.stream is not None:
+            start = self.count - self.count % self.size
+        record_size = self.format.size
+        for index in range(start, self.count):
+            offset = (index % self.size) * record_size
+            yield self.format.unpack_from(self.buffer, offset)
+
+    def save(self, fp):
+        """Write buffered records to trace file."""
+        self.write_header(fp)
+        self.flush(fp)
+
+    def flush(self, fp):
+        """Write buffered records to binary file."""
+        for record in self.records():
+            fp.write(self.format.pack(*record))
+
+    def close(self):
+        """Write the rest of the records to the stream."""
+        if self.stream is not None:
+            self.flush(self.stream)
+            self.stream.close()
+            self.stream = None
+
+def read_trace(fp):
+    """Read records from trace file."""
+    if fp.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Not a chippy trace file.")
+    count = fp.read(1)[0]
+    registers = fp.read(count)
+    layout = record_format(registers)
+    while True:
+        data = fp.read(layout.size)
+        if len(data) < layout.size:
+            break
+        yield registers, layout.unpack(data)
+
+def show_record(registers, record, disassembler=Disassembler()):
+    """Format trace record."""
+    pc, instruction, I, *values = record
+    state = " ".join(f"V{i:x}={v:02x}" for i, v in zip(registers, values))
+    text = dispatch(instruction, disassembler)
+    if isinstance(text, Exception):
+        text = str(text)
+    return f"{pc:#05x}  {instruction:04x}  I={I:#05x} {state}\n\t{text}"
+
+def show_trace(fp):
+    """Print disassembled trace."""
+    for registers, record in read_trace(fp):
+        print(show_record(registers, record))
@@ -0,0 +1,267 @@
+"""Basic block translator.
+
+Straight-line runs of Chip-8 code that end at a jump, call, return or skip
+are translated into Python functions and cached by start address.
+"""
+
+from collections import defaultdict
+
+from .code import decode_table
+from .processor import EXIT, ExecutionUnit
+
+# Inline implementations of common instructions.
+# V is the register file, vm is the chip-8 interpreter and unit is the
+# execution unit.
+TEMPLATES = {
+    "op_6xkk": ["V[{x}] = {kk}"],
+    "op_7xkk": ["V[{x}] = (V[{x}] + {kk}) & 0xff"],
+    "op_8xy0": ["V[{x}] = V[{y}]"],
+    "op_8xy1": ["V[{x}] |= V[{y}]"],
+    "op_8xy2": ["V[{x}] &= V[{y}]"],
+    "op_8xy3": ["V[{x}] ^= V[{y}]"],
+    "op_8xy4": [
+        "t = V[{x}] + V[{y}]",
+        "V[{x}] = t & 0xff",
+        "V[15] = 1 if t > 0xff else 0",
+    ],
+    "op_8xy5": [
+        "t = V[{x}] - V[{y}]",
+        "V[{x}] = t & 0xff",
+        "V[15] = 1 if t > 0 else 0",
+    ],
+    "op_8xy6": [
+        "t = V[{x}]",
+        "V[{x}] = t >> 1",
+        "V[15] = t & 0x01",
+    ],
+    "op_8xy7": [
+        "t = V[{y}] - V[{x}]",
+        "V[{x}] = t & 0xff",
+        "V[15] = 1 if t > 0 else 0",
+    ],
+    "op_8xye": [
+        "t = V[{x}]",
+        "V[{x}] = (t << 1) & 0xff",
+        "V[15] = (t >> 7) & 0x01",
+    ],
+    "op_annn": ["vm.I = {nnn}"],
+    "op_fx07": ["V[{x}] = vm.delay_timer"],
+    "op_fx15": ["vm.delay_timer = V[{x}]"],
+    "op_fx18": ["vm.sound_timer = V[{x}]"],
+    "op_fx1e": ["vm.I = (vm.I + V[{x}]) & 0xffff"],
+    "op_fx29": ["vm.I = (V[{x}] & 0x0f) * 5"],
+    "op_fx30": ["vm.I = 0x50 + (V[{x}] & 0x0f) * 10"],
+}
+
+def templates_for(quirks):
+    """Get templates for quirk profile."""
+    templates = dict(TEMPLATES)
+    if quirks.vf_reset:
+        for name in ("op_8xy1", "op_8xy2", "op_8xy3"):
+            templates[name] = TEMPLATES[name] + ["V[15] = 0"]
+    if quirks.shift_vy:
+        for name in ("op_8xy6", "op_8xye"):
+            templates[name] = [line.replace("t = V[{x}]", "t = V[{y}]")
+                               for line in TEMPLATES[name]]
+    return templates
+
+# Skip conditions.
+SKIPS = {
+    "op_3xkk": "V[{x}] == {kk}",
+    "op_4xkk": "V[{x}] != {kk}",
+    "op_5xy0": "V[{x}] == V[{y}]",
+    "op_9xy0": "V[{x}] != V[{y}]",
+    "op_ex9e": "(vm.keypad >> (V[{x}] & 0xf)) & 0x1",
+    "op_exa1": "not (vm.keypad >> (V[{x}] & 0xf)) & 0x1",
+}
+
+# Instructions that end a block.
+# Stores end blocks because they might overwrite the rest of the block.
+TERMINATORS = {
+    "op_00ee", "op_00fd", "op_1nnn", "op_2nnn", "op_bnnn", "op_fx0a",
+    "op_fx33", "op_fx55",
+} | set(SKIPS)
+
+COMPILED = {}
+# Compiled block factories by translator class, quirk profile, ram size,
+# start address and code, shared by every translator, so that blocks aren't compiled again
+# after invalidation or in new machines that run the same program.
+MAX_COMPILED = 1 << 14
+
+class BlockTranslator(ExecutionUnit):
+    """Execution unit that runs translated basic blocks.
+
+    Results are the same as running the instructions one at a time.
+    Blocks that overlap stores through op_fx33 and op_fx55 are invalidated.
+    The cycle budget is checked once per block. Blocks that don't fit in
+    the rest of the budget are run as shorter blocks, which are cached by
+    start address and size.
+    """
+    max_block_size = 64
+
+    def __init__(self, chip8):
+        super().__init__(chip8)
+        self.blocks = {}
+        # Blocks and their sizes by start address
+        self.prefixes = {}
+        # Blocks cut short to fit the budget by start address and size
+        self.owners = defaultdict(set)
+        self.templates = templates_for(self.quirks)
+
+    def invalidate(self, start, stop):
+        """Invalidate blocks that overlap with ram[start:stop]."""
+        super().invalidate(start, stop)
+        for address in range(start, stop):
+            for owner in self.owners.pop(address, ()):
+                self.blocks.pop(owner, None)
+                self.prefixes.pop(owner, None)
+
+    def store(self, start, stop):
+        super().store(start, stop)
+        self.invalidate(start, stop)
+
+    def run(self, cycles):
+        """Simulate cycles. Return number of cycles simulated.
+
+        Stop right after the program exits.
+        """
+        vm = self.vm
+        blocks = self.blocks
+        prefixes = self.prefixes
+        self.loop = None
+        executed = 0
+        try:
+            while executed < cycles:
+                if vm.waiting:
+                    return cycles
+                start = vm.program_counter
+                entry = blocks.get(start) or self.translate(start)
+                if entry is None:
+                    executed += 1
+                    instruction = vm.fetch()
+                    vm.increment()
+                    vm.execute(instruction)
+                else:
+                    block, size = entry
+                    if size > cycles - executed:
+                        size = cycles - executed
+                        block = (prefixes.get((start, size))
+                                 or self.translate(start, size))[0]
+                    try:
+                        block()
+                    except BaseException:
+                        executed += ((vm.program_counter - start) & 0x0fff) // 2
+                        # Handlers only fail before they change the program
+                        # counter, which points past the failed instruction.
+                        raise
+                    executed += size
+                if self.loop is not None:
+                    if self.loop is EXIT:
+                        self.loop = None
+                        return executed
+                    executed += self.fast_forward(cycles - executed)
+            return executed
+        finally:
+            vm.executed = executed
+
+    def translate(self, start, limit=None):
+        """Translate basic block that starts at start and cache it.
+
+        The block runs at most limit instructions, or max_block_size if
+        limit is None. Return the translated function, which takes no
+        arguments, and the number of instructions it runs, or None if
+        there's no instruction at start.
+        """
+        vm = self.vm
+        ram = vm.ram
+        table = decode_table()
+        instructions = []
+        address = start
+        size = limit or self.max_block_size
+        while address + 1 < len(ram) and len(instructions) < size:
+            instruction = (ram[address] << 8) | ram[address + 1]
+            instructions.append(instruction)
+            name = table[instruction][0]
+            after = (address + 2) & 0x0fff
+            if name in TERMINATORS or after < address:
+                break
+            address = after
+        if not instructions:
+            return None
+
+        count = len(instructions)
+        key = (type(self), self.quirks, len(ram), start,
+               bytes(ram[start:start + 2 * count]))
+        compiled = COMPILED.get(key)
+        if compiled is None:
+            compiled = self.compile(start, instructions)
+            if len(COMPILED) >= MAX_COMPILED:
+                COMPILED.clear()
+            COMPILED[key] = compiled
+        factory, calls = compiled
+        handlers = [vm.execute.lookup(instruction)[0] for instruction in calls]
+        entry = (factory(self, vm, *handlers), count)
+
+        owner = start if limit is None else (start, limit)
+        if limit is None:
+            self.blocks[start] = entry
+        else:
+            self.prefixes[owner] = entry
+        for address in range(start, start + 2 * count):
+            self.owners[address].add(owner)
+        return entry
+
+    def compile(self, start, instructions):
+        """Compile instructions that start at start into a block factory.
+
+        Return the factory, which takes the execution unit, the machine and
+        the handlers of the instructions that aren't inlined, and those
+        instructions.
+        """
+        ram_size = len(self.vm.ram)
+        table = decode_table()
+        calls = []
+        body = ["V = vm.registers"]
+        address = start
+        for instruction in instructions:
+            name, args = table[instruction]
+            after = (address + 2) & 0x0fff
+            operands = operands_of(instruction)
+
+            if name in SKIPS:
+                condition = SKIPS[name].format(**operands)
+                skip = (after + 2) & 0x0fff
+                body.append(f"vm.program_counter = {skip} if {condition} else {after}")
+            elif name == "op_1nnn" and 0x200 <= args[0] < ram_size:
+                body.append(f"vm.program_counter = {args[0]}")
+                if args[0] < after:
+                    body.append(f"unit.loop = ({args[0]}, {address})")
+            elif name in self.templates:
+                body.extend(line.format(**operands)
+                            for line in self.templates[name])
+            else:
+                calls.append(instruction)
+                body.append(f"vm.program_counter = {after}")
+                body.append(f"h{len(calls) - 1}{args!r}")
+            address = after
+        if name not in TERMINATORS:
+            body.append(f"vm.program_counter = {address}")
+
+        parameters = ", ".join(["unit", "vm"] + [f"h{i}" for i in range(len(calls))])
+        source = "\n".join(
+            [f"def translate({parameters}):", "    def block():"]
+            + [f"        {line}" for line in body]
+            + ["    return block"]
+        )
+        namespace = {}
+        exec(compile(source, f"<block {start:#05x}>", "exec"), namespace)
+        return namespace["translate"], calls
+
+def operands_of(instruction):
+    """Get all possible operands of instruction."""
+    return {
+        "x": (instruction & 0x0f00) >> 8,
+        "y": (instruction & 0x00f0) >> 4,
+        "kk": instruction & 0x00ff,
+        "nnn": instruction & 0x0fff,
+    }
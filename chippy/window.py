@@ -1,33 +1,15 @@
 """Chip8 display and keypad."""
 
-from pathlib import Path
+import math
+import time
 
 import pygame
 
+from .audio import NullAudio, PygameAudio
+from .keypad import press, release
+from .savestate import restore, save
 from .status import Mode
 
-def buzz():
-    """Sound buzzer."""
-    path = Path(__file__).with_name("data").joinpath("chime.wav")
-    chime = pygame.mixer.Sound(str(path))
-    pygame.mixer.Sound.play(chime)
-
-def press(chip8, key):
-    """Press key on chip-8 keypad."""
-    mask = 1 << key
-    chip8.keypad |= mask
-
-    # Handle op_fx0a
-    if chip8.waiting:
-        index = chip8.waiting.pop()
-        chip8.registers[index] = key
-
-def release(chip8, key):
-    """Release key on chip-8 keypad."""
-    mask = 0xffff
-    mask -= (1 << key)
-    chip8.keypad &= mask
-
 KEYS = {
     pygame.K_x: 0,
     pygame.K_1: 1,
@@ -50,11 +32,16 @@ def convert_key(key):
     """Convert pygame key constant to chip-8 key input."""
     return KEYS.get(key)
 
-def draw_pixel(x, y, scale=1, color=(255, 255, 255)):
-    """Draw pixel on the display."""
-    surface = pygame.display.get_surface()
-    rect = pygame.Rect(x * scale, y * scale, scale, scale)
-    pygame.draw.rect(surface, color, rect)
+def runs(row, width=64):
+    """Find runs of set bits in row, starting from the most significant bit.
+
+    Yield x-coordinate and length of each run.
+    """
+    while row:
+        high = row.bit_length()
+        low = (~row & ((1 << high) - 1)).bit_length()
+        yield width - high, high - low
+        row &= (1 << low) - 1
 
 class Window:
     def __init__(self, chip8):
@@ -63,6 +50,9 @@ class Window:
         self.scale = 12
 
         self.chip8 = chip8
+        self.display = chip8.display
+        # Display to render, which may be a copy of the chip-8 display
+        self.quicksave = None
         self.color_off = self.chip8.config.color_off
         self.color_on = self.chip8.config.color_on
 
@@ -72,54 +62,144 @@ class Window:
         return (self.width * self.scale, self.height * self.scale)
 
     def render(self):
-        """Render chip8 sprites."""
-        self.screen.fill(self.color_off)
-        for y, row in enumerate(self.chip8.display):
-            x = 0
-            bits = row
-            while bits:
-                cell = 0x8000000000000000 & bits
-                if cell:
-                    draw_pixel(x, y, self.scale, self.color_on)
-                bits &= 0x7fffffffffffffff
-                bits <<= 1
-                x += 1
-        pygame.display.update()
+        """Render display rows that changed since the last render."""
+        display = self.display
+        dirty = display.dirty
+        if not dirty:
+            return
+        display.dirty = 0
+
+        size = (display.width, display.height)
+        if self.canvas.get_size() != size:
+            self.canvas = pygame.Surface(size)
+            dirty = (1 << display.height) - 1
+
+        width, height = self.screen_size
+        scale = height // display.height
+        rects = []
+        for y, row in enumerate(display.rows):
+            if not (dirty >> y) & 1:
+                continue
+            self.canvas.fill(self.color_off, (0, y, display.width, 1))
+            for x, length in runs(row, display.width):
+                self.canvas.fill(self.color_on, (x, y, length, 1))
+            rects.append(pygame.Rect(0, y * scale, width, scale))
+        pygame.transform.scale(self.canvas, self.screen_size, self.screen)
+        pygame.display.update(rects)
 
     def init_screen(self):
-        """Initialize screen."""
-        pygame.init()
+        """Initialize screen and mixer."""
+        pygame.display.init()
+        try:
+            pygame.mixer.init()
+        except pygame.error:
+            pass
         pygame.display.set_caption("Chippy")
         self.screen = pygame.display.set_mode(self.screen_size)
+        display = self.display
+        self.canvas = pygame.Surface((display.width, display.height))
+        self.redraw()
+
+    def audio(self):
+        """Create buzzer, or a silent one if there's no mixer."""
+        if pygame.mixer.get_init():
+            return PygameAudio()
+        return NullAudio()
+
+    def redraw(self):
+        """Render the whole display on the next render."""
+        display = self.display
+        display.dirty = (1 << display.height) - 1
 
     def handle_key_event_when_running(self, event):
         """Handle KEYUP and KEYDOWN events in RUN mode."""
         if event.type == pygame.KEYDOWN:
             if event.key == pygame.K_SEMICOLON:
                 self.chip8.status = Mode.PAUSE
+                if self.chip8.debugger is not None:
+                    print(self.chip8.debugger.view(), flush=True)
+                return
+            if event.key == pygame.K_BACKSPACE:
+                self.chip8.start_rewind()
+                return
+            if event.key == pygame.K_F5:
+                self.quicksave = save(self.chip8)
+                return
+            if event.key == pygame.K_F9:
+                if self.quicksave is not None:
+                    restore(self.chip8, self.quicksave)
                 return
             key = convert_key(event.key)
             if key is not None:
                 press(self.chip8, key)
         elif event.type == pygame.KEYUP:
+            if event.key == pygame.K_BACKSPACE:
+                self.chip8.rewinding = False
+                return
             key = convert_key(event.key)
             if key is not None:
                 release(self.chip8, key)
 
     def handle_key_event_when_paused(self, event):
-        """Handle KEYUP and KEYDOWN events when paused."""
+        """Handle KEYUP and KEYDOWN events when paused.
+
+        With a debugger, S steps and N steps over calls.
+        """
         if event.type == pygame.KEYDOWN:
+            debugger = self.chip8.debugger
             if event.key == pygame.K_ESCAPE:
-                self.chip8.status = Mode.RUN
+                if debugger is None:
+                    self.chip8.status = Mode.RUN
+                else:
+                    debugger.resume()
                 return
+            if debugger is None:
+                return
+            if event.key == pygame.K_s:
+                debugger.step()
+            elif event.key == pygame.K_n:
+                if debugger.step_over():
+                    return
+            else:
+                return
+            if debugger.reason is None:
+                print(debugger.view(), flush=True)
+
+    def handle_event(self, event):
+        """Handle Pygame event."""
+        if event.type == pygame.QUIT:
+            self.chip8.status = Mode.STOP
+            return
+        if event.type == pygame.VIDEOEXPOSE:
+            self.redraw()
+        if self.chip8.status == Mode.RUN:
+            self.handle_key_event_when_running(event)
+        elif self.chip8.status == Mode.PAUSE:
+            self.handle_key_event_when_paused(event)
 
     def handle_events(self):
         """Handle Pygame events and Chippy interrupts.."""
         for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                self.chip8.status = Mode.STOP
+            self.handle_event(event)
+            if self.chip8.status == Mode.STOP:
+                return
+
+    def wait_events(self, timeout=None):
+        """Block until there's an event, then handle all pending events.
+
+        Give up after timeout seconds, if it's not None.
+        """
+        if timeout is None:
+            event = pygame.event.wait()
+        else:
+            try:
+                event = pygame.event.wait(max(math.ceil(timeout * 1000), 1))
+            except TypeError:
+                # Older versions of pygame can't wait with a timeout.
+                time.sleep(timeout)
+                event = pygame.event.Event(pygame.NOEVENT)
+        if event.type != pygame.NOEVENT:
+            self.handle_event(event)
+            if self.chip8.status == Mode.STOP:
                 return
-            if self.chip8.status == Mode.RUN:
-                self.handle_key_event_when_running(event)
-            elif self.chip8.status == Mode.PAUSE:
-                self.handle_key_event_when_paused(event)
+        self.handle_events()
@@ -24,5 +24,6 @@ setuptools.setup(
         "Topic :: Games/Entertainment",
     ],
     install_requires=["pygame"],
+    extras_require={"batch": ["numpy"]},
     python_requires=">=3.7",
 )
@@ -0,0 +1,78 @@
+"""Tests of static analysis."""
+
+from pathlib import Path
+import tempfile
+import unittest
+from unittest import mock
+
+from chippy import analysis
+from chippy.analysis import analyze, Block
+
+PROGRAM = bytes.fromhex("6001 220a 3001 120e 1204 7001 00ee 00fd abcd ef01")
+# 0x200: call 0x20a, then loop on a skip until jumping to exit at 0x20e.
+# 0x210 to 0x213 are data.
+
+class TestAnalysis(unittest.TestCase):
+    def test_blocks(self):
+        result = analyze(PROGRAM)
+        self.assertEqual(result.blocks, [
+            Block(0x200, 0x204, [0x20a, 0x204]),
+            Block(0x204, 0x206, [0x206, 0x208]),
+            Block(0x206, 0x208, [0x20e]),
+            Block(0x208, 0x20a, [0x204]),
+            Block(0x20a, 0x20e, []),
+            Block(0x20e, 0x210, []),
+        ])
+        self.assertEqual(result.code, [[0x200, 0x210]])
+        self.assertEqual(result.data, [[0x210, 0x214]])
+        self.assertEqual(result.calls, {0x200: [0x20a], 0x20a: []})
+        self.assertEqual(result.indirect, [])
+
+    def test_indirect(self):
+        result = analyze(bytes.fromhex("6002 b206 1200 00fd"))
+        self.assertEqual(result.indirect, [0x202])
+        self.assertEqual(result.code, [[0x200, 0x204]])
+        self.assertEqual(result.data, [[0x204, 0x208]])
+
+    def test_self_modifying(self):
+        result = analyze(bytes.fromhex("a202 f033 1204"))
+        self.assertTrue(result.stores[0].self_modifying)
+        self.assertIn("(self-modifying)",
+                      analysis.report(result, bytes.fromhex("a202 f033 1204")))
+
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            expected = analysis.load(PROGRAM, directory)
+            self.assertEqual(expected, analyze(PROGRAM))
+            with mock.patch.object(analysis, "analyze") as analyze_:
+                self.assertEqual(analysis.load(PROGRAM, directory), expected)
+                analyze_.assert_not_called()
+
+            # Analyses of older versions are redone.
+            path, = Path(directory).iterdir()
+            path.write_text(path.read_text().replace(
+                f'"version": {analysis.VERSION}', '"version": 0'))
+            with mock.patch.object(analysis, "analyze",
+                                   wraps=analyze) as analyze_:
+                self.assertEqual(analysis.load(PROGRAM, directory), expected)
+                analyze_.assert_called_once_with(PROGRAM)
+
+class TestStores(unittest.TestCase):
+    def stores(self, program):
+        """Get (address, start, stop) of stores in program."""
+        return [(store.address, store.start, store.stop)
+                for store in analyze(bytes.fromhex(program)).stores]
+
+    def test_known(self):
+        self.assertEqual(self.stores("a300 f233 f155 1206"),
+                         [(0x202, 0x300, 0x303), (0x204, 0x300, 0x302)])
+
+    def test_unknown_after_changing_i(self):
+        # op_fx55 and op_fx65 increment I under some quirk profiles.
+        for change in ("f01e", "f029", "f030", "f065", "f055"):
+            with self.subTest(change=change):
+                stores = self.stores(f"a300 {change} f033 1206")
+                self.assertEqual(stores[-1], (0x204, None, None))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+"""Tests of the NumPy batch engine."""
+
+import random
+import unittest
+
+from chippy.chippy import Chippy
+from chippy.keypad import press, release
+from chippy.lockstep import BatchChippy, state
+from chippy.quirks import PROFILES
+from chippy.status import Mode
+
+from test_engines import (check, FRAMES, generate, machine, PROGRAMS,
+                          single_step)
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+def drawing_engine():
+    """Make BatchEngine class whose machines draw random bytes from the
+    Python generators in sources, like Chippy does.
+    """
+    from chippy.batch import BatchEngine
+
+    class DrawingEngine(BatchEngine):
+        def op_cxkk(self, m, x, y, kk, nnn):
+            for i, vx, mask in zip(m.tolist(), x.tolist(), kk.tolist()):
+                byte = self.sources[i].randint(0x00, 0xff)
+                self.registers[i, vx] = byte & mask
+    return DrawingEngine
+
+@unittest.skipIf(numpy is None, "requires numpy")
+class TestBatch(unittest.TestCase):
+    def test_single(self):
+        # The batch engine only supports the 64-by-32 display.
+        check(self, [(BatchChippy, "interpreter")], PROFILES, hires=False)
+
+    def test_many(self):
+        engine = drawing_engine()
+        rng = random.Random(1)
+        programs = [generate(rng, hires=False) for _ in range(PROGRAMS)]
+        for profile in PROFILES:
+            machines = [machine(Chippy, program, profile)
+                        for program in programs]
+            errors = [None] * len(machines)
+            batch = engine.from_chippy(machines[0], len(machines))
+            batch.sources = [random.Random(chip8.seed) for chip8 in machines]
+            for i, program in enumerate(programs):
+                batch.ram[i, 0x200:0x200 + len(program)] = list(program)
+
+            for count in range(FRAMES):
+                key = count % 16
+                for i, chip8 in enumerate(machines):
+                    if errors[i] is not None or chip8.status is Mode.STOP:
+                        continue
+                    if count % 3 == 0:
+                        press(chip8, key)
+                    elif count % 3 == 2:
+                        release(chip8, key)
+                    try:
+                        single_step(chip8)
+                    except Exception as error:
+                        errors[i] = str(error) or type(error).__name__
+                if count % 3 == 0:
+                    batch.press(slice(None), key)
+                elif count % 3 == 2:
+                    batch.release(slice(None), key)
+                batch.frame()
+
+            for i, chip8 in enumerate(machines):
+                with self.subTest(profile=profile, program=i):
+                    stopped = errors[i] is not None or chip8.status is Mode.STOP
+                    self.assertEqual(bool(batch.halted[i]), stopped)
+                    self.assertEqual(batch.errors[i], errors[i])
+                    if stopped:
+                        continue
+                    copy = machine(Chippy, b"", profile)
+                    batch.to_chippy(i, copy)
+                    self.assertEqual(state(copy), state(chip8))
+
+if __name__ == "__main__":
+    unittest.main()
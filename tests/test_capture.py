@@ -0,0 +1,104 @@
+"""Round-trip tests for display capture."""
+
+from pathlib import Path
+import random
+import struct
+import tempfile
+import unittest
+import zlib
+
+from chippy.capture import Capture, compress, PngWriter
+from chippy.display import Display
+
+def decompress(data, min_size=2):
+    """Decompress GIF LZW data into pixel indices."""
+    clear = 1 << min_size
+    end = clear + 1
+    bits = int.from_bytes(data, "little")
+    offset = 0
+    size = min_size + 1
+    table = [bytes([pixel]) for pixel in range(clear)] + [b"", b""]
+    previous = None
+    output = bytearray()
+    while True:
+        code = (bits >> offset) & ((1 << size) - 1)
+        offset += size
+        if code == clear:
+            del table[end + 1:]
+            size = min_size + 1
+            previous = None
+            continue
+        if code == end:
+            return bytes(output)
+        if code < len(table):
+            entry = table[code]
+        else:
+            entry = previous + previous[:1]
+        output += entry
+        if previous is not None and len(table) < 4096:
+            table.append(previous + entry[:1])
+            if len(table) == 1 << size and size < 12:
+                size += 1
+        previous = entry
+
+class TestCompress(unittest.TestCase):
+    def assert_round_trip(self, pixels):
+        self.assertEqual(decompress(compress(pixels)), pixels)
+
+    def test_single_pixel(self):
+        self.assert_round_trip(b"\1")
+
+    def test_runs(self):
+        self.assert_round_trip(b"\0" * 10000)
+        self.assert_round_trip(b"\0\1" * 5000)
+
+    def test_random(self):
+        rng = random.Random(0)
+        for size in (2, 100, 5000, 256 * 128):
+            pixels = bytes(rng.getrandbits(1) for _ in range(size))
+            with self.subTest(size=size):
+                self.assert_round_trip(pixels)
+
+    def test_full_table(self):
+        # Enough distinct strings to fill the table and clear it
+        rng = random.Random(1)
+        pixels = bytes(rng.getrandbits(1) for _ in range(256 * 128 * 4))
+        self.assert_round_trip(pixels)
+
+def read_png(path):
+    """Read chunks of PNG file into a dictionary of chunk data."""
+    data = Path(path).read_bytes()
+    chunks = {}
+    offset = 8
+    while offset < len(data):
+        size, kind = struct.unpack_from(">I4s", data, offset)
+        chunks[kind] = data[offset + 8:offset + 8 + size]
+        offset += size + 12
+    return chunks
+
+class TestCapture(unittest.TestCase):
+    def test_png(self):
+        display = Display(64, 32)
+        with tempfile.TemporaryDirectory() as directory:
+            capture = Capture(PngWriter(directory, scale=1))
+            for _ in range(3):
+                capture.add(display)
+            display.rows[0] = 1 << 63
+            capture.add(display)
+            capture.close()
+
+            index = Path(directory, "index.txt").read_text()
+            self.assertEqual(index, "0 3 00000000.png\n3 1 00000003.png\n")
+
+            chunks = read_png(Path(directory, "00000003.png"))
+            width, height = struct.unpack_from(">II", chunks[b"IHDR"])
+            self.assertEqual((width, height), (128, 64))
+            lines = zlib.decompress(chunks[b"IDAT"])
+            # Each lores pixel is two pixels wide and two rows high.
+            stride = 1 + width // 8
+            self.assertEqual(lines[:stride], b"\0\xc0" + b"\0" * 15)
+            self.assertEqual(lines[stride:2 * stride], lines[:stride])
+            self.assertEqual(lines[2 * stride:], b"\0" * stride * 62)
+
+if __name__ == "__main__":
+    unittest.main()
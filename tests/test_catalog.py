@@ -0,0 +1,113 @@
+"""Tests of the ROM catalog."""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+import tempfile
+import unittest
+from unittest import mock
+
+from chippy import catalog
+from chippy.catalog import Catalog
+from chippy.config import Config
+
+class TestCatalog(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+        self.index = self.root / "cache" / "catalog.json"
+        self.roms = self.root / "roms"
+        self.roms.mkdir()
+        self.write("GAME", b"\x12\x00")
+        self.write("other.ch8", b"\x00\xe0\x12\x00")
+
+    def write(self, name, data):
+        """Write ROM file and return its SHA-1 hash."""
+        path = self.roms / name
+        path.write_bytes(data)
+        return hashlib.sha1(data).hexdigest()
+
+    def open(self):
+        """Open catalog with the test directory and update it."""
+        roms = Catalog(self.index)
+        roms.add_directory(self.roms)
+        roms.update()
+        return roms
+
+    def test_default_index(self):
+        with mock.patch.dict(os.environ, {"XDG_CACHE_HOME": str(self.root)}):
+            self.assertEqual(catalog.default_index(),
+                             self.root / "chippy" / "catalog.json")
+
+    def test_save(self):
+        roms = self.open()
+        self.assertTrue(roms.modified)
+        roms.save()
+        self.assertFalse(roms.modified)
+
+        again = Catalog(self.index)
+        self.assertFalse(again.modified)
+        self.assertEqual(again.entries, roms.entries)
+        self.assertIn(str(self.roms.resolve()), again.directories)
+        self.assertIn("BRIX", {entry.name for entry in again.entries.values()})
+
+    def test_outdated(self):
+        self.index.parent.mkdir()
+        self.index.write_text(json.dumps({"version": 0}))
+        roms = Catalog(self.index)
+        self.assertEqual(roms.entries, {})
+        self.assertTrue(roms.modified)
+
+    def test_update(self):
+        roms = self.open()
+        roms.save()
+        with mock.patch.object(catalog, "hash_file",
+                               wraps=catalog.hash_file) as hash_file:
+            sha1 = self.write("GAME", b"\x12\x02\x12\x00")
+            (self.roms / "other.ch8").unlink()
+            roms.update()
+        hash_file.assert_called_once_with(str(self.roms / "GAME"))
+        self.assertEqual(roms.find("GAME").sha1, sha1)
+        self.assertIsNone(roms.find("other.ch8"))
+        self.assertTrue(roms.modified)
+
+    def test_find(self):
+        roms = self.open()
+        sha1 = self.write("GAME", b"\x12\x00")
+        self.assertEqual(roms.find("GAME").sha1, sha1)
+        self.assertEqual(roms.find("game").name, "GAME")
+        self.assertEqual(roms.find(sha1[:6].upper()).name, "GAME")
+        self.assertIsNone(roms.find(sha1[:3]))
+        self.assertIsNone(roms.find("missing"))
+
+        # Copies have the same hash, so the prefix is still unambiguous.
+        self.write("copy", b"\x12\x00")
+        roms.update()
+        self.assertEqual(roms.find(sha1[:6]).sha1, sha1)
+
+    def test_sha1(self):
+        roms = self.open()
+        sha1 = self.write("GAME", b"\x12\x00")
+        self.assertEqual(roms.sha1(self.roms / "GAME"), sha1)
+        sha1 = self.write("GAME", b"\x12\x02\x12\x00")
+        self.assertEqual(roms.sha1(self.roms / "GAME"), sha1)
+
+    def test_settings(self):
+        roms = self.open()
+        sha1 = roms.find("GAME").sha1
+        config = Config()
+        config.clock_rate = 1000
+        config.quirks = "schip"
+        roms.tune(sha1, config)
+        roms.settings[sha1]["seed"] = 5
+        roms.save()
+
+        config = Config()
+        Catalog(self.index).configure(sha1, config)
+        self.assertEqual((config.clock_rate, config.quirks), (1000, "schip"))
+        self.assertIsNone(config.seed)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+"""Tests of the frame scheduler."""
+
+import unittest
+from unittest import mock
+
+from chippy import clock
+from chippy.clock import FrameScheduler
+
+class Clock:
+    """Fake monotonic clock."""
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        """Sleep on the fake clock."""
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+class TestFrameScheduler(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        patch = mock.patch.object(clock.time, "perf_counter", self.clock)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_steady(self):
+        scheduler = FrameScheduler(rate=50)
+        self.assertEqual(scheduler.tick(self.clock.sleep), 1)
+        for _ in range(5):
+            self.assertEqual(scheduler.tick(self.clock.sleep), 1)
+        self.assertEqual(len(self.clock.sleeps), 5)
+        for seconds in self.clock.sleeps:
+            self.assertAlmostEqual(seconds, 0.02)
+
+    def test_catch_up(self):
+        scheduler = FrameScheduler(rate=50)
+        scheduler.tick(self.clock.sleep)
+        self.clock.now += 0.065
+        # Frames at 0.02, 0.04 and 0.06 are due.
+        self.assertEqual(scheduler.tick(self.clock.sleep), 3)
+        self.assertEqual(self.clock.sleeps, [])
+        self.assertEqual(scheduler.tick(self.clock.sleep), 1)
+        self.assertAlmostEqual(self.clock.sleeps[0], 0.015)
+
+    def test_skip(self):
+        scheduler = FrameScheduler(rate=50, max_skip=5)
+        scheduler.tick(self.clock.sleep)
+        self.clock.now += 1
+        self.assertEqual(scheduler.tick(self.clock.sleep), 5)
+        # The schedule restarts instead of catching up on dropped frames.
+        self.assertEqual(scheduler.tick(self.clock.sleep), 1)
+        self.assertAlmostEqual(self.clock.sleeps[0], 0.02)
+
+    def test_early_wake_up(self):
+        scheduler = FrameScheduler(rate=50)
+        scheduler.tick(self.clock.sleep)
+        self.assertEqual(scheduler.tick(lambda seconds: None), 0)
+        self.assertEqual(scheduler.tick(self.clock.sleep), 1)
+
+    def test_reset(self):
+        scheduler = FrameScheduler(rate=50)
+        scheduler.tick(self.clock.sleep)
+        self.clock.now += 10
+        scheduler.reset()
+        self.assertEqual(scheduler.tick(self.clock.sleep), 1)
+        self.assertEqual(self.clock.sleeps, [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+"""Tests of instruction decoding and dispatch."""
+
+import unittest
+
+from chippy.chippy import Chippy
+from chippy.code import (classify, decode_table, dispatch, Dispatcher,
+                         handler_names)
+from chippy.debug import Disassembler
+
+class TestDecode(unittest.TestCase):
+    def test_table(self):
+        # Same as classify, except for the rules for op_0nnn.
+        table = decode_table()
+        for instruction in range(0x10000):
+            name, *args = classify(instruction)
+            if name == "op_0nnn":
+                name, *args = classify(instruction & 0xff)
+            if name in ("", "op_0nnn"):
+                name, args = "", [instruction]
+            self.assertEqual(table[instruction], (name, tuple(args)),
+                             f"{instruction:#06x}")
+
+    def test_dispatcher(self):
+        disassembler = Disassembler()
+        execute = Dispatcher(disassembler)
+        for instruction in range(0x10000):
+            expected = dispatch(instruction, disassembler)
+            actual = execute(instruction)
+            if isinstance(expected, Exception):
+                self.assertEqual(str(actual), str(expected))
+            else:
+                self.assertEqual(actual, expected)
+
+    def test_shared(self):
+        a, b = Chippy(), Chippy()
+        self.assertIs(a.execute.table, b.execute.table)
+        self.assertEqual(len(a.execute.handlers), len(handler_names()))
+        handler, args = a.execute.lookup(0x6110)
+        self.assertEqual(handler, a.execution_unit.op_6xkk)
+        self.assertEqual(args, (1, 0x10))
+
+if __name__ == "__main__":
+    unittest.main()
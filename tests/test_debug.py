@@ -0,0 +1,93 @@
+"""Tests of the debugger."""
+
+import contextlib
+import io
+import unittest
+
+from chippy.chippy import Chippy, ENGINES
+from chippy.debug import Debugger
+from chippy.status import Mode
+
+from test_engines import machine
+
+def debug(program, engine):
+    """Make machine with program and a debugger attached."""
+    chip8 = machine(Chippy, bytes.fromhex(program), engine=engine)
+    chip8.debugger = Debugger(chip8)
+    return chip8, chip8.debugger
+
+def run(chip8, frames=10):
+    """Run frames until the debugger stops the program."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(frames):
+            if chip8.status is not Mode.RUN:
+                break
+            chip8.frame()
+
+class TestDebugger(unittest.TestCase):
+    def test_breakpoint(self):
+        for engine in ENGINES:
+            chip8, debugger = debug("6000 7001 1202", engine)
+            debugger.add_breakpoint(0x202, "V0 == 3")
+            run(chip8)
+            with self.subTest(engine=engine):
+                self.assertIs(chip8.status, Mode.PAUSE)
+                self.assertEqual(debugger.reason, "Breakpoint at 0x202")
+                self.assertEqual(chip8.program_counter, 0x202)
+                self.assertEqual(chip8.registers[0], 3)
+
+                debugger.remove_breakpoint(0x202)
+                self.assertNotIn("cycle", vars(chip8))
+                debugger.resume()
+                run(chip8, 1)
+                self.assertIs(chip8.status, Mode.RUN)
+                self.assertGreater(chip8.registers[0], 3)
+
+    def test_resume(self):
+        # Resuming leaves the breakpoint and stops there again.
+        chip8, debugger = debug("6000 7001 1202", "block")
+        debugger.add_breakpoint(0x202)
+        run(chip8)
+        self.assertEqual(chip8.registers[0], 0)
+        cycles = chip8.cycle_count
+        debugger.resume()
+        run(chip8)
+        self.assertIs(chip8.status, Mode.PAUSE)
+        self.assertEqual(chip8.cycle_count, cycles + 2)
+        self.assertEqual(chip8.registers[0], 1)
+
+    def test_watchpoint(self):
+        for engine in ENGINES:
+            chip8, debugger = debug("a300 607b f033 1206", engine)
+            debugger.add_watchpoint(0x301, 0x302)
+            run(chip8)
+            with self.subTest(engine=engine):
+                self.assertIs(chip8.status, Mode.PAUSE)
+                self.assertEqual(debugger.reason,
+                                 "Watchpoint 0x301-0x301 written by 0x204")
+                self.assertEqual(chip8.program_counter, 0x206)
+                self.assertEqual(bytes(chip8.ram[0x300:0x303]),
+                                 bytes([1, 2, 3]))
+
+    def test_step_over(self):
+        for engine in ENGINES:
+            chip8, debugger = debug("2206 6101 1204 6002 00ee", engine)
+            chip8.status = Mode.PAUSE
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.assertTrue(debugger.step_over())
+            run(chip8)
+            with self.subTest(engine=engine):
+                self.assertIs(chip8.status, Mode.PAUSE)
+                self.assertEqual(debugger.reason,
+                                 "Stepped over call at 0x200")
+                self.assertEqual(chip8.program_counter, 0x202)
+                self.assertEqual(chip8.registers[0], 2)
+                self.assertIsNone(debugger.until)
+
+                self.assertFalse(debugger.step_over())
+                self.assertEqual(chip8.program_counter, 0x204)
+                self.assertEqual(chip8.registers[1], 1)
+                self.assertIs(chip8.status, Mode.PAUSE)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+"""Differential tests of the execution engines.
+
+Generated programs run on every engine and quirk profile, and are checked
+against the same program run one instruction at a time with cycle().
+"""
+
+import random
+import unittest
+
+from chippy.chippy import Chippy, ENGINES
+from chippy.config import Config
+from chippy.keypad import press, release
+from chippy.lockstep import state
+from chippy.status import Mode
+
+PROGRAMS = 20
+FRAMES = 40
+
+def generate(rng, size=200, hires=True):
+    """Generate random program that mostly jumps within itself.
+
+    The program only switches to hires mode if hires is true.
+    """
+    program = bytearray()
+    for _ in range(size):
+        op = rng.choice([0, 1, 2, 3, 4, 5, 6, 7, 8, 8, 9, 0xa, 0xb, 0xc,
+                         0xd, 0xe, 0xf, 0xf])
+        x = rng.randrange(16)
+        low = rng.randrange(256)
+        if op == 0:
+            low = rng.choice([0xe0, 0xee, 0xfb, 0xfc, 0xfd, 0xfe,
+                              0xff if hires else 0xe0, 0xc0 | x])
+            x = 0
+        elif op in (1, 2, 0xb):
+            target = 0x200 + 2 * rng.randrange(size)
+            x, low = (target >> 8) & 0xf, target & 0xff
+        elif op == 8:
+            low = (low & 0xf0) | rng.choice([0, 1, 2, 3, 4, 5, 6, 7, 0xe])
+        elif op == 0xe:
+            low = rng.choice([0x9e, 0xa1])
+        elif op == 0xf:
+            low = rng.choice([0x07, 0x0a, 0x15, 0x18, 0x1e, 0x29, 0x30,
+                              0x33, 0x55, 0x65])
+        program += bytes([(op << 4) | x, low])
+    return bytes(program)
+
+def machine(cls, program, profile="chippy", engine="interpreter"):
+    """Make machine of class cls with program loaded."""
+    config = Config()
+    config.engine = engine
+    config.quirks = profile
+    config.seed = 1
+    chip8 = cls(config)
+    chip8.ram[0x200:0x200 + len(program)] = program
+    chip8.status = Mode.RUN
+    return chip8
+
+def run(chip8, frame, frames=FRAMES):
+    """Run frames with frame(chip8) and input from a fixed sequence.
+
+    Return the state of chip8 at the end. Errors are compared by message,
+    because the batch engine only keeps the message.
+    """
+    for count in range(frames):
+        key = count % 16
+        if count % 3 == 0:
+            press(chip8, key)
+        elif count % 3 == 2:
+            release(chip8, key)
+        try:
+            frame(chip8)
+        except Exception as error:
+            return state(chip8, str(error) or type(error).__name__)
+        if chip8.status is Mode.STOP:
+            break
+    return state(chip8)
+
+def single_step(chip8):
+    """Simulate frame one instruction at a time."""
+    for _ in range(chip8.cycles_left()):
+        chip8.cycle()
+        if chip8.status is Mode.STOP:
+            return
+    chip8.end_frame()
+
+def check(test, candidates, profiles=("chippy",), hires=True):
+    """Compare frame() on candidate machines with single_step.
+
+    candidates is a list of machine classes and engine names.
+    """
+    rng = random.Random(0)
+    programs = [generate(rng, hires=hires) for _ in range(PROGRAMS)]
+    for profile in profiles:
+        for index, program in enumerate(programs):
+            expected = run(machine(Chippy, program, profile), single_step)
+            for cls, engine in candidates:
+                actual = run(machine(cls, program, profile, engine),
+                             Chippy.frame)
+                with test.subTest(profile=profile, program=index,
+                                  engine=engine, cls=cls.__name__):
+                    test.assertEqual(actual, expected)
+
+class TestEngines(unittest.TestCase):
+    def test_engines(self):
+        check(self, [(Chippy, engine) for engine in ENGINES])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+"""Tests of the lockstep runner."""
+
+from pathlib import Path
+import tempfile
+import unittest
+
+from chippy.code import Dispatcher
+from chippy.config import Config
+from chippy.lockstep import Lockstep
+
+ROM = bytes.fromhex("7001 1200")
+# V0 = N after the instruction at cycle 2 * (N - 1)
+
+class TestLockstep(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.rom = Path(directory.name, "COUNT")
+        self.rom.write_bytes(ROM)
+        self.config = Config()
+        self.config.seed = 1
+
+    def plant(self, runner, bug):
+        """Replace op_7xkk of the candidate with bug(unit, x, kk)."""
+        candidate = runner.machines[1]
+        unit = candidate.execution_unit
+        unit.op_7xkk = lambda x, kk: bug(unit, x, kk)
+        candidate.execute = Dispatcher(unit)
+
+    def test_agree(self):
+        runner = Lockstep(self.rom, self.config, "block")
+        self.assertIsNone(runner.run(10, interval=7))
+        self.assertEqual(runner.machines[1].frame_count, 10)
+
+    def test_divergence(self):
+        def bug(unit, x, kk):
+            registers = unit.vm.registers
+            step = 2 if registers[x] == 100 else kk
+            registers[x] = (registers[x] + step) & 0xff
+
+        for interval in (1, 3, 1000):
+            runner = Lockstep(self.rom, self.config, "interpreter")
+            self.plant(runner, bug)
+            divergence = runner.run(30, interval)
+            with self.subTest(interval=interval):
+                self.assertEqual(divergence.cycle, 200)
+                self.assertEqual(divergence.address, 0x200)
+                self.assertEqual(divergence.instruction, 0x7001)
+                self.assertEqual(divergence.differences[0][0], "registers")
+                reference, candidate = (field[0] for field in
+                                        divergence.differences[0][1:])
+                self.assertEqual((reference, candidate), (101, 102))
+
+    def test_unreproducible(self):
+        # The bug only happens once, so it's gone after rewinding.
+        happened = []
+
+        def bug(unit, x, kk):
+            registers = unit.vm.registers
+            step = kk
+            if registers[x] == 100 and not happened:
+                happened.append(True)
+                step = 2
+            registers[x] = (registers[x] + step) & 0xff
+
+        runner = Lockstep(self.rom, self.config, "interpreter")
+        self.plant(runner, bug)
+        divergence = runner.run(30)
+        # Frame 24 runs cycles 200 to 207.
+        self.assertEqual(divergence.frame, 24)
+        self.assertEqual(divergence.cycle, 207)
+        self.assertEqual(divergence.address, 0x200)
+        self.assertEqual(divergence.differences, [])
+        for chip8 in runner.machines:
+            self.assertEqual(chip8.cycle_count, 208)
+
+if __name__ == "__main__":
+    unittest.main()
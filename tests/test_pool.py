@@ -0,0 +1,70 @@
+"""Tests of headless ROM runs."""
+
+from pathlib import Path
+import tempfile
+import unittest
+
+from chippy.chippy import Chippy, ENGINES
+from chippy.config import Config
+from chippy.debug import Debugger
+from chippy.pool import run_rom
+from chippy.profiler import Profiler
+from chippy.trace import Tracer
+
+from test_engines import machine
+
+FAIL = "6001 7001 2200"
+# Overflows the stack on cycle 51
+RANDOM = "a000 c03f c11f d015 1208"
+
+class TestPool(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def rom(self, program):
+        """Write program into ROM file."""
+        rom = self.directory / "ROM"
+        rom.write_bytes(bytes.fromhex(program))
+        return rom
+
+    def test_failed_run(self):
+        rom = self.rom(FAIL)
+        for engine in ENGINES:
+            config = Config()
+            config.engine = engine
+            summary = run_rom(rom, config, cycles=1000)
+            with self.subTest(engine=engine):
+                self.assertTrue(summary["error"].startswith("IndexError"))
+                self.assertEqual(summary["cycles"], 51)
+
+    def test_failed_step(self):
+        def trace(chip8):
+            chip8.tracer = Tracer(chip8)
+
+        def profile(chip8):
+            Profiler(chip8).start()
+
+        def debug(chip8):
+            chip8.debugger = Debugger(chip8)
+            chip8.debugger.add_breakpoint(0xe00)
+
+        for setup in (trace, profile, debug):
+            chip8 = machine(Chippy, bytes.fromhex(FAIL))
+            setup(chip8)
+            with self.subTest(setup=setup.__name__):
+                with self.assertRaises(IndexError):
+                    chip8.step(1000)
+                self.assertEqual(chip8.cycle_count, 51)
+
+    def test_seed(self):
+        rom = self.rom(RANDOM)
+        summary = run_rom(rom, cycles=100)
+        config = Config()
+        config.seed = summary["seed"]
+        again = run_rom(rom, config, cycles=100)
+        self.assertEqual(again["display_sha1"], summary["display_sha1"])
+
+if __name__ == "__main__":
+    unittest.main()
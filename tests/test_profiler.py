@@ -0,0 +1,64 @@
+"""Tests of the profiler."""
+
+import io
+import json
+import unittest
+
+from chippy.chippy import Chippy, ENGINES
+from chippy.profiler import Profiler
+from chippy.status import Mode
+
+from test_engines import machine
+
+PROGRAM = bytes.fromhex("6003 7001 3005 1202 00fd")
+# Counts V0 from 3 to 5, then exits
+
+class TestProfiler(unittest.TestCase):
+    def test_counts(self):
+        for engine in ENGINES:
+            chip8 = machine(Chippy, PROGRAM, "schip", engine)
+            execute = chip8.execute
+            profiler = Profiler(chip8)
+            profiler.start()
+            self.assertEqual(chip8.step(100), 7)
+            profiler.stop()
+
+            with self.subTest(engine=engine):
+                self.assertIs(chip8.status, Mode.STOP)
+                self.assertIs(chip8.execute, execute)
+                self.assertNotIn("run", vars(chip8.execution_unit))
+                self.assertNotIn("step", vars(chip8))
+
+                report = profiler.report()
+                self.assertEqual(report["cycles"], 7)
+                self.assertEqual(
+                    {name: opcode["count"]
+                     for name, opcode in report["opcodes"].items()},
+                    {"op_6xkk": 1, "op_7xkk": 2, "op_3xkk": 2, "op_1nnn": 1,
+                     "op_00fd": 1},
+                )
+                self.assertEqual(report["addresses"], {
+                    "0x200": 1, "0x202": 2, "0x204": 2, "0x206": 1,
+                    "0x208": 1,
+                })
+                self.assertGreater(report["stages"]["cycle"], 0)
+
+                fp = io.StringIO()
+                profiler.save(fp)
+                self.assertEqual(json.loads(fp.getvalue()), report)
+
+    def test_show(self):
+        chip8 = machine(Chippy, PROGRAM, "schip")
+        profiler = Profiler(chip8)
+        profiler.start()
+        chip8.step(100)
+        profiler.stop()
+        lines = profiler.show(top=2).splitlines()
+        self.assertEqual(len(lines), 13)
+        self.assertEqual(lines[5:7], [
+            "0x202                2  7001  V0 += 1",
+            "0x204                2  3005  skip if V0 = 5",
+        ])
+
+if __name__ == "__main__":
+    unittest.main()
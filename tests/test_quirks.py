@@ -0,0 +1,67 @@
+"""Tests of quirk profiles."""
+
+import unittest
+
+from chippy.chippy import Chippy, ENGINES
+from chippy.code import dispatch
+from chippy.debug import Disassembler
+from chippy.quirks import PROFILES
+
+from test_engines import check, machine
+
+def run(program, profile, engine, cycles):
+    """Run program for cycles and return the machine."""
+    chip8 = machine(Chippy, bytes.fromhex(program), profile, engine)
+    chip8.step(cycles)
+    return chip8
+
+class TestQuirks(unittest.TestCase):
+    def test_engines(self):
+        check(self, [(Chippy, engine) for engine in ENGINES], PROFILES)
+
+    def test_behaviors(self):
+        for profile, quirks in PROFILES.items():
+            for engine in ENGINES:
+                with self.subTest(profile=profile, engine=engine):
+                    self.check_behaviors(quirks, profile, engine)
+
+    def check_behaviors(self, quirks, profile, engine):
+        chip8 = run("6f05 6001 6102 8011", profile, engine, 4)
+        self.assertEqual(chip8.registers[0xf], 0 if quirks.vf_reset else 5)
+
+        chip8 = run("6005 6103 8016", profile, engine, 3)
+        self.assertEqual(chip8.registers[0], 1 if quirks.shift_vy else 2)
+
+        chip8 = run("a300 6001 f155", profile, engine, 3)
+        if quirks.increment is None:
+            self.assertEqual(chip8.I, 0x300)
+        else:
+            self.assertEqual(chip8.I, 0x301 + quirks.increment)
+
+        chip8 = run("6002 6204 b208", profile, engine, 3)
+        self.assertEqual(chip8.program_counter,
+                         0x20c if quirks.jump_vx else 0x20a)
+
+        chip8 = run("a208 603e 6100 d011 ff00", profile, engine, 4)
+        row = chip8.display.rows[0]
+        self.assertEqual(row, 0b11 if quirks.clip else 0xfc00000000000003)
+
+        chip8 = run("a200 6000 6100 d010", profile, engine, 4)
+        rows = chip8.display.rows
+        if quirks.big_lores:
+            self.assertEqual(rows[:2], [0xa200 << 48, 0x6000 << 48])
+        else:
+            self.assertEqual(rows, [0] * 32)
+            self.assertEqual(chip8.registers[0xf], 0)
+
+    def test_disassembler(self):
+        for profile, quirks in PROFILES.items():
+            text = dispatch(0xb234, Disassembler(profile))
+            with self.subTest(profile=profile):
+                if quirks.jump_vx:
+                    self.assertEqual(text, "jump V2 + 0x234")
+                else:
+                    self.assertEqual(text, "jump V0 + 0x234")
+
+if __name__ == "__main__":
+    unittest.main()
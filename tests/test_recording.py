@@ -0,0 +1,88 @@
+"""Tests of input recording and replay."""
+
+import hashlib
+import io
+import random
+import unittest
+
+from chippy import headless, recording
+from chippy.chippy import Chippy
+from chippy.config import Config
+from chippy.keypad import press, release
+from chippy.status import Mode
+
+from test_engines import generate
+
+def record(program, seed, frames=60):
+    """Run program with random input while recording it.
+
+    Return the machine and the recording file.
+    """
+    config = Config()
+    config.seed = seed
+    chip8 = Chippy(config)
+    chip8.ram[0x200:0x200 + len(program)] = program
+    chip8.recorder = recording.Recorder(chip8,
+                                        hashlib.sha1(program).digest())
+    chip8.status = Mode.RUN
+    rng = random.Random(seed)
+    for _ in range(frames):
+        if chip8.status is Mode.STOP:
+            break
+        if rng.random() < 0.2:
+            press(chip8, rng.randrange(16))
+        if rng.random() < 0.2:
+            release(chip8, rng.randrange(16))
+        try:
+            chip8.frame()
+        except Exception:
+            break
+    fp = io.BytesIO()
+    chip8.recorder.save(fp, chip8.frame_count + (chip8.frame_cycles > 0))
+    fp.seek(0)
+    return chip8, fp
+
+class TestRecording(unittest.TestCase):
+    def test_replay(self):
+        rng = random.Random(0)
+        for index in range(10):
+            program = generate(rng)
+            chip8, fp = record(program, index)
+            session = recording.load(fp)
+            with self.subTest(program=index):
+                self.assertEqual(session.seed, index)
+                self.assertEqual(session.sha1, hashlib.sha1(program).digest())
+                self.assertIn(session.frames - chip8.frame_count, (0, 1))
+                self.assertEqual(session.events, chip8.recorder.events)
+
+                config = Config()
+                config.seed = session.seed
+                config.clock_rate = session.clock_rate
+                copy = Chippy(config)
+                copy.ram[0x200:0x200 + len(program)] = program
+                try:
+                    result = headless.run(copy, frames=session.frames,
+                                          player=recording.Player(session))
+                except Exception:
+                    result = headless.result(copy)
+                self.assertEqual(result, headless.result(chip8))
+
+    def test_truncated(self):
+        _, fp = record(generate(random.Random(1)), 1)
+        data = fp.getvalue()
+        session = recording.load(io.BytesIO(data[:-recording.EVENT.size - 1]))
+        self.assertEqual(session.frames, session.events[-1][0])
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            recording.load(io.BytesIO(b"CH8S" + bytes(40)))
+
+    def test_truncate(self):
+        recorder = recording.Recorder(Chippy(), bytes(20))
+        for frame in range(5):
+            recorder.record(frame, frame, True)
+        recorder.truncate(2)
+        self.assertEqual([event[0] for event in recorder.events], [0, 1, 2])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+"""Tests of save states and the rewind buffer."""
+
+import random
+import unittest
+
+from chippy.chippy import Chippy, ENGINES
+from chippy.errors import ChippyError
+from chippy.lockstep import state
+from chippy.savestate import position, restore, Rewind, save
+
+from test_engines import generate, machine, run
+
+class TestSaveState(unittest.TestCase):
+    def test_round_trip(self):
+        rng = random.Random(0)
+        programs = [generate(rng) for _ in range(5)]
+        for engine in ENGINES:
+            for index, program in enumerate(programs):
+                chip8 = machine(Chippy, program, engine=engine)
+                if run(chip8, Chippy.frame, 10)["error"] is not None:
+                    continue
+                snapshot = save(chip8)
+                expected = run(chip8, Chippy.frame, 10)
+                expected_count = chip8.cycle_count
+
+                copy = machine(Chippy, b"", engine=engine)
+                copy.random.seed(2)
+                restore(copy, snapshot)
+                with self.subTest(engine=engine, program=index):
+                    self.assertEqual(save(copy), snapshot)
+                    self.assertEqual(run(copy, Chippy.frame, 10), expected)
+                    self.assertEqual(copy.cycle_count, expected_count)
+
+    def test_invalid(self):
+        snapshot = bytearray(save(Chippy()))
+        snapshot[:4] = b"NOPE"
+        with self.assertRaises(ChippyError):
+            restore(Chippy(), bytes(snapshot))
+
+class TestRewind(unittest.TestCase):
+    def snapshots(self, count):
+        """Take a snapshot after each of count frames."""
+        chip8 = machine(Chippy, bytes.fromhex("c0ff 7101 f155 1200"))
+        snapshots = []
+        for _ in range(count):
+            chip8.frame()
+            snapshots.append(save(chip8))
+        return snapshots
+
+    def test_pop(self):
+        snapshots = self.snapshots(12)
+        rewind = Rewind(capacity=100, interval=5)
+        for snapshot in snapshots:
+            rewind.push(snapshot)
+        self.assertEqual(len(rewind), 12)
+        self.assertEqual([rewind.pop() for _ in range(13)],
+                         snapshots[::-1] + [None])
+        self.assertEqual(len(rewind), 0)
+
+    def test_capacity(self):
+        # Whole groups are dropped, so the buffer keeps 6 to 8 snapshots.
+        snapshots = self.snapshots(12)
+        rewind = Rewind(capacity=8, interval=2)
+        for snapshot in snapshots:
+            rewind.push(snapshot)
+        self.assertEqual(len(rewind), 8)
+        self.assertEqual([rewind.pop() for _ in range(8)], snapshots[:3:-1])
+
+    def test_start_rewind(self):
+        chip8 = machine(Chippy, bytes.fromhex("7001 1200"))
+        chip8.rewind = Rewind()
+        states = [state(chip8)]
+        for _ in range(3):
+            chip8.frame()
+            states.append(state(chip8))
+        self.assertEqual(position(chip8.rewind.pop()), (3, 0))
+        chip8.rewind.push(save(chip8))
+
+        # The first rewound frame goes back from the end of frame 3.
+        chip8.start_rewind()
+        for frame in (2, 1):
+            chip8.rewind_frame()
+            self.assertEqual(chip8.frame_count, frame)
+            self.assertEqual(state(chip8), states[frame])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+"""Tests of SUPER-CHIP instructions and the hires display."""
+
+import unittest
+
+from chippy.chippy import Chippy, ENGINES
+from chippy.status import Mode
+
+from test_engines import machine
+
+def run(program, engine, cycles, profile="schip"):
+    """Run program for cycles and return the machine."""
+    chip8 = machine(Chippy, bytes.fromhex(program), profile, engine)
+    chip8.step(cycles)
+    return chip8
+
+class TestSuperChip(unittest.TestCase):
+    def test_resolution(self):
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                chip8 = run("00ff", engine, 1)
+                display = chip8.display
+                self.assertEqual((display.width, display.height), (128, 64))
+                self.assertTrue(display.hires)
+
+                chip8 = run("00ff a200 d001 00fe", engine, 4)
+                display = chip8.display
+                self.assertEqual((display.width, display.height), (64, 32))
+                self.assertEqual(display.rows, [0] * 32)
+
+    def test_big_sprite(self):
+        # 16-by-16 sprite at (120, 0) wraps around in hires mode.
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                chip8 = run("00ff a200 6078 6100 d010", engine, 5,
+                            profile="chippy")
+                rows = chip8.display.rows
+                self.assertEqual(rows[0], 0xff << 120)
+                self.assertEqual(rows[1], 0xa2)
+                self.assertEqual(chip8.registers[0xf], 0)
+
+    def test_scroll(self):
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                # Draw one pixel at (8, 0), then scroll.
+                chip8 = run("a20c 6008 6100 d011 00c2 00fb 8000", engine, 6)
+                rows = chip8.display.rows
+                self.assertEqual(rows[:3], [0, 0, 1 << (63 - 12)])
+
+                chip8 = run("a20a 6008 6100 d011 00fc 8000", engine, 5)
+                self.assertEqual(chip8.display.rows[0], 1 << (63 - 4))
+
+    def test_big_font(self):
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                chip8 = run("6007 f030", engine, 2)
+                self.assertEqual(chip8.I, 0x50 + 7 * 10)
+
+    def test_exit(self):
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                chip8 = machine(Chippy, bytes.fromhex("7001 00fd"),
+                                "schip", engine)
+                self.assertEqual(chip8.step(100), 2)
+                self.assertIs(chip8.status, Mode.STOP)
+                self.assertEqual(chip8.registers[0], 1)
+                self.assertEqual(chip8.program_counter, 0x202)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+"""Tests of the display streaming server."""
+
+from pathlib import Path
+import select
+import socket
+import tempfile
+import unittest
+
+from chippy import server
+from chippy.chippy import Chippy
+
+from test_engines import machine
+
+DRAW = "c00f f029 c13f c21f d125 1200"
+# Draw a random digit at a random position every few cycles
+
+class TestServer(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = str(Path(directory.name, "chippy.sock"))
+
+    def connect(self, program):
+        """Start server for program and connect a client to it."""
+        chip8 = machine(Chippy, bytes.fromhex(program))
+        host = server.Server(chip8, self.path)
+        self.addCleanup(host.close)
+        host.publish()
+        # Like serve(), which publishes the display before clients connect
+        client = server.Client(self.path)
+        self.addCleanup(client.close)
+        host.poll(1)
+        return chip8, host, client
+
+    def test_deltas(self):
+        chip8, host, client = self.connect(DRAW)
+        self.assertEqual(client.update(), 0)
+        self.assertEqual(client.display.rows, chip8.display.rows)
+
+        for frame in range(1, 30):
+            rows = list(chip8.display.rows)
+            chip8.frame()
+            host.publish()
+            if chip8.display.rows == rows:
+                continue
+            with self.subTest(frame=frame):
+                self.assertEqual(client.update(), frame)
+                self.assertEqual(client.display.rows, chip8.display.rows)
+
+        # Nothing is sent when the display doesn't change.
+        host.publish()
+        ready, _, _ = select.select([client.socket], [], [], 0)
+        self.assertEqual(ready, [])
+
+    def test_resolution(self):
+        chip8, host, client = self.connect("00ff " + DRAW)
+        client.update()
+        chip8.frame()
+        host.publish()
+        client.update()
+        display = client.display
+        self.assertEqual((display.width, display.height), (128, 64))
+        self.assertEqual(display.rows, chip8.display.rows)
+
+    def test_keys(self):
+        chip8, host, client = self.connect(DRAW)
+        client.press(5)
+        host.poll(1)
+        self.assertEqual(chip8.keypad, 1 << 5)
+        client.release(5)
+        host.poll(1)
+        self.assertEqual(chip8.keypad, 0)
+
+    def test_hang_up(self):
+        chip8, host, client = self.connect(DRAW)
+        client.close()
+        host.poll(1)
+        self.assertEqual(host.clients, {})
+
+    def test_stale_socket(self):
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(self.path)
+        stale.close()
+        host = server.Server(machine(Chippy, b""), self.path)
+        host.close()
+
+if __name__ == "__main__":
+    unittest.main()
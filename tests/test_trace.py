@@ -0,0 +1,71 @@
+"""Tests of the execution tracer and trace files."""
+
+import io
+from pathlib import Path
+import tempfile
+import unittest
+
+from chippy.chippy import Chippy
+from chippy.trace import read_trace, show_record, Tracer
+
+from test_engines import machine
+
+PROGRAM = bytes.fromhex("6005 a300 7001 f01e 8f04 30ff 1204 00e0 f10a")
+# Waits for a key after the loop counts V0 up to 0xff
+
+def expected(registers, cycles):
+    """Get records of PROGRAM run one instruction at a time."""
+    chip8 = machine(Chippy, PROGRAM)
+    records = []
+    for _ in range(cycles):
+        if not chip8.waiting:
+            pc = chip8.program_counter
+            instruction = (chip8.ram[pc] << 8) | chip8.ram[pc + 1]
+            records.append((pc, instruction, chip8.I,
+                            *(chip8.registers[i] for i in registers)))
+        chip8.cycle()
+    return records
+
+class TestTrace(unittest.TestCase):
+    def trace(self, cycles, **options):
+        """Trace PROGRAM for cycles and return the tracer."""
+        chip8 = machine(Chippy, PROGRAM)
+        chip8.tracer = Tracer(chip8, **options)
+        self.assertEqual(chip8.step(cycles), cycles)
+        return chip8.tracer
+
+    def test_stream(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory, "trace")
+            tracer = self.trace(1400, size=8, stream=open(path, "wb"))
+            tracer.close()
+            with open(path, "rb") as fp:
+                records = list(read_trace(fp))
+        self.assertEqual(records, [(bytes(range(16)), record)
+                                   for record in expected(range(16), 1400)])
+
+    def test_last(self):
+        for registers in ((0,), (15, 0), range(16)):
+            tracer = self.trace(12, size=5, registers=registers)
+            fp = io.BytesIO()
+            tracer.save(fp)
+            fp.seek(0)
+            with self.subTest(registers=registers):
+                self.assertEqual(list(read_trace(fp)),
+                                 [(bytes(registers), r)
+                                  for r in expected(registers, 12)[-5:]])
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            list(read_trace(io.BytesIO(b"CH8S")))
+
+    def test_show(self):
+        fp = io.BytesIO()
+        self.trace(4, registers=(0,)).save(fp)
+        fp.seek(0)
+        registers, record = next(read_trace(fp))
+        self.assertEqual(show_record(registers, record),
+                         "0x200  6005  I=0x000 V0=00\n\tV0 = 5")
+
+if __name__ == "__main__":
+    unittest.main()